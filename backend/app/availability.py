@@ -0,0 +1,177 @@
+"""
+Availability calendar for equipment.
+
+Bookings and blackouts are stored as half-open [start_date, end_date)
+intervals in equipment_availability_blocks. A date-range search keeps only
+equipment with no overlapping block, as one ``NOT EXISTS`` in the listing
+query:
+
+* on Postgres the overlap test is ``tsrange(start, end) && tsrange(:from, :to)``
+  which is answered by the GiST index on (equipment_id, tsrange(...))
+* elsewhere it is ``start_date < :to AND end_date > :from`` on the
+  (equipment_id, start_date, end_date) btree index
+
+Users can ask to be alerted when equipment frees up for a date range. The
+job worker checks every open alert with one query and notifies the ones
+whose window has become free.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import and_, exists, func, literal, select, update
+
+from app import db
+from app.models import AvailabilityAlert, Equipment, EquipmentAvailabilityBlock, User
+from app.notifications import send_notification
+from app.tasks import task_queue
+
+ALERT_BATCH_SIZE = 500
+
+
+def parse_date_param(value, end=False):
+    """
+    Parse an ISO date or datetime. A bare end date is inclusive, so it is
+    turned into midnight of the following day. Datetimes with an offset are
+    converted to naive UTC, like the stored dates.
+    """
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'Invalid date: {value}')
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            parsed = datetime.combine(day, time.min)
+            return parsed + timedelta(days=1) if end else parsed
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_text(data, name, max_length=None):
+    """``data[name]`` if it is a string of at most ``max_length`` characters, None when unset"""
+    value = data.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string')
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def parse_date_range(start_value, end_value, names=('available_from', 'available_to')):
+    """Return (start, end) for a date range, or (None, None) if unset"""
+    start = parse_date_param(start_value)
+    end = parse_date_param(end_value, end=True)
+    if start is None and end is None:
+        return None, None
+    if start is None or end is None:
+        raise ValueError(f'{names[0]} and {names[1]} must be given together')
+    if end <= start:
+        raise ValueError(f'{names[1]} must be after {names[0]}')
+    return start, end
+
+
+def overlaps(start, end):
+    """Clause matching blocks that overlap [start, end), values or columns"""
+    block = EquipmentAvailabilityBlock
+    if db.engine.dialect.name == 'postgresql':
+        if isinstance(start, datetime):
+            start, end = literal(start), literal(end)
+        return func.tsrange(block.start_date, block.end_date).op('&&')(func.tsrange(start, end))
+    return and_(block.start_date < end, block.end_date > start)
+
+
+def available_between(start, end, model=Equipment):
+    """
+    WHERE clauses keeping equipment that is marked available and has no
+    booking or blackout overlapping [start, end); ``model`` is Equipment or
+    EquipmentSearch
+    """
+    block = EquipmentAvailabilityBlock
+    blocked = exists().where(block.equipment_id == model.id).where(overlaps(start, end))
+    # Bare column rather than IS TRUE so the partial index predicate matches
+    return [model.availability_status, ~blocked]
+
+
+def blocks_for(equipment_id, start=None, end=None):
+    """Blocks for one piece of equipment, optionally limited to a window"""
+    stmt = select(EquipmentAvailabilityBlock).where(
+        EquipmentAvailabilityBlock.equipment_id == equipment_id)
+    if start is not None and end is not None:
+        stmt = stmt.where(overlaps(start, end))
+    return db.session.execute(stmt.order_by(EquipmentAvailabilityBlock.start_date)).scalars().all()
+
+
+def create_alert(equipment_id, data):
+    """Subscribe a user to availability of a piece of equipment"""
+    user_id = data.get('user_id')
+    if not isinstance(user_id, int) or db.session.get(User, user_id) is None:
+        raise ValueError('user_id must be an existing user')
+    start, end = parse_date_range(data.get('start_date'), data.get('end_date'),
+                                  names=('start_date', 'end_date'))
+    if start is None:
+        raise ValueError('start_date and end_date are required')
+    if end <= datetime.utcnow():
+        raise ValueError('end_date must be in the future')
+    alert = AvailabilityAlert(user_id=user_id, equipment_id=equipment_id,
+                              start_date=start, end_date=end)
+    db.session.add(alert)
+    db.session.commit()
+    return alert
+
+
+@task_queue.task('send_availability_alerts')
+def send_availability_alerts():
+    """Notify users whose equipment has become available for their dates"""
+    alert, block = AvailabilityAlert, EquipmentAvailabilityBlock
+    blocked = exists().where(block.equipment_id == alert.equipment_id).where(
+        overlaps(alert.start_date, alert.end_date))
+    while True:
+        rows = db.session.execute(
+            select(alert.id, alert.start_date, alert.end_date, User.email, Equipment.name)
+            .join(User, User.id == alert.user_id)
+            .join(Equipment, Equipment.id == alert.equipment_id)
+            .where(alert.notified_at.is_(None), alert.end_date > datetime.utcnow(),
+                   Equipment.availability_status, ~blocked)
+            .order_by(alert.id)
+            .limit(ALERT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        for row in rows:
+            send_notification(
+                row.email,
+                f'{row.name} is available',
+                f'{row.name} is now free from {row.start_date:%d %b %Y} to {row.end_date:%d %b %Y}.',
+            )
+        db.session.execute(
+            update(alert).where(alert.id.in_([row.id for row in rows]))
+            .values(notified_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+
+def serialize_alert(alert):
+    return {
+        'id': alert.id,
+        'user_id': alert.user_id,
+        'equipment_id': alert.equipment_id,
+        'start_date': alert.start_date.isoformat(),
+        'end_date': alert.end_date.isoformat(),
+        'notified_at': alert.notified_at.isoformat() if alert.notified_at else None,
+    }
+
+
+def serialize_block(block):
+    return {
+        'id': block.id,
+        'equipment_id': block.equipment_id,
+        'kind': block.kind.value,
+        'start_date': block.start_date.isoformat(),
+        'end_date': block.end_date.isoformat(),
+        'note': block.note,
+    }
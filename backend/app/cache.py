@@ -0,0 +1,237 @@
+"""
+Response cache for the search endpoints.
+
+Two backends are available, picked with ``CACHE_BACKEND``:
+
+* ``memory`` (default) - per-process LRU with a TTL
+* ``redis`` - shared between workers, using ``REDIS_URL``. ``fakeredis``
+  can stand in for a real server locally.
+
+Entries are namespaced by a generation number. A transaction that wrote
+Equipment, Operator, EquipmentCategory or an availability block bumps the
+generation when it commits, so every cached response built from the old
+data stops being reachable and ages out on its own. Bumping at flush time
+instead would let a request running between flush and commit cache the
+old rows under the new generation.
+"""
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import json
+import logging
+import math
+import time
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60  # seconds
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_GRID_SIZE = 0.001  # degrees, roughly 110m
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self):
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+            # Nothing can reach the old entries any more, free them now
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Cache backed by a Redis (or fakeredis) client, values stored as JSON"""
+
+    GENERATION_KEY = 'ec:cache:generation'
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.setex(key, int(math.ceil(ttl)), json.dumps(value))
+
+    def generation(self):
+        return int(self.client.get(self.GENERATION_KEY) or 0)
+
+    def bump_generation(self):
+        self.client.incr(self.GENERATION_KEY)
+
+    def __len__(self):
+        return self.client.dbsize()
+
+
+class ResponseCache:
+    """Flask extension wrapping a cache backend with hit/miss counters"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = DEFAULT_TTL
+        self.grid_size = DEFAULT_GRID_SIZE
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._stats_lock = Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CACHE_TTL', DEFAULT_TTL)
+        self.grid_size = app.config.get('CACHE_GRID_SIZE', DEFAULT_GRID_SIZE)
+        self.backend = make_backend(app.config)
+        app.extensions['response_cache'] = self
+
+        # Imported here to avoid a circular import with app.models
+        from app.events import on_change
+        from app.models import Equipment, EquipmentAvailabilityBlock, EquipmentCategory, Operator
+        on_change(Equipment, EquipmentAvailabilityBlock, EquipmentCategory, Operator)(_invalidate_on_write)
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def snap(self, value):
+        """Snap a coordinate to the cache grid so nearby searches share entries"""
+        return round(round(value / self.grid_size) * self.grid_size, 6)
+
+    def make_key(self, endpoint, params):
+        """Build a key from the endpoint name and normalized query params"""
+        normalized = json.dumps(
+            {name: value for name, value in params.items() if value not in (None, '')},
+            sort_keys=True, separators=(',', ':'), default=str,
+        )
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f'ec:cache:{self.backend.generation()}:{endpoint}:{digest}'
+
+    def get_or_set(self, endpoint, params, compute):
+        """Return the cached value for these params, computing it on a miss"""
+        if not self.enabled:
+            return compute()
+        try:
+            key = self.make_key(endpoint, params)
+            value = self.backend.get(key)
+        except Exception:
+            # A cache outage should slow requests down, not fail them
+            logger.exception('Cache lookup failed')
+            return compute()
+        if value is not None:
+            self._count('hits')
+            return value
+        self._count('misses')
+        value = compute()
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception:
+            logger.exception('Cache store failed')
+        return value
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def invalidate(self):
+        if not self.enabled:
+            return
+        self._count('invalidations')
+        try:
+            self.backend.bump_generation()
+        except Exception:
+            logger.exception('Cache invalidation failed')
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses, invalidations = self.hits, self.misses, self.invalidations
+        lookups = hits + misses
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else None,
+            'invalidations': invalidations,
+            'entries': len(self.backend) if self.enabled else 0,
+        }
+
+
+def make_backend(config):
+    """Create the backend named by CACHE_BACKEND, or None when disabled"""
+    name = config.get('CACHE_BACKEND', 'memory')
+    if name == 'none':
+        return None
+    if name == 'memory':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    if name == 'redis':
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package')
+        return RedisCache(redis.Redis.from_url(config.get('REDIS_URL', 'redis://localhost:6379')))
+    if name == 'fakeredis':
+        import fakeredis
+        return RedisCache(fakeredis.FakeRedis())
+    raise ValueError(f'Unknown CACHE_BACKEND: {name}')
+
+
+cache = ResponseCache()
+
+
+def _invalidate_on_write(action, target):
+    if action == 'reset':
+        # notify_bulk runs after the bulk write committed
+        cache.invalidate()
+        return
+    session = object_session(target)
+    if session is None:
+        cache.invalidate()
+    else:
+        session.info['cache_dirty'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('cache_dirty', False):
+        cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('cache_dirty', None)
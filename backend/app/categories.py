@@ -0,0 +1,133 @@
+"""
+Category hierarchy helpers backed by a closure table.
+
+``equipment_category_closure`` holds one row per (ancestor, descendant)
+pair, so "everything under Excavators" is a single indexed join instead of a
+recursive walk. The table is kept in sync by mapper events on
+EquipmentCategory, running on the same connection as the flush:
+
+* insert - the new node becomes a descendant of its parent's ancestors
+* move (parent_id changes) - the subtree is detached from its old ancestors
+  and attached below the new parent
+* delete - the node's own rows are removed (children must be moved or
+  deleted first, the parent_id foreign key enforces that)
+
+``rebuild_closure`` recomputes the table from parent_id, for recovery.
+"""
+from sqlalchemy import and_, delete, event, inspect, insert, literal, select
+
+from app import db
+from app.models import Equipment, EquipmentCategory, EquipmentCategoryClosure
+
+closure = EquipmentCategoryClosure.__table__
+
+
+def _subtree_ids(connection, category_id):
+    return set(connection.execute(
+        select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+    ).scalars())
+
+
+def _link_to_parent(connection, category_id, parent_id):
+    """Attach the subtree rooted at category_id below parent_id"""
+    if parent_id is None:
+        return
+    supertree = closure.alias('supertree')
+    subtree = closure.alias('subtree')
+    connection.execute(insert(closure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        select(supertree.c.ancestor_id, subtree.c.descendant_id,
+               supertree.c.depth + subtree.c.depth + 1)
+        .select_from(supertree.join(subtree, subtree.c.ancestor_id == category_id))
+        .where(supertree.c.descendant_id == parent_id),
+    ))
+
+
+@event.listens_for(EquipmentCategory, 'after_insert')
+def _closure_after_insert(mapper, connection, target):
+    connection.execute(insert(closure).values(ancestor_id=target.id, descendant_id=target.id, depth=0))
+    _link_to_parent(connection, target.id, target.parent_id)
+
+
+@event.listens_for(EquipmentCategory, 'before_update')
+def _closure_check_move(mapper, connection, target):
+    history = inspect(target).attrs.parent_id.history
+    if history.has_changes() and target.parent_id is not None:
+        if target.parent_id in _subtree_ids(connection, target.id):
+            raise ValueError('A category cannot be moved below one of its own subcategories')
+
+
+@event.listens_for(EquipmentCategory, 'after_update')
+def _closure_after_update(mapper, connection, target):
+    if not inspect(target).attrs.parent_id.history.has_changes():
+        return
+    subtree = select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+    # Detach the subtree from every ancestor above the moved node
+    connection.execute(delete(closure).where(and_(
+        closure.c.descendant_id.in_(subtree),
+        closure.c.ancestor_id.not_in(subtree),
+    )))
+    _link_to_parent(connection, target.id, target.parent_id)
+
+
+@event.listens_for(EquipmentCategory, 'before_delete')
+def _closure_before_delete(mapper, connection, target):
+    connection.execute(delete(closure).where(
+        (closure.c.ancestor_id == target.id) | (closure.c.descendant_id == target.id)
+    ))
+
+
+def rebuild_closure():
+    """Recompute the closure table from parent_id"""
+    categories = EquipmentCategory.__table__
+    tree = select(
+        categories.c.id.label('ancestor_id'),
+        categories.c.id.label('descendant_id'),
+        literal(0).label('depth'),
+    ).cte('tree', recursive=True)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, categories.c.id, tree.c.depth + 1)
+        .join(categories, categories.c.parent_id == tree.c.descendant_id)
+    )
+    db.session.execute(delete(closure))
+    db.session.execute(insert(closure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth),
+    ))
+    db.session.commit()
+
+
+def subtree_ids(category_id):
+    """SELECT of the ids of a category and all its subcategories"""
+    return select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+
+
+def in_category(stmt, category_id, model=Equipment):
+    """
+    Restrict an equipment statement to a category and all its subcategories;
+    ``model`` is Equipment or EquipmentSearch
+    """
+    return stmt.join(closure, closure.c.descendant_id == model.category_id).where(
+        closure.c.ancestor_id == category_id)
+
+
+def category_tree():
+    """The whole hierarchy as nested dicts, loaded with one query"""
+    rows = db.session.execute(select(
+        EquipmentCategory.id, EquipmentCategory.parent_id,
+        EquipmentCategory.name, EquipmentCategory.description,
+    ).order_by(EquipmentCategory.name))
+    nodes = {}
+    for row in rows:
+        nodes[row.id] = {
+            'id': row.id,
+            'parent_id': row.parent_id,
+            'name': row.name,
+            'description': row.description,
+            'subcategories': [],
+        }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id'])
+        (parent['subcategories'] if parent else roots).append(node)
+    return roots
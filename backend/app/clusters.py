@@ -0,0 +1,319 @@
+"""
+Map marker clusters from a multi-resolution quadkey aggregation.
+
+Visible operators are bucketed into Web Mercator tiles at every zoom level
+up to ``MAP_CLUSTER_MAX_ZOOM``. Each tile keeps its operator and equipment
+counts, coordinate sums for the centroid and the daily rate range of the
+equipment in it. A map request reads the tiles overlapping its bbox a few
+levels finer than the view's zoom, so its cost depends on the size of the
+viewport, not on how many operators are in it.
+
+The tiles are built on first use and maintained incrementally from write
+events on Operator and Equipment, each write touching one tile per zoom
+level. Those events only see this process's writes, so the tiles are also
+rebuilt from scratch every ``MAP_CLUSTER_MAX_AGE`` seconds. Removing the cheapest or dearest equipment from a tile can't be
+undone from the aggregate alone, so it marks the tile's rate range stale
+and the range is recomputed from the four child tiles (at the finest
+level, from the tile's operators) when the tile is next read.
+"""
+from threading import Lock
+import math
+import time
+
+from sqlalchemy import select
+
+from app import db
+from app.events import on_change
+from app.models import Equipment, ModerationStatus, Operator
+
+DEFAULT_MAX_ZOOM = 14  # finest tiles are about 2.4km wide at the equator
+DEFAULT_MAX_AGE = 300  # seconds
+MAX_LATITUDE = 85.05112878  # Web Mercator cuts off at this latitude
+
+
+def tile_xy(lat, lng, zoom):
+    """Web Mercator tile (x, y) containing the point at ``zoom``"""
+    size = 1 << zoom
+    lat = min(max(lat, -MAX_LATITUDE), MAX_LATITUDE)
+    sin_lat = math.sin(math.radians(lat))
+    x = int((lng + 180.0) / 360.0 * size)
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * size)
+    return min(max(x, 0), size - 1), min(max(y, 0), size - 1)
+
+
+def quadkey(zoom, x, y):
+    """Bing-style quadkey of a tile, one base-4 digit per zoom level"""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+class Tile:
+    """Aggregate of the visible operators inside one tile"""
+    __slots__ = ('operators', 'equipment', 'lat_sum', 'lng_sum', 'min_rate', 'max_rate', 'stale')
+
+    def __init__(self):
+        self.operators = 0
+        self.equipment = 0
+        self.lat_sum = 0.0
+        self.lng_sum = 0.0
+        self.min_rate = None
+        self.max_rate = None
+        self.stale = False
+
+    def include(self, low, high):
+        if low is None or self.stale:
+            return
+        self.min_rate = low if self.min_rate is None else min(self.min_rate, low)
+        self.max_rate = high if self.max_rate is None else max(self.max_rate, high)
+
+    def exclude(self, low, high):
+        if low is not None and not self.stale and (low <= self.min_rate or high >= self.max_rate):
+            self.stale = True
+
+
+class OperatorEntry:
+    __slots__ = ('lat', 'lng', 'visible', 'x', 'y', 'rates')
+
+    def __init__(self):
+        self.lat = self.lng = None
+        self.visible = False
+        self.x = self.y = None  # tile at the finest zoom
+        self.rates = {}  # equipment id -> daily rate
+
+    def rate_range(self):
+        rates = [rate for rate in self.rates.values() if rate is not None]
+        return (min(rates), max(rates)) if rates else (None, None)
+
+
+class ClusterIndex:
+    """Tile aggregates for every zoom level, plus what's needed to update them"""
+
+    def __init__(self, max_zoom=DEFAULT_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self.levels = [{} for _ in range(max_zoom + 1)]  # zoom -> {(x, y): Tile}
+        self.members = {}  # finest (x, y) -> operator ids
+        self.operators = {}  # operator id -> OperatorEntry
+        self.equipment = {}  # equipment id -> operator id
+
+    def _tile_keys(self, entry):
+        for zoom in range(self.max_zoom + 1):
+            shift = self.max_zoom - zoom
+            yield zoom, (entry.x >> shift, entry.y >> shift)
+
+    def _add_operator(self, operator_id, entry):
+        low, high = entry.rate_range()
+        self.members.setdefault((entry.x, entry.y), set()).add(operator_id)
+        for zoom, key in self._tile_keys(entry):
+            tile = self.levels[zoom].get(key)
+            if tile is None:
+                tile = self.levels[zoom][key] = Tile()
+            tile.operators += 1
+            tile.equipment += len(entry.rates)
+            tile.lat_sum += entry.lat
+            tile.lng_sum += entry.lng
+            tile.include(low, high)
+
+    def _remove_operator(self, operator_id, entry):
+        low, high = entry.rate_range()
+        members = self.members[(entry.x, entry.y)]
+        members.discard(operator_id)
+        if not members:
+            del self.members[(entry.x, entry.y)]
+        for zoom, key in self._tile_keys(entry):
+            tile = self.levels[zoom][key]
+            tile.operators -= 1
+            if not tile.operators:
+                del self.levels[zoom][key]
+                continue
+            tile.equipment -= len(entry.rates)
+            tile.lat_sum -= entry.lat
+            tile.lng_sum -= entry.lng
+            tile.exclude(low, high)
+
+    def set_operator(self, operator_id, lat, lng, visible):
+        entry = self.operators.get(operator_id)
+        if entry is None:
+            entry = self.operators[operator_id] = OperatorEntry()
+        elif entry.visible:
+            self._remove_operator(operator_id, entry)
+        entry.lat, entry.lng, entry.visible = lat, lng, visible
+        if visible:
+            entry.x, entry.y = tile_xy(lat, lng, self.max_zoom)
+            self._add_operator(operator_id, entry)
+
+    def remove_operator(self, operator_id):
+        entry = self.operators.pop(operator_id, None)
+        if entry is not None and entry.visible:
+            self._remove_operator(operator_id, entry)
+
+    def set_equipment(self, equipment_id, operator_id, daily_rate):
+        self.remove_equipment(equipment_id)
+        entry = self.operators.get(operator_id)
+        if entry is None:
+            # Listed before its operator was seen, counted once it is
+            entry = self.operators[operator_id] = OperatorEntry()
+        entry.rates[equipment_id] = daily_rate
+        self.equipment[equipment_id] = operator_id
+        if entry.visible:
+            for zoom, key in self._tile_keys(entry):
+                tile = self.levels[zoom][key]
+                tile.equipment += 1
+                tile.include(daily_rate, daily_rate)
+
+    def remove_equipment(self, equipment_id):
+        operator_id = self.equipment.pop(equipment_id, None)
+        entry = self.operators.get(operator_id)
+        if entry is None:
+            return
+        daily_rate = entry.rates.pop(equipment_id, None)
+        if entry.visible:
+            for zoom, key in self._tile_keys(entry):
+                tile = self.levels[zoom][key]
+                tile.equipment -= 1
+                tile.exclude(daily_rate, daily_rate)
+
+    def _refresh(self, zoom, key):
+        """Recompute a stale tile's rate range from its children"""
+        tile = self.levels[zoom][key]
+        tile.min_rate = tile.max_rate = None
+        tile.stale = False
+        if zoom == self.max_zoom:
+            for operator_id in self.members.get(key, ()):
+                tile.include(*self.operators[operator_id].rate_range())
+            return
+        x, y = key
+        children = self.levels[zoom + 1]
+        for child_key in ((2 * x, 2 * y), (2 * x + 1, 2 * y), (2 * x, 2 * y + 1), (2 * x + 1, 2 * y + 1)):
+            child = children.get(child_key)
+            if child is not None:
+                if child.stale:
+                    self._refresh(zoom + 1, child_key)
+                tile.include(child.min_rate, child.max_rate)
+
+    def clusters(self, zoom, x_ranges, y_range, max_tiles):
+        """
+        The tiles at ``zoom`` inside the x ranges and the y range (inclusive
+        tile coordinates) as cluster dicts; raises ValueError if the area
+        spans more than ``max_tiles`` tiles
+        """
+        span = sum(high - low + 1 for low, high in x_ranges) * (y_range[1] - y_range[0] + 1)
+        if span > max_tiles:
+            raise ValueError('bbox is too large for this zoom level')
+        tiles = self.levels[zoom]
+        if span <= len(tiles):
+            keys = [(x, y) for low, high in x_ranges for x in range(low, high + 1)
+                    for y in range(y_range[0], y_range[1] + 1) if (x, y) in tiles]
+        else:
+            keys = [(x, y) for x, y in tiles
+                    if y_range[0] <= y <= y_range[1] and any(low <= x <= high for low, high in x_ranges)]
+
+        result = []
+        for key in sorted(keys):
+            tile = tiles[key]
+            if tile.stale:
+                self._refresh(zoom, key)
+            cluster = {
+                'quadkey': quadkey(zoom, *key),
+                'count': tile.operators,
+                'equipment': tile.equipment,
+                'centroid': {'lat': tile.lat_sum / tile.operators, 'lng': tile.lng_sum / tile.operators},
+                'daily_rate': ({'min': tile.min_rate, 'max': tile.max_rate}
+                               if tile.min_rate is not None else None),
+            }
+            if tile.operators == 1 and zoom == self.max_zoom:
+                cluster['operator_id'] = next(iter(self.members[key]))
+            result.append(cluster)
+        return result
+
+
+def is_visible(moderation_status, deleted_at):
+    """Python side of spatial.visible_operators()"""
+    return moderation_status == ModerationStatus.APPROVED and deleted_at is None
+
+
+class MapClusters:
+    """Process-wide ClusterIndex, built lazily and updated from write events"""
+
+    def __init__(self):
+        self._index = None
+        self._max_zoom = DEFAULT_MAX_ZOOM
+        self._max_age = DEFAULT_MAX_AGE
+        self._built_at = 0
+        self._lock = Lock()
+
+    def configure(self, max_zoom, max_age=DEFAULT_MAX_AGE):
+        with self._lock:
+            self._max_age = max_age
+            if max_zoom != self._max_zoom:
+                self._max_zoom = max_zoom
+                self._index = None
+
+    def _build(self):
+        index = ClusterIndex(self._max_zoom)
+        for row in db.session.execute(select(Operator.id, Operator.latitude, Operator.longitude,
+                                             Operator.moderation_status, Operator.deleted_at)):
+            index.set_operator(row.id, row.latitude, row.longitude,
+                               is_visible(row.moderation_status, row.deleted_at))
+        rows = db.session.execute(
+            select(Equipment.id, Equipment.operator_id, Equipment.daily_rate)
+            .execution_options(yield_per=5000)
+        )
+        for row in rows:
+            index.set_equipment(*row)
+        return index
+
+    def query(self, bbox, zoom, detail, max_tiles):
+        """
+        Clusters inside ``bbox`` (min_lng, min_lat, max_lng, max_lat; min_lng
+        above max_lng crosses the antimeridian) for a map at ``zoom``,
+        aggregated ``detail`` levels finer. Returns (cluster zoom, clusters).
+        """
+        min_lng, min_lat, max_lng, max_lat = bbox
+        with self._lock:
+            if self._index is None or time.monotonic() - self._built_at > self._max_age:
+                self._index = self._build()
+                self._built_at = time.monotonic()
+            index = self._index
+            level = min(zoom + detail, index.max_zoom)
+            west, north = tile_xy(max_lat, min_lng, level)
+            east, south = tile_xy(min_lat, max_lng, level)
+            if min_lng <= max_lng:
+                x_ranges = [(west, east)]
+            else:
+                x_ranges = [(west, (1 << level) - 1), (0, east)]
+            return level, index.clusters(level, x_ranges, (north, south), max_tiles)
+
+    def apply(self, model, action, target):
+        with self._lock:
+            index = self._index
+            if index is None:
+                return
+            if action == 'reset':
+                self._index = None
+            elif model is Operator:
+                if action == 'delete':
+                    index.remove_operator(target.id)
+                else:
+                    index.set_operator(target.id, target.latitude, target.longitude,
+                                       is_visible(target.moderation_status, target.deleted_at))
+            elif model is Equipment:
+                if action == 'delete':
+                    index.remove_equipment(target.id)
+                else:
+                    index.set_equipment(target.id, target.operator_id, target.daily_rate)
+
+
+map_clusters = MapClusters()
+
+
+@on_change(Operator)
+def _update_operator_clusters(action, target):
+    map_clusters.apply(Operator, action, target)
+
+
+@on_change(Equipment)
+def _update_equipment_clusters(action, target):
+    map_clusters.apply(Equipment, action, target)
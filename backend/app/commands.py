@@ -0,0 +1,61 @@
+"""
+Maintenance commands, run with ``flask --app run <group> <command>``.
+"""
+import click
+from flask.cli import AppGroup
+
+categories_cli = AppGroup('categories', help='Equipment category maintenance.')
+compliance_cli = AppGroup('compliance', help='Licence, certification and insurance expiry.')
+localities_cli = AppGroup('localities', help='Suburb and postcode gazetteer.')
+search_cli = AppGroup('search', help='The equipment_search projection.')
+
+
+@categories_cli.command('rebuild-closure')
+def rebuild_category_closure():
+    """Recompute the category closure table from parent_id."""
+    from app.categories import rebuild_closure
+    rebuild_closure()
+    click.echo('Category closure table rebuilt.')
+
+
+@compliance_cli.command('scan')
+@click.option('--full', is_flag=True, help='Rescan every row instead of resuming from the watermark.')
+def scan_compliance_command(full):
+    """Mark lapsed licences, certifications and insurance as expired."""
+    from app.compliance import scan_compliance
+    counts = scan_compliance(full=full)
+    click.echo(', '.join(f'{name}: {count}' for name, count in counts.items()))
+
+
+@localities_cli.command('load')
+@click.argument('path', required=False)
+@click.option('--keep', is_flag=True, help='Add to the existing rows instead of replacing them.')
+def load_localities_command(path, keep):
+    """Bulk load localities from a CSV, by default the bundled sample."""
+    from app.localities import SAMPLE_PATH, load_localities
+    with open(path or SAMPLE_PATH, newline='') as f:
+        report = load_localities(f, replace=not keep)
+    click.echo(f"{report['inserted']} localities loaded, {report['skipped']} already present, "
+               f"{report['failed']} invalid.")
+    for error in report['errors'][:20]:
+        click.echo(f"  line {error['line']}: {error['error']}")
+
+
+@search_cli.command('rebuild')
+def rebuild_search_command():
+    """Recompute the equipment_search projection from equipment, operators and categories."""
+    from app import db
+    from app.events import notify_bulk
+    from app.models import EquipmentSearch
+    from app.projection import rebuild_projection
+    count = rebuild_projection()
+    db.session.commit()
+    notify_bulk(EquipmentSearch)
+    click.echo(f'{count} listings projected.')
+
+
+def register_commands(app):
+    app.cli.add_command(categories_cli)
+    app.cli.add_command(compliance_cli)
+    app.cli.add_command(localities_cli)
+    app.cli.add_command(search_cli)
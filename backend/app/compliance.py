@@ -0,0 +1,180 @@
+"""
+Compliance expiry for licences, certifications and insurance.
+
+``scan_compliance`` marks everything that expired since the last scan, as a
+handful of set-based UPDATEs over range scans of the expiry indexes:
+
+* licences and certifications past their expiry get status 'Expired'
+* electricians whose insurance lapsed, or whose last active licence expired,
+  lose verified_status
+
+The upper bound of each scan is stored in ``scan_watermarks``, so the next
+run only looks at rows that expired after it. Rows written with an expiry
+already behind the watermark are only picked up by a full scan
+(``flask --app run compliance scan --full``).
+
+``expiring_soon`` lists what expires within a window, merged from one
+indexed range scan per kind and paged with a keyset cursor.
+"""
+from datetime import datetime, timedelta
+import heapq
+import logging
+
+from sqlalchemy import and_, exists, func, literal, or_, select, update
+
+from app import db
+from app.events import notify_bulk
+from app.models import Certification, Electrician, License, ScanWatermark
+from app.pagination import decode_keyset, encode_keyset
+from app.tasks import task_queue
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'compliance'
+EXPIRED = 'Expired'
+# Statuses a scan must not overwrite
+FINAL_STATUSES = ('expired', 'suspended')
+
+EXPIRY_TYPES = ('certification', 'insurance', 'license')
+
+
+def _open_status(column):
+    return or_(column.is_(None), func.lower(column).not_in(FINAL_STATUSES))
+
+
+def _expired_between(column, since, until):
+    clauses = [column <= until]
+    if since is not None:
+        clauses.append(column > since)
+    return and_(*clauses)
+
+
+def scan_compliance(now=None, full=False):
+    """Expire everything that lapsed since the last scan; returns row counts"""
+    now = now or datetime.utcnow()
+    state = db.session.get(ScanWatermark, WATERMARK_NAME, with_for_update=True)
+    since = None if full or state is None else state.watermark
+
+    counts = {}
+    counts['licenses'] = db.session.execute(
+        update(License)
+        .where(_expired_between(License.expiry_date, since, now), _open_status(License.status))
+        .values(status=EXPIRED)
+    ).rowcount
+    counts['certifications'] = db.session.execute(
+        update(Certification)
+        .where(_expired_between(Certification.expiry_date, since, now), _open_status(Certification.status))
+        .values(status=EXPIRED)
+    ).rowcount
+    counts['insurance'] = db.session.execute(
+        update(Electrician)
+        .where(_expired_between(Electrician.insurance_expiry, since, now),
+               or_(Electrician.insurance_status.is_(True), Electrician.verified_status.is_(True)))
+        .values(insurance_status=False, verified_status=False)
+    ).rowcount
+
+    # Only unverify electricians left without any active licence
+    lapsed = select(License.electrician_id).where(_expired_between(License.expiry_date, since, now))
+    active_license = exists().where(
+        License.electrician_id == Electrician.id,
+        License.expiry_date > now,
+        _open_status(License.status),
+    )
+    counts['unverified'] = db.session.execute(
+        update(Electrician)
+        .where(Electrician.id.in_(lapsed), Electrician.verified_status.is_(True), ~active_license)
+        .values(verified_status=False)
+    ).rowcount
+
+    if state is None:
+        db.session.add(ScanWatermark(name=WATERMARK_NAME, watermark=now))
+    else:
+        state.watermark = now
+    db.session.commit()
+
+    if any(counts.values()):
+        # The UPDATEs bypass the ORM, so in-process indexes must rebuild
+        notify_bulk(Electrician, License, Certification)
+        logger.info(f'Compliance scan: {counts}')
+    return counts
+
+
+@task_queue.task('scan_compliance')
+def scan_compliance_task():
+    scan_compliance()
+
+
+def _expiring_query(kind, start, end):
+    """Range scan of one kind of expiry, ordered by (expiry, id)"""
+    if kind == 'license':
+        expiry, row_id = License.expiry_date, License.id
+        stmt = select(row_id.label('id'), License.electrician_id.label('electrician_id'),
+                      License.license_type.label('detail'), License.status.label('status'),
+                      expiry.label('expiry_date'), Electrician.full_name.label('full_name')) \
+            .join(Electrician, Electrician.id == License.electrician_id)
+    elif kind == 'certification':
+        expiry, row_id = Certification.expiry_date, Certification.id
+        stmt = select(row_id.label('id'), Certification.electrician_id.label('electrician_id'),
+                      Certification.certification_type.label('detail'),
+                      Certification.status.label('status'), expiry.label('expiry_date'),
+                      Electrician.full_name.label('full_name')) \
+            .join(Electrician, Electrician.id == Certification.electrician_id)
+    else:
+        expiry, row_id = Electrician.insurance_expiry, Electrician.id
+        stmt = select(row_id.label('id'), Electrician.id.label('electrician_id'),
+                      Electrician.insurance_policy_number.label('detail'),
+                      literal(None).label('status'), expiry.label('expiry_date'),
+                      Electrician.full_name.label('full_name'))
+    return stmt.where(expiry >= start, expiry < end), expiry, row_id
+
+
+def expiring_soon(within_days, types=EXPIRY_TYPES, cursor=None, limit=50, now=None):
+    """A page of licences, certifications and insurance expiring soonest first"""
+    now = now or datetime.utcnow()
+    end = now + timedelta(days=within_days)
+    last = decode_keyset(cursor, ('expiry_date', 'type', 'id'))
+    if last is not None:
+        try:
+            last_expiry = datetime.fromisoformat(last['expiry_date'])
+            last_rank = EXPIRY_TYPES.index(last['type'])
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+        if not isinstance(last['id'], int) or last_expiry.tzinfo is not None:
+            raise ValueError('Invalid cursor')
+
+    branches = []
+    for kind in types:
+        rank = EXPIRY_TYPES.index(kind)
+        stmt, expiry, row_id = _expiring_query(kind, now, end)
+        if last is not None:
+            # Rows after the cursor in (expiry, type, id) order
+            if rank > last_rank:
+                stmt = stmt.where(expiry >= last_expiry)
+            elif rank < last_rank:
+                stmt = stmt.where(expiry > last_expiry)
+            else:
+                stmt = stmt.where(or_(expiry > last_expiry,
+                                      and_(expiry == last_expiry, row_id > last['id'])))
+        rows = db.session.execute(stmt.order_by(expiry, row_id).limit(limit + 1))
+        branches.append([(row.expiry_date, rank, row.id, kind, row) for row in rows])
+
+    merged = list(heapq.merge(*branches, key=lambda item: item[:3]))[:limit + 1]
+    next_cursor = None
+    if len(merged) > limit:
+        merged = merged[:limit]
+        expiry_date, rank, row_id, kind, row = merged[-1]
+        next_cursor = encode_keyset(expiry_date=expiry_date.isoformat(), type=kind, id=row_id)
+    items = []
+    for expiry_date, rank, row_id, kind, row in merged:
+        detail = row.detail.value if hasattr(row.detail, 'value') else row.detail
+        items.append({
+            'type': kind,
+            'id': row_id,
+            'electrician_id': row.electrician_id,
+            'electrician_name': row.full_name,
+            'detail': detail,
+            'status': row.status,
+            'expiry_date': expiry_date.isoformat(),
+            'days_left': (expiry_date - now).days,
+        })
+    return {'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,69 @@
+"""
+Conditional GET support based on ``updated_at`` watermarks.
+
+The ETag of a listing is derived from ``max(updated_at)`` and ``count(*)``
+over the filtered rows (plus the query params that shape the body), which is
+one aggregate query. Clients polling with ``If-None-Match`` or
+``If-Modified-Since`` get a 304 without the body ever being built.
+"""
+import hashlib
+import json
+
+from flask import Response, request
+from sqlalchemy import func, select
+
+from app import db
+
+
+def watermark(*columns, where=(), joins=()):
+    """
+    Return (last_modified, count) for the rows matching ``where``.
+
+    ``columns`` are the ``updated_at`` columns of every table that contributes
+    to the response; last_modified is the latest of them.
+    """
+    stmt = select(*[func.max(column) for column in columns], func.count())
+    stmt = stmt.select_from(columns[0].table)
+    for target, onclause in joins:
+        stmt = stmt.join(target, onclause)
+    for clause in where:
+        stmt = stmt.where(clause)
+    row = db.session.execute(stmt).one()
+    timestamps = [value for value in row[:-1] if value is not None]
+    return (max(timestamps) if timestamps else None), row[-1]
+
+
+def make_etag(endpoint, mark, params=None):
+    last_modified, count = mark
+    payload = json.dumps(
+        [endpoint, last_modified.isoformat() if last_modified else None, count, params or {}],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def is_not_modified(etag, last_modified):
+    """Check the request's conditional headers against this resource"""
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def conditional(endpoint, mark, params, build_response):
+    """
+    Return a 304 if the client's copy is current, otherwise build the
+    response and tag it with the ETag and Last-Modified headers
+    """
+    etag = make_etag(endpoint, mark, params)
+    last_modified = mark[0]
+    if is_not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = build_response()
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
@@ -0,0 +1,84 @@
+"""
+Write hooks shared by the in-process indexes and caches.
+
+Anything that keeps derived state in memory (spatial index, caches, search
+index, ...) registers a callback for the models it is built from. The
+callback is called as ``callback(action, target)`` where action is one of
+'insert', 'update' or 'delete'.
+
+Writes that bypass the ORM unit of work (bulk inserts, set-based UPDATEs)
+don't fire mapper events, so code doing them must call ``notify_bulk``.
+Listeners then get ``callback('reset', None)`` and should rebuild from
+scratch. The same happens when a transaction that already flushed changes
+is rolled back.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('insert', 'update', 'delete')
+
+# model class -> list of callbacks
+_listeners = {}
+
+
+def on_change(*models):
+    """Decorator registering a callback for writes to the given models"""
+    def decorator(callback):
+        for model in models:
+            if model not in _listeners:
+                _listeners[model] = []
+                for action in ACTIONS:
+                    event.listen(model, f'after_{action}', _make_dispatcher(model, action))
+            if callback not in _listeners[model]:
+                _listeners[model].append(callback)
+        return callback
+    return decorator
+
+
+def notify_bulk(*models):
+    """Tell listeners that rows of these models changed outside the ORM"""
+    for callback in _callbacks_for(models):
+        _call(callback, 'reset', None)
+
+
+def _callbacks_for(models):
+    seen = []
+    for model in models:
+        for callback in _listeners.get(model, []):
+            if callback not in seen:
+                seen.append(callback)
+    return seen
+
+
+def _call(callback, action, target):
+    try:
+        callback(action, target)
+    except Exception:
+        # A broken listener must never fail the write that triggered it
+        logger.exception(f'Change listener {callback.__name__} failed on {action}')
+
+
+def _make_dispatcher(model, action):
+    def dispatch(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault('changed_models', set()).add(model)
+        for callback in list(_listeners.get(model, [])):
+            _call(callback, action, target)
+    return dispatch
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_changed_models(session):
+    session.info.pop('changed_models', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_after_rollback(session):
+    # Listeners already saw the flushed changes; have them rebuild instead
+    changed = session.info.pop('changed_models', None)
+    if changed:
+        notify_bulk(*changed)
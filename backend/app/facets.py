@@ -0,0 +1,395 @@
+"""
+Faceted filtering over equipment with precomputed facet counts.
+
+Every facet value (category, daily rate bucket, availability, operator
+state) keeps a bitmap of the equipment ids that have it, stored as a Python
+int with bit N set for equipment id N. Filtering is then AND/OR of a few
+bitmaps and each facet count is one popcount, instead of a GROUP BY per
+facet per request.
+
+Counts are "disjunctive": the counts of a facet are computed with every
+filter applied except that facet's own, so the UI can show how many results
+picking another value would give.
+
+The index is read from the ``equipment_search`` projection (see
+app/projection.py), so only equipment of visible operators is counted,
+like the listings themselves, and each listing's operator state comes
+with it.
+
+The index is built in a background thread: when a worker starts (see
+gunicorn.conf.py), then again every ``FACET_INDEX_MAX_AGE`` seconds to pick
+up writes made by other processes, and after bulk writes. Requests keep
+using the previous index meanwhile; only a request arriving before the
+first build has finished waits for it. The rows the projection writes in
+this process are applied to the current index right away, and replayed
+onto an index that was being built while they were written.
+"""
+from threading import Condition, Lock, Thread
+import bisect
+import logging
+import time
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.events import on_change
+from app.models import Equipment, EquipmentCategory, EquipmentSearch, Operator
+
+logger = logging.getLogger(__name__)
+
+# Daily rate bucket edges, the last bucket is open ended
+DEFAULT_RATE_BUCKETS = (0, 100, 250, 500, 1000)
+DEFAULT_MAX_AGE = 300  # seconds
+
+FACETS = ('category', 'daily_rate', 'availability_status', 'state')
+
+
+def iter_bits(bitmap, after=None):
+    """Yield the positions of set bits in increasing order, starting after ``after``"""
+    if after is not None:
+        bitmap &= ~((1 << (after + 1)) - 1)
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+def bitmap_of(ids):
+    """Bitmap with the bits of ``ids`` (a list or integer array) set, built in one pass"""
+    if len(ids) == 0:
+        return 0
+    flags = np.zeros(int(np.max(ids)) + 1, dtype=bool)
+    flags[ids] = True
+    return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+
+def rate_bucket_labels(edges):
+    labels = []
+    for low, high in zip(edges, edges[1:]):
+        labels.append(f'{low}-{high}')
+    labels.append(f'{edges[-1]}+')
+    return labels
+
+
+def validate_rate_buckets(values, edges):
+    """Raise ValueError for daily_rate filter values that aren't bucket labels"""
+    labels = rate_bucket_labels(edges) + ['unpriced']
+    for value in values:
+        if value not in labels:
+            raise ValueError(f"Unknown daily_rate bucket: {value}, expected one of {', '.join(labels)}")
+
+
+class FacetIndex:
+    """Bitmaps per facet value plus what's needed to keep them up to date"""
+
+    def __init__(self, rate_buckets=DEFAULT_RATE_BUCKETS):
+        self.rate_buckets = tuple(rate_buckets)
+        self.rate_labels = rate_bucket_labels(self.rate_buckets)
+        self.bitmaps = {facet: {} for facet in FACETS}
+        self.all = 0
+        self.doc_values = {}  # equipment id -> its value of each facet, in FACETS order
+        self.categories = {}  # category id -> (name, parent_id)
+
+    def rate_bucket(self, daily_rate):
+        if daily_rate is None:
+            return 'unpriced'
+        # Rates below the first edge go in the first bucket
+        return self.rate_labels[max(bisect.bisect_right(self.rate_buckets, daily_rate) - 1, 0)]
+
+    def _set(self, facet, value, bit, on):
+        bitmaps = self.bitmaps[facet]
+        if on:
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+        else:
+            bitmaps[value] = bitmaps.get(value, 0) & ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+
+    def load(self, rows):
+        """
+        Fill an empty index from (id, category_id, daily_rate,
+        availability_status, operator_state) rows. Each bitmap is built once
+        from an id array, instead of growing a big int row by row.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        ids, category_ids, rates, available, states = zip(*rows)
+        id_array = np.array(ids, dtype=np.int64)
+        rate_array = np.array(rates, dtype=float)  # None becomes NaN
+        labels = self.rate_labels + ['unpriced']
+        bucket_codes = np.searchsorted(self.rate_buckets, rate_array, side='right') - 1
+        bucket_codes = np.where(np.isnan(rate_array), len(self.rate_labels), np.maximum(bucket_codes, 0))
+        columns = {
+            'category': list(category_ids),
+            'daily_rate': [labels[code] for code in bucket_codes.tolist()],
+            'availability_status': [bool(value) for value in available],
+            'state': list(states),
+        }
+
+        for facet, values in columns.items():
+            # Number the distinct values, then group the ids by number with
+            # one integer sort per facet
+            numbers = {}
+            codes = np.fromiter((numbers.setdefault(value, len(numbers)) for value in values),
+                                dtype=np.int64, count=len(values))
+            order = np.argsort(codes, kind='stable')
+            starts = np.searchsorted(codes[order], np.arange(len(numbers) + 1))
+            self.bitmaps[facet] = {
+                value: bitmap_of(id_array[order[starts[i]:starts[i + 1]]])
+                for value, i in numbers.items()
+            }
+        self.all = bitmap_of(id_array)
+        self.doc_values = dict(zip(ids, zip(*(columns[facet] for facet in FACETS))))
+
+    def add_equipment(self, equipment_id, category_id, daily_rate, availability_status, state):
+        self.remove_equipment(equipment_id)
+        bit = 1 << equipment_id
+        values = (category_id, self.rate_bucket(daily_rate), bool(availability_status), state)
+        for facet, value in zip(FACETS, values):
+            self._set(facet, value, bit, True)
+        self.doc_values[equipment_id] = values
+        self.all |= bit
+
+    def remove_equipment(self, equipment_id):
+        values = self.doc_values.pop(equipment_id, None)
+        if values is None:
+            return
+        bit = 1 << equipment_id
+        for facet, value in zip(FACETS, values):
+            self._set(facet, value, bit, False)
+        self.all &= ~bit
+
+    def apply(self, kind, values):
+        """Apply a change recorded by ``EquipmentFacets``"""
+        if kind == 'projection':
+            removed_ids, rows = values
+            for equipment_id in removed_ids:
+                self.remove_equipment(equipment_id)
+            for row in rows:
+                self.add_equipment(*row)
+        elif kind == 'category':
+            category_id, name, parent_id = values
+            self.categories[category_id] = (name, parent_id)
+        elif kind == 'category_delete':
+            self.categories.pop(values, None)
+
+    def category_bitmaps(self):
+        """Bitmap of each category including everything in its subcategories"""
+        children = {}
+        for category_id, (name, parent_id) in self.categories.items():
+            children.setdefault(parent_id, []).append(category_id)
+        own = self.bitmaps['category']
+        result = {}
+
+        def collect(category_id, seen):
+            bitmap = own.get(category_id, 0)
+            for child_id in children.get(category_id, ()):
+                if child_id not in seen:  # guard against cycles
+                    seen.add(child_id)
+                    bitmap |= collect(child_id, seen)
+            result[category_id] = bitmap
+            return bitmap
+
+        for category_id in self.categories:
+            if category_id not in result:
+                collect(category_id, {category_id})
+        return result
+
+    def _filter_bitmap(self, facet, values, category_bitmaps):
+        bitmaps = category_bitmaps if facet == 'category' else self.bitmaps[facet]
+        bitmap = 0
+        for value in values:
+            bitmap |= bitmaps.get(value, 0)
+        return bitmap
+
+    def query(self, filters):
+        """
+        Apply ``filters`` ({facet: [values]}, values OR-ed within a facet and
+        AND-ed across facets) and return (result bitmap, facet counts)
+        """
+        category_bitmaps = self.category_bitmaps()
+        masks = {
+            facet: self._filter_bitmap(facet, values, category_bitmaps)
+            for facet, values in filters.items() if values
+        }
+        result = self.all
+        for mask in masks.values():
+            result &= mask
+
+        counts = {}
+        for facet in FACETS:
+            base = self.all
+            for other, mask in masks.items():
+                if other != facet:
+                    base &= mask
+            if facet == 'category':
+                counts[facet] = [
+                    {'id': category_id, 'name': name, 'parent_id': parent_id,
+                     'count': (category_bitmaps[category_id] & base).bit_count()}
+                    for category_id, (name, parent_id) in sorted(self.categories.items())
+                ]
+            elif facet == 'daily_rate':
+                bitmaps = self.bitmaps[facet]
+                counts[facet] = [
+                    {'value': label, 'count': (bitmaps.get(label, 0) & base).bit_count()}
+                    for label in self.rate_labels + ['unpriced']
+                ]
+            else:
+                counts[facet] = sorted(
+                    ({'value': value, 'count': (bitmap & base).bit_count()}
+                     for value, bitmap in self.bitmaps[facet].items()),
+                    key=lambda item: (-item['count'], str(item['value'])),
+                )
+        return result, counts
+
+
+def projected_values(row):
+    """The facet index columns of an ``equipment_search`` row (a dict), in load order"""
+    return (row['id'], row['category_id'], row['daily_rate'], row['availability_status'],
+            row['operator_state'])
+
+
+def build_facet_index(rate_buckets=DEFAULT_RATE_BUCKETS):
+    index = FacetIndex(rate_buckets)
+    for row in db.session.execute(select(EquipmentCategory.id, EquipmentCategory.name,
+                                         EquipmentCategory.parent_id)):
+        index.categories[row.id] = (row.name, row.parent_id)
+    index.load(db.session.execute(
+        select(EquipmentSearch.id, EquipmentSearch.category_id, EquipmentSearch.daily_rate,
+               EquipmentSearch.availability_status, EquipmentSearch.operator_state)
+        .execution_options(yield_per=5000)
+    ).tuples())
+    return index
+
+
+class EquipmentFacets:
+    """Process-wide FacetIndex, rebuilt in the background and fed by projection writes"""
+
+    def __init__(self):
+        self._index = None
+        self._rate_buckets = DEFAULT_RATE_BUCKETS
+        self._max_age = DEFAULT_MAX_AGE
+        self._built_at = 0
+        self._stale = False  # a bulk write or rollback asked for a rebuild
+        self._pending = None  # changes seen while a build runs, None when idle
+        self._generation = 0  # bumped to discard builds started before it
+        self._lock = Lock()
+        self._built = Condition(self._lock)
+
+    def configure(self, rate_buckets, max_age=DEFAULT_MAX_AGE):
+        with self._lock:
+            self._max_age = max_age
+            if tuple(rate_buckets) != self._rate_buckets:
+                self._rate_buckets = tuple(rate_buckets)
+                self._index = None
+                self._generation += 1
+
+    def invalidate(self):
+        """Drop the index, the next query waits for a fresh build"""
+        with self._lock:
+            self._index = None
+            self._generation += 1
+
+    def wait(self, timeout=None):
+        """Block until no build is running, returns whether an index is loaded"""
+        with self._lock:
+            self._built.wait_for(lambda: self._pending is None, timeout)
+            return self._index is not None
+
+    def warm(self, app):
+        """Start building in the background, e.g. when a worker starts"""
+        self.configure(app.config['FACET_RATE_BUCKETS'], app.config['FACET_INDEX_MAX_AGE'])
+        self._start_build(app)
+
+    def _start_build(self, app):
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+            rate_buckets, generation = self._rate_buckets, self._generation
+        Thread(target=self._build, args=(app, rate_buckets, generation), name='facet-index', daemon=True).start()
+
+    def _build(self, app, rate_buckets, generation):
+        started = time.monotonic()
+        index = None
+        try:
+            with app.app_context():
+                try:
+                    index = build_facet_index(rate_buckets)
+                finally:
+                    db.session.remove()
+            logger.info(f'Facet index built in {time.monotonic() - started:.2f}s')
+        except Exception:
+            logger.exception('Facet index build failed')
+        with self._lock:
+            pending, self._pending = self._pending, None
+            # Reconfigured or invalidated while building, this one is of no use
+            rebuild = index is not None and generation != self._generation
+            if index is not None and not rebuild:
+                # Writes that happened during the build may or may not be
+                # in what it read; applying them again is idempotent
+                for kind, values in pending:
+                    if kind != 'reset':
+                        index.apply(kind, values)
+                self._index = index
+                self._built_at = started
+                self._stale = any(kind == 'reset' for kind, values in pending)
+            self._built.notify_all()
+        if rebuild:
+            self._start_build(app)
+
+    def query(self, filters):
+        with self._lock:
+            expired = (self._index is None or self._stale
+                       or time.monotonic() - self._built_at > self._max_age)
+        if expired:
+            self._start_build(current_app._get_current_object())
+        with self._lock:
+            while self._index is None:
+                if self._pending is None:
+                    raise RuntimeError('Facet index build failed')
+                self._built.wait()
+            return self._index.query(filters)
+
+    def apply(self, kind, values=None):
+        """
+        Apply a write: ('projection', (removed ids, projected rows)),
+        ('category', (id, name, parent_id)), ('category_delete', id) or
+        ('reset', None) to rebuild
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((kind, values))
+            if kind == 'reset':
+                # Keep serving the current index until the rebuild is done
+                self._stale = True
+            elif self._index is not None:
+                self._index.apply(kind, values)
+
+    def replace(self, removed_ids, rows):
+        """Apply a projection write: rows deleted by id, then projection rows (dicts) inserted"""
+        self.apply('projection', (list(removed_ids), [projected_values(row) for row in rows]))
+
+
+equipment_facets = EquipmentFacets()
+
+
+@on_change(Equipment, Operator, EquipmentSearch)
+def _reset_facets(action, target):
+    # Row-level writes reach the index through the projection; only bulk
+    # writes and rollbacks need a rebuild
+    if action == 'reset':
+        equipment_facets.apply('reset')
+
+
+@on_change(EquipmentCategory)
+def _update_category_facets(action, target):
+    if action == 'reset':
+        equipment_facets.apply('reset')
+    elif action == 'delete':
+        equipment_facets.apply('category_delete', target.id)
+    else:
+        equipment_facets.apply('category', (target.id, target.name, target.parent_id))
@@ -0,0 +1,203 @@
+"""
+Bulk CSV import of equipment listings for an operator.
+
+The CSV is parsed one row at a time and valid rows are written in batches:
+a multi-row executemany INSERT, or ``COPY ... FROM STDIN`` on Postgres. The
+whole file goes in one transaction, and invalid rows are reported with their
+line number instead of aborting the import.
+
+Expected columns (header row required):
+
+    name, category, description, specifications, daily_rate, weekly_rate,
+    monthly_rate, availability_status
+
+``name`` and ``category`` are required; ``category`` is a category name and
+``specifications`` a JSON object.
+"""
+from datetime import datetime
+import csv
+import io
+import json
+import math
+
+from sqlalchemy import func, insert, select
+
+from app import db
+from app.events import notify_bulk
+from app.models import Equipment, EquipmentCategory
+from app.projection import rebuild_projection
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = ('name', 'category')
+RATE_COLUMNS = ('daily_rate', 'weekly_rate', 'monthly_rate')
+
+# Columns written for each row, in COPY order
+INSERT_COLUMNS = (
+    'operator_id', 'category_id', 'name', 'description', 'specifications',
+    'daily_rate', 'weekly_rate', 'monthly_rate', 'availability_status',
+    'created_at', 'updated_at',
+)
+
+TRUE_VALUES = ('true', 'yes', 'y', '1', 'available')
+FALSE_VALUES = ('false', 'no', 'n', '0', 'unavailable')
+
+
+class RowError(ValueError):
+    pass
+
+
+def load_category_map():
+    """Map lowercased category names to ids, loaded once per import"""
+    rows = db.session.execute(select(func.lower(EquipmentCategory.name), EquipmentCategory.id))
+    return dict(rows.all())
+
+
+def parse_rate(value, column):
+    if value is None or value.strip() == '':
+        return None
+    try:
+        rate = float(value.replace('$', '').replace(',', ''))
+    except ValueError:
+        raise RowError(f'{column} must be a number')
+    # float() also accepts nan and inf
+    if not math.isfinite(rate):
+        raise RowError(f'{column} must be a number')
+    if rate < 0:
+        raise RowError(f'{column} cannot be negative')
+    return rate
+
+
+def parse_availability(value):
+    if value is None or value.strip() == '':
+        return True
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError('availability_status must be true or false')
+
+
+def validate_row(row, operator_id, categories, now):
+    """Turn a CSV row into column values for Equipment, or raise RowError"""
+    for column in REQUIRED_COLUMNS:
+        if not (row.get(column) or '').strip():
+            raise RowError(f'{column} is required')
+
+    name = row['name'].strip()
+    if len(name) > Equipment.name.type.length:
+        raise RowError(f'name is longer than {Equipment.name.type.length} characters')
+
+    category_id = categories.get(row['category'].strip().lower())
+    if category_id is None:
+        raise RowError(f"Unknown category: {row['category'].strip()}")
+
+    specifications = (row.get('specifications') or '').strip() or None
+    if specifications is not None:
+        try:
+            specifications = json.loads(specifications)
+        except ValueError:
+            raise RowError('specifications must be valid JSON')
+        if not isinstance(specifications, dict):
+            raise RowError('specifications must be a JSON object')
+
+    values = {
+        'operator_id': operator_id,
+        'category_id': category_id,
+        'name': name,
+        'description': (row.get('description') or '').strip() or None,
+        'specifications': specifications,
+        'availability_status': parse_availability(row.get('availability_status')),
+        'created_at': now,
+        'updated_at': now,
+    }
+    for column in RATE_COLUMNS:
+        values[column] = parse_rate(row.get(column), column)
+    return values
+
+
+def _write_batch(batch, use_copy):
+    if use_copy:
+        _copy_batch(batch)
+    else:
+        db.session.execute(insert(Equipment), batch)
+
+
+def _copy_batch(batch):
+    """Write a batch with Postgres COPY through the session's connection"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for values in batch:
+        row = dict(values)
+        if row['specifications'] is not None:
+            row['specifications'] = json.dumps(row['specifications'])
+        writer.writerow(['' if row[column] is None else row[column] for column in INSERT_COLUMNS])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY equipment ({', '.join(INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def import_equipment_csv(stream, operator_id, batch_size=DEFAULT_BATCH_SIZE, use_copy=None):
+    """
+    Import equipment rows from a text stream of CSV for ``operator_id``.
+
+    Returns a report dict with the number of rows read and inserted, and the
+    per-row errors (line numbers count the header as line 1). A file that
+    isn't valid CSV raises ValueError and imports nothing.
+    """
+    if use_copy is None:
+        use_copy = db.engine.dialect.name == 'postgresql'
+
+    reader = csv.DictReader(stream)
+    try:
+        fieldnames = reader.fieldnames or []
+    except csv.Error as e:
+        raise ValueError(f'Malformed CSV header: {e}')
+    missing = [column for column in REQUIRED_COLUMNS if column not in fieldnames]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    categories = load_category_map()
+    now = datetime.utcnow()
+    report = {'rows': 0, 'inserted': 0, 'failed': 0, 'errors': []}
+    batch = []
+    try:
+        for row in reader:
+            report['rows'] += 1
+            try:
+                batch.append(validate_row(row, operator_id, categories, now))
+            except RowError as e:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'line': reader.line_num, 'error': str(e)})
+                continue
+            if len(batch) >= batch_size:
+                _write_batch(batch, use_copy)
+                report['inserted'] += len(batch)
+                batch = []
+        if batch:
+            _write_batch(batch, use_copy)
+            report['inserted'] += len(batch)
+        # The search projection only follows ORM writes
+        rebuild_projection(operator_id)
+        db.session.commit()
+    except csv.Error as e:
+        # The rest of the file can't be parsed, so nothing is imported.
+        # line_num counts the lines read before the one that failed
+        db.session.rollback()
+        raise ValueError(f'Malformed CSV at line {reader.line_num + 1}: {e}')
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # The batched inserts bypass the ORM, so in-process indexes must rebuild
+    notify_bulk(Equipment)
+    return report
@@ -0,0 +1,249 @@
+"""
+Durable background jobs.
+
+Jobs are rows in the ``jobs`` table, run by ``worker.py`` outside the web
+process. A job names a task registered with ``task_queue.task`` and carries
+its kwargs as a JSON payload, so the same functions run on the in-process
+task queue and here.
+
+Claiming a batch selects due pending jobs ``FOR UPDATE SKIP LOCKED`` on
+Postgres, so several workers take disjoint batches without blocking each
+other. SQLite has no row locks and ignores the clause; there the claim is an
+``UPDATE ... WHERE status = 'pending'``, which SQLite serializes, and each
+worker only runs the rows stamped with its own claim token.
+
+Tasks must be idempotent: a job is retried with exponential backoff when it
+raises, and a job left running by a crashed worker is released after
+``JOB_LOCK_TIMEOUT`` and run again. Either way it fails for good after
+``max_attempts`` runs.
+"""
+from datetime import datetime, timedelta
+import logging
+import math
+import time
+import uuid
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Job, JobStatus
+from app.tasks import task_queue
+
+logger = logging.getLogger(__name__)
+
+# Periodic tasks the scheduler enqueues: name -> interval in seconds
+PERIODIC_TASKS = {
+    'expire_rfqs': 300,
+    'remind_rfq_recipients': 900,
+    'send_availability_alerts': 300,
+    'scan_compliance': 3600,
+}
+
+LATENCY_SAMPLE_SIZE = 1000
+
+
+def schedule(name, payload=None, run_at=None, dedupe_key=None, max_attempts=None):
+    """
+    Add a job, returning its id. With a ``dedupe_key`` the job is only added
+    once, later calls return None. The insert runs in its own transaction so
+    the caller's session is untouched.
+    """
+    if name not in task_queue.tasks:
+        raise KeyError(f'Unknown task: {name}')
+    now = datetime.utcnow()
+    values = {
+        'name': name,
+        'payload': payload or {},
+        'dedupe_key': dedupe_key,
+        'status': JobStatus.PENDING,
+        'attempts': 0,
+        'max_attempts': max_attempts or task_queue.app.config['JOB_MAX_ATTEMPTS'],
+        'run_at': run_at or now,
+        'created_at': now,
+    }
+    try:
+        with db.engine.begin() as connection:
+            return _insert_job(connection, values)
+    except IntegrityError:
+        return None
+
+
+def _insert_job(connection, values):
+    if values['dedupe_key'] is not None and connection.execute(
+        select(Job.id).where(Job.dedupe_key == values['dedupe_key'])
+    ).first():
+        return None
+    return connection.execute(insert(Job).values(**values).returning(Job.id)).scalar_one()
+
+
+def schedule_periodic(now=None):
+    """
+    Enqueue each periodic task once per interval. The dedupe key is the
+    interval slot, so running several schedulers doesn't duplicate work.
+    """
+    now = now or datetime.utcnow()
+    epoch = now.timestamp()
+    scheduled = 0
+    for name, interval in PERIODIC_TASKS.items():
+        slot = math.floor(epoch / interval)
+        if schedule(name, run_at=now, dedupe_key=f'{name}:{slot}') is not None:
+            scheduled += 1
+    return scheduled
+
+
+def release_stale(lock_timeout):
+    """
+    Put jobs whose worker died mid-run back in the queue. The claim already
+    counted the run as an attempt, so a job that keeps killing its worker
+    is marked failed once it has used up its attempts.
+    """
+    now = datetime.utcnow()
+    stale = (Job.status == JobStatus.RUNNING, Job.locked_at < now - timedelta(seconds=lock_timeout))
+    error = f'Lock expired after {lock_timeout:g}s, the worker probably died'
+    failed = db.session.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status=JobStatus.FAILED, locked_by=None, locked_at=None, finished_at=now,
+                last_error=error)
+    )
+    released = db.session.execute(
+        update(Job)
+        .where(*stale)
+        .values(status=JobStatus.PENDING, locked_by=None, locked_at=None, last_error=error)
+    )
+    db.session.commit()
+    if failed.rowcount:
+        logger.error(f'Failed {failed.rowcount} stale jobs that used up their attempts')
+    if released.rowcount:
+        logger.warning(f'Released {released.rowcount} stale jobs')
+    return released.rowcount
+
+
+def claim_batch(worker_id, batch_size):
+    """Claim up to ``batch_size`` due jobs for this worker"""
+    now = datetime.utcnow()
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    due = (
+        select(Job.id)
+        .where(Job.status == JobStatus.PENDING, Job.run_at <= now)
+        .order_by(Job.run_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    ids = db.session.execute(due).scalars().all()
+    if not ids:
+        db.session.rollback()
+        return []
+    db.session.execute(
+        update(Job)
+        .where(Job.id.in_(ids), Job.status == JobStatus.PENDING)
+        .values(status=JobStatus.RUNNING, locked_by=token, locked_at=now,
+                attempts=Job.attempts + 1)
+    )
+    db.session.commit()
+    return db.session.execute(
+        select(Job).where(Job.locked_by == token).order_by(Job.run_at)
+    ).scalars().all()
+
+
+def retry_delay(attempts, base, maximum):
+    """Exponential backoff: base, 2 * base, 4 * base, ... capped at maximum"""
+    return min(base * 2 ** (attempts - 1), maximum)
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome"""
+    config = task_queue.app.config
+    job_id, name, payload = job.id, job.name, dict(job.payload)
+    attempts, max_attempts = job.attempts, job.max_attempts
+    started_at = datetime.utcnow()
+    try:
+        task_queue.tasks[name](**payload)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        finished_at = datetime.utcnow()
+        values = {'locked_by': None, 'locked_at': None, 'started_at': started_at,
+                  'finished_at': finished_at, 'last_error': f'{type(e).__name__}: {e}'}
+        if attempts >= max_attempts:
+            values['status'] = JobStatus.FAILED
+            logger.exception(f'Job {job_id} ({name}) failed after {attempts} attempts')
+        else:
+            delay = retry_delay(attempts, config['JOB_RETRY_BASE'], config['JOB_RETRY_MAX'])
+            values['status'] = JobStatus.PENDING
+            values['run_at'] = finished_at + timedelta(seconds=delay)
+            logger.warning(f'Job {job_id} ({name}) failed, retrying in {delay}s: {e}')
+        db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+        return False
+
+    db.session.execute(update(Job).where(Job.id == job_id).values(
+        status=JobStatus.SUCCEEDED, locked_by=None, locked_at=None,
+        started_at=started_at, finished_at=datetime.utcnow(), last_error=None,
+    ))
+    db.session.commit()
+    return True
+
+
+def purge_finished(retention_days):
+    """Delete succeeded jobs older than the retention period"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    db.session.execute(delete(Job).where(Job.status == JobStatus.SUCCEEDED, Job.finished_at < cutoff))
+    db.session.commit()
+
+
+def work(worker_id, once=False, scheduler=True):
+    """Worker loop: schedule periodic tasks, then drain due jobs in batches"""
+    config = task_queue.app.config
+    while True:
+        if scheduler:
+            schedule_periodic()
+            purge_finished(config['JOB_RETENTION_DAYS'])
+        release_stale(config['JOB_LOCK_TIMEOUT'])
+        while True:
+            jobs = claim_batch(worker_id, config['JOB_BATCH_SIZE'])
+            if not jobs:
+                break
+            for job in jobs:
+                run_job(job)
+            db.session.expire_all()
+        if once:
+            return
+        time.sleep(config['JOB_POLL_INTERVAL'])
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 3)
+
+
+def queue_stats():
+    """Queue depth by status, backlog age and recent job latency"""
+    now = datetime.utcnow()
+    depth = {status.value: 0 for status in JobStatus}
+    for status, count in db.session.execute(select(Job.status, func.count()).group_by(Job.status)):
+        depth[status.value] = count
+    due, oldest = db.session.execute(
+        select(func.count(), func.min(Job.run_at))
+        .where(Job.status == JobStatus.PENDING, Job.run_at <= now)
+    ).one()
+    recent = db.session.execute(
+        select(Job.run_at, Job.started_at, Job.finished_at)
+        .where(Job.status == JobStatus.SUCCEEDED, Job.finished_at.is_not(None))
+        .order_by(Job.finished_at.desc())
+        .limit(LATENCY_SAMPLE_SIZE)
+    ).all()
+    # Wait is due time to start, so backoff delays don't count as latency
+    wait = [(row.started_at - row.run_at).total_seconds() for row in recent]
+    runtime = [(row.finished_at - row.started_at).total_seconds() for row in recent]
+    return {
+        'depth': depth,
+        'due': due,
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'wait_seconds': {'p50': _percentile(wait, 50), 'p95': _percentile(wait, 95)},
+        'runtime_seconds': {'p50': _percentile(runtime, 50), 'p95': _percentile(runtime, 95)},
+        'sample_size': len(recent),
+    }
@@ -0,0 +1,96 @@
+"""
+Filters on JSON document columns, run in the database.
+
+Postgres stores the documents as JSONB. Containment is ``@>``, which the GIN
+(jsonb_path_ops) indexes answer, and numbers are read with ``->>``. SQLite
+keeps JSON as text, so the same filters use its JSON1 functions:
+``json_each`` for array membership and ``json_extract`` for keys.
+
+``json_filter`` parses the ``spec`` query parameter of the listing
+endpoints, e.g. ``power_kw>=20`` or ``brand=Kubota``.
+"""
+import re
+
+from sqlalchemy import and_, case, exists, func, literal, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app import db
+
+FILTER_RE = re.compile(r'^\s*([A-Za-z0-9_]+)\s*(>=|<=|>|<|=)\s*(.+?)\s*$')
+
+COMPARISONS = {
+    '>=': lambda column, value: column >= value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '<': lambda column, value: column < value,
+}
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _sqlite_path(path):
+    return '$' + ''.join(f'."{key}"' for key in path)
+
+
+def _sqlite_contains(column, path, value):
+    if isinstance(value, dict):
+        return and_(*[_sqlite_contains(column, path + [key], item) for key, item in value.items()])
+    if isinstance(value, list):
+        clauses = []
+        for item in value:
+            items = func.json_each(column, _sqlite_path(path)).table_valued('value')
+            clauses.append(exists(select(literal(1)).select_from(items).where(items.c.value == item)))
+        return and_(*clauses)
+    return func.json_extract(column, _sqlite_path(path)) == value
+
+
+def json_contains(column, value):
+    """
+    Clause matching documents that contain ``value``: a dict of (nested)
+    key/values, or a list of items an array must include. A scalar is
+    treated as a one item list.
+    """
+    if not isinstance(value, (dict, list)):
+        value = [value]
+    if _is_postgres():
+        return type_coerce(column, JSONB).contains(value)
+    return _sqlite_contains(column, [], value)
+
+
+def json_number(column, key):
+    """A numeric key of a document, NULL when missing or not a number"""
+    if _is_postgres():
+        return case((func.jsonb_typeof(column[key]) == 'number', column[key].as_float()))
+    path = _sqlite_path([key])
+    return case((func.json_type(column, path).in_(('integer', 'real')), func.json_extract(column, path)))
+
+
+def parse_value(text):
+    """Interpret a filter value as a number or boolean when it looks like one"""
+    lowered = text.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return int(number) if number.is_integer() else number
+
+
+def json_filter(column, expression):
+    """
+    Clause for a ``key<op>value`` expression: ``=`` is containment, the
+    comparisons (>=, <=, >, <) need a number and compare numerically
+    """
+    match = FILTER_RE.match(expression)
+    if match is None:
+        raise ValueError(f'Invalid filter: {expression}')
+    key, op, text = match.groups()
+    value = parse_value(text)
+    if op == '=':
+        return json_contains(column, {key: value})
+    if isinstance(value, (bool, str)):
+        raise ValueError(f'{key}{op} needs a number')
+    return COMPARISONS[op](json_number(column, key), value)
@@ -0,0 +1,259 @@
+"""
+Local gazetteer of Australian suburbs and postcodes.
+
+Searches by suburb or postcode are resolved against the ``localities``
+table instead of an external geocoding service. The table is loaded in
+bulk from a CSV with the columns
+
+    suburb, state, postcode, latitude, longitude
+
+``data/localities_sample.csv`` is a small hand-made sample (the capital
+cities, the regional centres used by the load-test seeder, and a few
+duplicate names and shared postcodes) with approximate centroids. It is
+meant for development and tests. Load a complete gazetteer in the same
+format for production.
+
+Lookups go through an in-process index built on first use: suburbs and
+postcodes in sorted arrays, so that autocomplete and exact lookups are a
+binary search for the range sharing a prefix. It is rebuilt after writes
+to Locality, and after ``LOCALITY_INDEX_MAX_AGE`` seconds to pick up a
+gazetteer loaded by another process.
+"""
+from threading import Lock
+import bisect
+import csv
+import os
+import re
+import time
+
+from sqlalchemy import delete, insert, select
+
+from app import db
+from app.events import notify_bulk, on_change
+from app.models import AustralianState, Locality
+from app.spatial import calculate_distance
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'localities_sample.csv')
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_MAX_AGE = 3600  # seconds
+MAX_REPORTED_ERRORS = 1000
+COLUMNS = ('suburb', 'state', 'postcode', 'latitude', 'longitude')
+STATES = {member.name for member in AustralianState}
+
+# Suburbs sharing a name are only merged into one search point when they
+# are this close together, e.g. one suburb split over two postcodes
+AMBIGUOUS_DISTANCE = 25000  # meters
+
+
+def normalize(value):
+    """Lowercase, with punctuation replaced by spaces and runs of spaces collapsed"""
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', value.lower()).split())
+
+
+def parse_row(row):
+    """Validated insert values from a CSV row; raises ValueError"""
+    suburb = (row.get('suburb') or '').strip()
+    state = (row.get('state') or '').strip().upper()
+    postcode = (row.get('postcode') or '').strip()
+    if not suburb:
+        raise ValueError('suburb is required')
+    if state not in STATES:
+        raise ValueError(f'Unknown state: {state}')
+    if not postcode.isdigit() or len(postcode) != 4:
+        raise ValueError(f'Invalid postcode: {postcode}')
+    try:
+        latitude, longitude = float(row['latitude']), float(row['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('latitude and longitude must be numbers')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('latitude or longitude out of range')
+    return {'suburb': suburb, 'state': state, 'postcode': postcode,
+            'latitude': latitude, 'longitude': longitude}
+
+
+def load_localities(stream, replace=True, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Load gazetteer rows from a text stream of CSV, in one transaction.
+
+    With ``replace`` the table is emptied first, otherwise rows whose
+    (suburb, state, postcode) already exist are skipped. Returns a report
+    dict like the equipment importer's.
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    report = {'rows': 0, 'inserted': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+    try:
+        if replace:
+            db.session.execute(delete(Locality))
+            seen = set()
+        else:
+            seen = set(db.session.execute(select(Locality.suburb, Locality.state, Locality.postcode)).tuples())
+        batch = []
+        for row in reader:
+            report['rows'] += 1
+            try:
+                values = parse_row(row)
+            except ValueError as e:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'line': reader.line_num, 'error': str(e)})
+                continue
+            key = (values['suburb'], values['state'], values['postcode'])
+            if key in seen:
+                report['skipped'] += 1
+                continue
+            seen.add(key)
+            batch.append(values)
+            if len(batch) >= batch_size:
+                db.session.execute(insert(Locality), batch)
+                report['inserted'] += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Locality), batch)
+            report['inserted'] += len(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    notify_bulk(Locality)
+    return report
+
+
+def serialize_locality(entry):
+    locality_id, suburb, state, postcode, latitude, longitude = entry
+    return {'id': locality_id, 'suburb': suburb, 'state': state, 'postcode': postcode,
+            'latitude': latitude, 'longitude': longitude}
+
+
+class LocalityIndex:
+    """Sorted arrays over (id, suburb, state, postcode, lat, lng) entries"""
+
+    def __init__(self, entries=()):
+        # Sorted by suburb, then state and postcode, so exact names come
+        # before longer ones sharing the prefix
+        self.entries = sorted(entries, key=lambda entry: (normalize(entry[1]), entry[2], entry[3]))
+        self.names = [normalize(entry[1]) for entry in self.entries]
+        by_postcode = sorted(range(len(self.entries)), key=lambda i: (self.entries[i][3], self.names[i]))
+        self.postcode_order = by_postcode
+        self.postcodes = [self.entries[i][3] for i in by_postcode]
+
+    def _name_range(self, prefix):
+        start = bisect.bisect_left(self.names, prefix)
+        end = bisect.bisect_left(self.names, prefix + '\uffff', start)
+        return start, end
+
+    def _postcode_range(self, prefix):
+        start = bisect.bisect_left(self.postcodes, prefix)
+        end = bisect.bisect_left(self.postcodes, prefix + '\uffff', start)
+        return start, end
+
+    def autocomplete(self, query, limit=10):
+        """
+        Entries whose suburb starts with ``query``, or whose postcode does
+        when it is all digits. Trailing state and postcode words narrow a
+        suburb search: "richmond vic", "richmond 31".
+        """
+        words = normalize(query).split()
+        state = postcode = None
+        while len(words) > 1 and (words[-1].upper() in STATES or words[-1].isdigit()):
+            word = words.pop()
+            if word.isdigit():
+                postcode = word
+            else:
+                state = word.upper()
+        prefix = ' '.join(words)
+        if not prefix:
+            return []
+
+        if prefix.isdigit():
+            start, end = self._postcode_range(prefix)
+            candidates = (self.entries[i] for i in self.postcode_order[start:end])
+        else:
+            start, end = self._name_range(prefix)
+            candidates = (self.entries[i] for i in range(start, end))
+        result = []
+        for entry in candidates:
+            if state is not None and entry[2] != state:
+                continue
+            if postcode is not None and not entry[3].startswith(postcode):
+                continue
+            result.append(entry)
+            if len(result) >= limit:
+                break
+        return result
+
+    def find(self, suburb=None, postcode=None, state=None):
+        """Entries matching the given suburb name, postcode and state exactly"""
+        if suburb:
+            name = normalize(suburb)
+            start, end = self._name_range(name)
+            entries = [self.entries[i] for i in range(start, end) if self.names[i] == name]
+        elif postcode:
+            start, end = self._postcode_range(postcode)
+            entries = [self.entries[i] for i in self.postcode_order[start:end] if self.entries[i][3] == postcode]
+        else:
+            return []
+        if suburb and postcode:
+            entries = [entry for entry in entries if entry[3] == postcode]
+        if state:
+            entries = [entry for entry in entries if entry[2] == state.upper()]
+        return entries
+
+    def resolve(self, suburb=None, postcode=None, state=None):
+        """
+        (lat, lng) to search around for a suburb and/or postcode.
+
+        A postcode alone resolves to the centroid of its suburbs. A suburb
+        name shared by places far apart (Richmond NSW, VIC, QLD, ...) raises
+        ValueError listing them, to be narrowed down with state or postcode.
+        Raises LookupError when nothing matches.
+        """
+        entries = self.find(suburb, postcode, state)
+        if not entries:
+            raise LookupError('Locality not found')
+        lat = sum(entry[4] for entry in entries) / len(entries)
+        lng = sum(entry[5] for entry in entries) / len(entries)
+        if suburb and any(calculate_distance(lat, lng, entry[4], entry[5]) > AMBIGUOUS_DISTANCE
+                          for entry in entries):
+            options = ', '.join(f'{entry[1]} {entry[2]} {entry[3]}' for entry in entries)
+            raise ValueError(f'Ambiguous suburb, add state or postcode: {options}')
+        return lat, lng
+
+
+class Localities:
+    """Process-wide LocalityIndex, built lazily and rebuilt after writes"""
+
+    def __init__(self):
+        self._index = None
+        self._built_at = 0
+        self._lock = Lock()
+
+    def invalidate(self):
+        self._index = None
+
+    def index(self, max_age=DEFAULT_MAX_AGE):
+        index = self._index
+        if index is None or time.monotonic() - self._built_at > max_age:
+            with self._lock:
+                # Another thread may have rebuilt it while we waited
+                if self._index is None or time.monotonic() - self._built_at > max_age:
+                    rows = db.session.execute(select(
+                        Locality.id, Locality.suburb, Locality.state, Locality.postcode,
+                        Locality.latitude, Locality.longitude))
+                    self._index = LocalityIndex(tuple(row) for row in rows)
+                    self._built_at = time.monotonic()
+                index = self._index
+        return index
+
+
+localities = Localities()
+
+
+@on_change(Locality)
+def _invalidate_localities(action, target):
+    localities.invalidate()
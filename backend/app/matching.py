@@ -0,0 +1,379 @@
+"""
+Electrician matching for a job spec.
+
+Every electrician is one row of an in-process NumPy feature matrix:
+bitmasks of active certifications, voltage levels and specialties worked,
+and states they can work in, plus numeric columns (hourly rate, experience,
+proficiency per specialty, verification). A match is then
+
+* hard constraints (certifications, voltage level, state, budget) as
+  bitwise ANDs over whole columns, giving a boolean mask
+* a weighted score of the soft signals over the surviving rows
+* ``argpartition`` for the top N
+
+so ranking 100k profiles is a few vector operations instead of walking
+relationships per electrician.
+
+The matrix is built on first use. Writes to an electrician or any of their
+licenses, certifications, skills or projects mark that electrician dirty
+when the transaction commits, and only the dirty rows are reloaded on the
+next match. Marking them at flush time would let a match running before
+the commit reload the old rows and clear the mark. It is also rebuilt after
+``MATCH_INDEX_MAX_AGE`` seconds, which picks up certifications that expired
+and writes made by other processes.
+"""
+from datetime import datetime
+from threading import Lock
+import json
+import time
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.events import on_change
+from app.models import (
+    AustralianState, Certification, CertificationType, Electrician, License, Project, Skill,
+    SpecialtyArea, VoltageLevel,
+)
+
+DEFAULT_MAX_AGE = 3600  # seconds
+LOAD_CHUNK_SIZE = 1000
+
+CERT_BITS = {cert: 1 << i for i, cert in enumerate(CertificationType)}
+VOLTAGE_BITS = {level: 1 << i for i, level in enumerate(VoltageLevel)}
+SPECIALTY_BITS = {specialty: 1 << i for i, specialty in enumerate(SpecialtyArea)}
+STATE_BITS = {state: 1 << i for i, state in enumerate(AustralianState)}
+SPECIALTIES = list(SpecialtyArea)
+
+INACTIVE_STATUSES = ('expired', 'suspended')
+
+# Weights of the soft signals, each signal is scaled to [0, 1]
+MATCH_WEIGHTS = {
+    'proficiency': 3.0,  # skill proficiency in the requested specialty
+    'specialty_projects': 1.0,  # has worked projects in the specialty
+    'experience': 2.0,  # years of experience, capped at 20
+    'budget': 1.5,  # how far under budget the hourly rate is
+    'verified': 1.0,
+    'insured': 1.0,
+    'profile': 0.5,  # profile completion
+}
+MAX_EXPERIENCE_YEARS = 20
+
+
+def parse_enum(enum, value):
+    """Look up an enum member by value ('new_south_wales') or name ('NSW')"""
+    if isinstance(value, enum):
+        return value
+    try:
+        return enum(value)
+    except ValueError:
+        pass
+    try:
+        return enum[str(value).upper()]
+    except KeyError:
+        raise ValueError(f'Invalid {enum.__name__}: {value}')
+
+
+def parse_json_list(value):
+    """Values of a column holding a JSON array, tolerating bad data"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def mask_of(bits, enum, values):
+    """OR the bits of the enum values that parse, ignoring unknown ones"""
+    mask = 0
+    for value in values:
+        try:
+            mask |= bits[parse_enum(enum, value)]
+        except ValueError:
+            continue
+    return mask
+
+
+def is_active(status, expiry_date, now):
+    if status and status.strip().lower() in INACTIVE_STATUSES:
+        return False
+    return expiry_date is None or expiry_date > now
+
+
+def empty_features():
+    return {
+        'certs': 0, 'voltage': 0, 'specialties': 0, 'states': 0,
+        'rate': np.nan, 'years': 0.0, 'proficiency': [0.0] * len(SPECIALTIES),
+        'verified': False, 'insured': False, 'completion': 0.0,
+    }
+
+
+def load_features(electrician_ids=None):
+    """
+    Feature dicts keyed by electrician id, for the given ids or everyone.
+    Ids that no longer exist are missing from the result.
+    """
+    if electrician_ids is None:
+        return _load_features(None)
+    electrician_ids = list(electrician_ids)
+    features = {}
+    for start in range(0, len(electrician_ids), LOAD_CHUNK_SIZE):
+        features.update(_load_features(electrician_ids[start:start + LOAD_CHUNK_SIZE]))
+    return features
+
+
+def _load_features(electrician_ids):
+    def restrict(stmt, column):
+        return stmt if electrician_ids is None else stmt.where(column.in_(electrician_ids))
+
+    now = datetime.utcnow()
+    features = {}
+    for row in db.session.execute(restrict(select(
+        Electrician.id, Electrician.years_experience, Electrician.hourly_rate,
+        Electrician.preferred_locations, Electrician.primary_license_state,
+        Electrician.insurance_status, Electrician.insurance_expiry,
+        Electrician.verified_status, Electrician.profile_completion,
+    ), Electrician.id)):
+        entry = features[row.id] = empty_features()
+        entry['years'] = float(row.years_experience or 0)
+        entry['rate'] = np.nan if row.hourly_rate is None else float(row.hourly_rate)
+        entry['states'] = STATE_BITS[row.primary_license_state] | mask_of(
+            STATE_BITS, AustralianState, parse_json_list(row.preferred_locations))
+        entry['insured'] = bool(row.insurance_status) and (
+            row.insurance_expiry is None or row.insurance_expiry > now)
+        entry['verified'] = bool(row.verified_status)
+        entry['completion'] = float(row.profile_completion or 0)
+
+    for row in db.session.execute(restrict(select(
+        License.electrician_id, License.issuing_state, License.status, License.expiry_date,
+    ), License.electrician_id)):
+        entry = features.get(row.electrician_id)
+        if entry is not None and row.issuing_state is not None and \
+                is_active(row.status, row.expiry_date, now):
+            entry['states'] |= STATE_BITS[row.issuing_state]
+
+    for row in db.session.execute(restrict(select(
+        Certification.electrician_id, Certification.certification_type,
+        Certification.status, Certification.expiry_date,
+    ), Certification.electrician_id)):
+        entry = features.get(row.electrician_id)
+        if entry is not None and row.certification_type is not None and \
+                is_active(row.status, row.expiry_date, now):
+            entry['certs'] |= CERT_BITS[row.certification_type]
+
+    for row in db.session.execute(restrict(select(
+        Skill.electrician_id, Skill.specialty, Skill.proficiency_level,
+    ), Skill.electrician_id)):
+        entry = features.get(row.electrician_id)
+        if entry is not None and row.specialty is not None:
+            position = SPECIALTIES.index(row.specialty)
+            level = min(max(float(row.proficiency_level or 0), 0.0), 5.0)
+            entry['proficiency'][position] = max(entry['proficiency'][position], level)
+
+    for row in db.session.execute(restrict(select(
+        Project.electrician_id, Project.voltage_levels, Project.specialties,
+    ), Project.electrician_id)):
+        entry = features.get(row.electrician_id)
+        if entry is not None:
+            entry['voltage'] |= mask_of(VOLTAGE_BITS, VoltageLevel, parse_json_list(row.voltage_levels))
+            entry['specialties'] |= mask_of(SPECIALTY_BITS, SpecialtyArea, parse_json_list(row.specialties))
+    return features
+
+
+class ElectricianMatrix:
+    """Feature columns for all electricians, one row each"""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.rows = {}  # electrician id -> row
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity):
+        columns = {
+            'ids': np.zeros(capacity, dtype=np.int64),
+            'active': np.zeros(capacity, dtype=bool),
+            'certs': np.zeros(capacity, dtype=np.uint32),
+            'voltage': np.zeros(capacity, dtype=np.uint8),
+            'specialties': np.zeros(capacity, dtype=np.uint8),
+            'states': np.zeros(capacity, dtype=np.uint8),
+            'rate': np.full(capacity, np.nan, dtype=np.float32),
+            'years': np.zeros(capacity, dtype=np.float32),
+            'proficiency': np.zeros((capacity, len(SPECIALTIES)), dtype=np.float32),
+            'verified': np.zeros(capacity, dtype=bool),
+            'insured': np.zeros(capacity, dtype=bool),
+            'completion': np.zeros(capacity, dtype=np.float32),
+        }
+        for name, column in columns.items():
+            old = getattr(self, name, None)
+            if old is not None:
+                column[:self.size] = old[:self.size]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def set(self, electrician_id, features):
+        """Insert or replace a row; ``features`` None removes it"""
+        row = self.rows.get(electrician_id)
+        if features is None:
+            if row is not None:
+                self.active[row] = False
+            return
+        if row is None:
+            if self.size == self.capacity:
+                self._allocate(self.capacity * 2)
+            row = self.rows[electrician_id] = self.size
+            self.ids[row] = electrician_id
+            self.size += 1
+        self.active[row] = True
+        for name in ('certs', 'voltage', 'specialties', 'states', 'rate', 'years',
+                     'proficiency', 'verified', 'insured', 'completion'):
+            getattr(self, name)[row] = features[name]
+
+    def match(self, certifications=(), voltage_level=None, states=(), specialty=None,
+              max_hourly_rate=None, limit=20, weights=MATCH_WEIGHTS):
+        """Return (electrician ids, scores, number of matches), best first"""
+        n = self.size
+        mask = self.active[:n].copy()
+        if certifications:
+            required = np.uint32(mask_of(CERT_BITS, CertificationType, certifications))
+            mask &= (self.certs[:n] & required) == required
+        if voltage_level is not None:
+            mask &= (self.voltage[:n] & np.uint8(VOLTAGE_BITS[voltage_level])) != 0
+        if states:
+            mask &= (self.states[:n] & np.uint8(mask_of(STATE_BITS, AustralianState, states))) != 0
+        if max_hourly_rate is not None:
+            # Electricians without a listed rate are kept but get no budget score
+            mask &= ~(self.rate[:n] > max_hourly_rate)
+
+        rows = np.flatnonzero(mask)
+        score = weights['experience'] * np.minimum(self.years[rows], MAX_EXPERIENCE_YEARS) / MAX_EXPERIENCE_YEARS
+        score += weights['verified'] * self.verified[rows]
+        score += weights['insured'] * self.insured[rows]
+        score += weights['profile'] * np.clip(self.completion[rows], 0, 100) / 100
+        if specialty is not None:
+            position = SPECIALTIES.index(specialty)
+            score += weights['proficiency'] * self.proficiency[rows, position] / 5
+            score += weights['specialty_projects'] * (
+                (self.specialties[rows] & np.uint8(SPECIALTY_BITS[specialty])) != 0)
+        if max_hourly_rate:
+            headroom = (max_hourly_rate - self.rate[rows]) / max_hourly_rate
+            score += weights['budget'] * np.nan_to_num(np.clip(headroom, 0, 1))
+
+        if len(rows) > limit:
+            top = np.argpartition(-score, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-score[top], kind='stable')]
+        return self.ids[rows[top]], score[top], len(rows)
+
+
+class ElectricianIndex:
+    """Process-wide ElectricianMatrix, reloading only electricians that changed"""
+
+    def __init__(self):
+        self._matrix = None
+        self._built_at = 0
+        self._dirty = set()
+        self._lock = Lock()
+
+    def mark_dirty(self, electrician_id):
+        if electrician_id is not None:
+            self._dirty.add(electrician_id)
+
+    def reset(self):
+        self._matrix = None
+
+    def matrix(self, max_age=DEFAULT_MAX_AGE):
+        with self._lock:
+            if self._matrix is None or time.monotonic() - self._built_at > max_age:
+                self._dirty = set()
+                features = load_features()
+                matrix = ElectricianMatrix(len(features))
+                for electrician_id, entry in features.items():
+                    matrix.set(electrician_id, entry)
+                self._matrix = matrix
+                self._built_at = time.monotonic()
+            elif self._dirty:
+                dirty, self._dirty = self._dirty, set()
+                features = load_features(dirty)
+                for electrician_id in dirty:
+                    self._matrix.set(electrician_id, features.get(electrician_id))
+            return self._matrix
+
+    def match(self, max_age=DEFAULT_MAX_AGE, **spec):
+        matrix = self.matrix(max_age)
+        with self._lock:
+            return matrix.match(**spec)
+
+
+electrician_index = ElectricianIndex()
+
+
+def _mark_dirty_on_commit(target, electrician_ids):
+    session = object_session(target)
+    if session is None:
+        for electrician_id in electrician_ids:
+            electrician_index.mark_dirty(electrician_id)
+    else:
+        session.info.setdefault('dirty_electricians', set()).update(electrician_ids)
+
+
+@on_change(Electrician)
+def _electrician_changed(action, target):
+    if action == 'reset':
+        electrician_index.reset()
+    else:
+        _mark_dirty_on_commit(target, [target.id])
+
+
+@on_change(License, Certification, Skill, Project)
+def _electrician_details_changed(action, target):
+    if action == 'reset':
+        electrician_index.reset()
+        return
+    # A row moved to another electrician also changes the previous one
+    _mark_dirty_on_commit(target, [target.electrician_id,
+                                   *inspect(target).attrs.electrician_id.history.deleted])
+
+
+@event.listens_for(Session, 'after_commit')
+def _mark_dirty_after_commit(session):
+    for electrician_id in session.info.pop('dirty_electricians', ()):
+        electrician_index.mark_dirty(electrician_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('dirty_electricians', None)
+
+
+def match_electricians(spec, limit, max_age=DEFAULT_MAX_AGE):
+    """Rank electricians for a job spec and load the top ``limit`` profiles"""
+    ids, scores, total = electrician_index.match(max_age=max_age, limit=limit, **spec)
+    ids = [int(electrician_id) for electrician_id in ids]
+    profiles = {
+        row.id: row for row in db.session.execute(select(
+            Electrician.id, Electrician.full_name, Electrician.years_experience,
+            Electrician.hourly_rate, Electrician.primary_license_state, Electrician.verified_status,
+        ).where(Electrician.id.in_(ids)))
+    }
+    items = []
+    for electrician_id, score in zip(ids, scores):
+        row = profiles.get(electrician_id)
+        if row is None:
+            continue
+        items.append({
+            'id': row.id,
+            'full_name': row.full_name,
+            'years_experience': row.years_experience,
+            'hourly_rate': row.hourly_rate,
+            'primary_license_state': row.primary_license_state.value,
+            'verified_status': row.verified_status,
+            'score': round(float(score), 4),
+        })
+    return {'items': items, 'total': total}
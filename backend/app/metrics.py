@@ -0,0 +1,252 @@
+"""
+Per-route request metrics, exposed on ``/metrics`` in the Prometheus text
+format.
+
+For every request the middleware records, labelled by Flask endpoint:
+
+* ``http_requests_total`` - count by method, endpoint and status
+* ``http_request_duration_seconds`` - latency histogram
+* ``http_request_db_queries`` / ``http_request_db_seconds`` - SQL
+  statements and time spent in them, from cursor execute events
+* ``http_response_serialization_seconds`` - time in JSON encoding, through
+  the app's JSON provider (so jsonify and the streaming encoders)
+
+The numbers are kept in memory per process. With several gunicorn workers
+each one reports its own, so scrape them individually or sum over a
+service-level view. Requests are finalized when their context is torn
+down, which for streamed responses is after the last row is sent.
+
+Profiling, see app/profiler.py:
+
+* ``?profile=1`` on any request, with the ``X-Admin-Token`` header matching
+  ``ADMIN_TOKEN``, samples that request and writes its folded stacks to
+  ``PROFILE_DIR``; the file name comes back in ``X-Profile``
+* ``PROFILE_SLOW_REQUEST`` (seconds) samples every request and keeps the
+  stacks of those that took at least that long
+"""
+from collections import defaultdict
+from datetime import datetime
+from threading import Lock, get_ident
+import bisect
+import hmac
+import logging
+import os
+import time
+import uuid
+
+from flask import Response, current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.profiler import profiler, write_folded
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SERIALIZATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in the Prometheus sense"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, total) in sorted(self._series.items()):
+            labels = format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.labels + ('le',), label_values + (str(bound),))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = defaultdict(int)
+
+    def inc(self, label_values, amount=1):
+        self._values[label_values] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+def format_labels(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class RequestStats:
+    """What one request spent its time on"""
+    __slots__ = ('start', 'queries', 'db_time', 'serialize_time', 'status', 'samples', 'profile_path')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.status = 500  # Unless after_request sees a response
+        self.samples = None
+        self.profile_path = None
+
+
+def current_stats():
+    return g.get('_request_stats') if has_request_context() else None
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """The default JSON provider, adding encoding time to the request stats"""
+
+    def dumps(self, obj, **kwargs):
+        stats = current_stats()
+        if stats is None:
+            return super().dumps(obj, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats.serialize_time += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    start = getattr(context, '_metrics_start', None)
+    if stats is not None and start is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+class Metrics:
+    """Request metrics registry and middleware"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = Counter('http_requests_total', 'Requests served.',
+                                ('method', 'endpoint', 'status'))
+        self.duration = Histogram('http_request_duration_seconds', 'Request latency.',
+                                  ('method', 'endpoint'), LATENCY_BUCKETS)
+        self.db_queries = Histogram('http_request_db_queries', 'SQL statements run per request.',
+                                    ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram('http_request_db_seconds', 'Time spent in SQL per request.',
+                                 ('endpoint',), LATENCY_BUCKETS)
+        self.serialization = Histogram('http_response_serialization_seconds',
+                                       'Time spent encoding JSON per request.',
+                                       ('endpoint',), SERIALIZATION_BUCKETS)
+        self._listening = False
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        app.json = TimedJSONProvider(app)
+        profiler.interval = app.config['PROFILE_INTERVAL']
+        with self._lock:
+            # Engine-wide, so apps created later (and their engines) share one listener
+            if not self._listening:
+                event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+                self._listening = True
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if app.config['METRICS_ENABLED']:
+            app.add_url_rule('/metrics', 'metrics', self.render_view)
+
+    def _before_request(self):
+        if request.endpoint == 'metrics':
+            return
+        stats = g._request_stats = RequestStats()
+        config = current_app.config
+        if request.args.get('profile') == '1' and is_admin(config):
+            stats.profile_path = os.path.join(
+                config['PROFILE_DIR'],
+                f"{datetime.utcnow():%Y%m%dT%H%M%S}-{request.endpoint}-{uuid.uuid4().hex[:8]}.folded")
+        if stats.profile_path or config['PROFILE_SLOW_REQUEST'] > 0:
+            stats.samples = profiler.start(get_ident())
+
+    def _after_request(self, response):
+        stats = current_stats()
+        if stats is not None:
+            stats.status = response.status_code
+            if stats.profile_path:
+                response.headers['X-Profile'] = os.path.basename(stats.profile_path)
+        return response
+
+    def _teardown_request(self, exc):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats.start
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        with self._lock:
+            self.requests.inc((method, endpoint, str(stats.status)))
+            self.duration.observe((method, endpoint), elapsed)
+            self.db_queries.observe((endpoint,), stats.queries)
+            self.db_time.observe((endpoint,), stats.db_time)
+            self.serialization.observe((endpoint,), stats.serialize_time)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'{method} {request.full_path} {stats.status} {elapsed * 1000:.1f}ms '
+                         f'{stats.queries} queries')
+
+        if stats.samples is not None:
+            profiler.stop(get_ident())
+            slow = current_app.config['PROFILE_SLOW_REQUEST']
+            path = stats.profile_path
+            if path is None and elapsed >= slow:
+                path = os.path.join(current_app.config['PROFILE_DIR'],
+                                    f"{datetime.utcnow():%Y%m%dT%H%M%S}-slow-{endpoint}-{uuid.uuid4().hex[:8]}.folded")
+            # An explicitly profiled request always gets its file, even if it
+            # finished before the first sample
+            if path is not None and (stats.samples or stats.profile_path):
+                write_folded(stats.samples, path)
+                logger.info(f'{method} {request.full_path} took {elapsed * 1000:.0f}ms, profile written to {path}')
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.db_queries, self.db_time, self.serialization):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def render_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def is_admin(config):
+    """Whether the request carries the admin token"""
+    token = config.get('ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+metrics = Metrics()
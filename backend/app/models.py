@@ -1,13 +1,17 @@
 from datetime import datetime
 from enum import Enum
 from typing import List
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum as SQLEnum, Boolean, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum as SQLEnum, Boolean, Float, Text, Index, UniqueConstraint, JSON, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from app import db
 
 # Use SQLAlchemy's declarative base
 Base = db.Model
 
+# JSON documents: JSONB on Postgres so they can be GIN indexed, plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
 class ProjectType(str, Enum):
     MINING = "mining"
     RENEWABLE = "renewable"
@@ -85,6 +89,11 @@ class AustralianState(str, Enum):
 
 class License(Base):
     __tablename__ = "licenses"
+    __table_args__ = (
+        # Compliance scans and expiring-soon listings are range scans on expiry
+        Index('ix_licenses_expiry_date', 'expiry_date', 'electrician_id'),
+        Index('ix_licenses_electrician_id', 'electrician_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     electrician_id = Column(Integer, ForeignKey("electricians.id"))
@@ -100,6 +109,9 @@ class License(Base):
 
 class Qualification(Base):
     __tablename__ = "qualifications"
+    __table_args__ = (
+        Index('ix_qualifications_electrician_id', 'electrician_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     electrician_id = Column(Integer, ForeignKey("electricians.id"))
@@ -112,6 +124,10 @@ class Qualification(Base):
 
 class Certification(Base):
     __tablename__ = "certifications"
+    __table_args__ = (
+        Index('ix_certifications_expiry_date', 'expiry_date', 'electrician_id'),
+        Index('ix_certifications_electrician_id', 'electrician_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     electrician_id = Column(Integer, ForeignKey("electricians.id"))
@@ -126,13 +142,18 @@ class Certification(Base):
 
 class Electrician(Base):
     __tablename__ = "electricians"
+    __table_args__ = (
+        Index('ix_electricians_insurance_expiry', 'insurance_expiry'),
+        Index('ix_electricians_preferred_locations', 'preferred_locations', postgresql_using='gin',
+              postgresql_ops={'preferred_locations': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
     
     id = Column(Integer, primary_key=True)
     full_name = Column(String, nullable=False)
     years_experience = Column(Integer)
     hourly_rate = Column(Integer)
     available_from = Column(DateTime)
-    preferred_locations = Column(String)  # JSON array of AustralianState
+    preferred_locations = Column(JSONType)  # Array of AustralianState
     
     # Compliance and Verification
     primary_license_state = Column(SQLEnum(AustralianState), nullable=False)
@@ -151,6 +172,13 @@ class Electrician(Base):
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        Index('ix_projects_electrician_id', 'electrician_id'),
+        Index('ix_projects_voltage_levels', 'voltage_levels', postgresql_using='gin',
+              postgresql_ops={'voltage_levels': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_projects_specialties', 'specialties', postgresql_using='gin',
+              postgresql_ops={'specialties': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
     
     id = Column(Integer, primary_key=True)
     electrician_id = Column(Integer, ForeignKey("electricians.id"))
@@ -159,22 +187,25 @@ class Project(Base):
     start_date = Column(DateTime)
     end_date = Column(DateTime)
     description = Column(String)
-    tools_used = Column(String)  # JSON string of tools
+    tools_used = Column(JSONType)  # Array of tools
     role_description = Column(String)
     
     # New fields for standardized experience tracking
-    voltage_levels = Column(String)  # JSON array of VoltageLevel
+    voltage_levels = Column(JSONType)  # Array of VoltageLevel
     role = Column(SQLEnum(ProjectRole))
-    specialties = Column(String)  # JSON array of SpecialtyArea
+    specialties = Column(JSONType)  # Array of SpecialtyArea
     team_size = Column(Integer)
     safety_incidents = Column(Integer, default=0)
-    compliance_standards = Column(String)  # JSON array of compliance standards met
-    key_achievements = Column(String)  # JSON array of standardized achievements
+    compliance_standards = Column(JSONType)  # Array of compliance standards met
+    key_achievements = Column(JSONType)  # Array of standardized achievements
     
     electrician = relationship("Electrician", back_populates="projects")
 
 class Skill(Base):
     __tablename__ = "skills"
+    __table_args__ = (
+        Index('ix_skills_electrician_id', 'electrician_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     electrician_id = Column(Integer, ForeignKey("electricians.id"))
@@ -219,6 +250,14 @@ class User(Base):
 
 class Operator(Base):
     __tablename__ = 'operators'
+    __table_args__ = (
+        # Bounding box prefilter for nearby searches, which only show
+        # approved operators that haven't been deleted
+        Index('ix_operators_visible_location', 'latitude', 'longitude',
+              postgresql_where=text("moderation_status = 'APPROVED' AND deleted_at IS NULL"),
+              sqlite_where=text("moderation_status = 'APPROVED' AND deleted_at IS NULL")),
+        Index('ix_operators_user_id', 'user_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -231,7 +270,7 @@ class Operator(Base):
     longitude = Column(Float, nullable=False)
     
     service_radius = Column(Integer, nullable=False)  # in meters
-    operating_hours = Column(String)  # JSON string
+    operating_hours = Column(JSONType)
     website = Column(String(255))
     address_line1 = Column(String(255), nullable=False)
     address_line2 = Column(String(255))
@@ -249,6 +288,9 @@ class Operator(Base):
 
 class EquipmentCategory(Base):
     __tablename__ = 'equipment_categories'
+    __table_args__ = (
+        Index('ix_equipment_categories_parent_id', 'parent_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     parent_id = Column(Integer, ForeignKey('equipment_categories.id'))
@@ -261,15 +303,43 @@ class EquipmentCategory(Base):
     parent = relationship("EquipmentCategory", remote_side=[id], backref="subcategories")
     equipment = relationship("Equipment", back_populates="category")
 
+class EquipmentCategoryClosure(Base):
+    """Every (ancestor, descendant) pair of the category tree, including (id, id)"""
+    __tablename__ = 'equipment_category_closure'
+    __table_args__ = (
+        # Ancestor lookups; subtree lookups use the primary key
+        Index('ix_equipment_category_closure_descendant', 'descendant_id', 'ancestor_id'),
+    )
+
+    ancestor_id = Column(Integer, ForeignKey('equipment_categories.id'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('equipment_categories.id'), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
 class Equipment(Base):
     __tablename__ = 'equipment'
+    __table_args__ = (
+        # Equipment of nearby operators, in id order for keyset pages
+        Index('ix_equipment_operator_id', 'operator_id', 'id'),
+        # Category listings (joined through the closure table), in id order;
+        # updated_at covers their count/max(updated_at) watermark
+        Index('ix_equipment_category_id', 'category_id', 'id', 'updated_at'),
+        # Available equipment in a category by rate
+        Index('ix_equipment_available_category_rate', 'category_id', 'daily_rate',
+              postgresql_where=text('availability_status'),
+              sqlite_where=text('availability_status = 1')),
+        # max(updated_at) watermarks for conditional GETs
+        Index('ix_equipment_updated_at', 'updated_at'),
+        # Containment (@>) filters on specifications
+        Index('ix_equipment_specifications', 'specifications', postgresql_using='gin',
+              postgresql_ops={'specifications': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
     
     id = Column(Integer, primary_key=True)
     operator_id = Column(Integer, ForeignKey('operators.id'), nullable=False)
     category_id = Column(Integer, ForeignKey('equipment_categories.id'), nullable=False)
     name = Column(String(255), nullable=False)
     description = Column(Text)
-    specifications = Column(String)  # JSON string
+    specifications = Column(JSONType)
     daily_rate = Column(Float)
     weekly_rate = Column(Float)
     monthly_rate = Column(Float)
@@ -280,3 +350,200 @@ class Equipment(Base):
     # Relationships
     operator = relationship("Operator", back_populates="equipment")
     category = relationship("EquipmentCategory", back_populates="equipment")
+    availability_blocks = relationship("EquipmentAvailabilityBlock", back_populates="equipment")
+
+class EquipmentSearch(Base):
+    """
+    One flattened row per listing of a visible operator, read by the listing
+    and search endpoints and kept in sync by app/projection.py. Column names follow
+    Equipment's so the same filters apply to both. On Postgres the table
+    also has a generated search_vector column (see its migration).
+    """
+    __tablename__ = 'equipment_search'
+    __table_args__ = (
+        # Equipment of nearby operators, in id order for keyset pages
+        Index('ix_equipment_search_operator_id', 'operator_id', 'id'),
+        # Category subtrees, in id order; updated_at covers their watermark
+        Index('ix_equipment_search_category_id', 'category_id', 'id', 'updated_at'),
+        # Watermark of the unfiltered listing
+        Index('ix_equipment_search_updated_at', 'updated_at'),
+        # Available equipment in a category by rate
+        Index('ix_equipment_search_available_category_rate', 'category_id', 'daily_rate',
+              postgresql_where=text('availability_status'),
+              sqlite_where=text('availability_status = 1')),
+        # Containment (@>) filters on specifications
+        Index('ix_equipment_search_specifications', 'specifications', postgresql_using='gin',
+              postgresql_ops={'specifications': 'jsonb_path_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+    id = Column(Integer, ForeignKey('equipment.id', ondelete='CASCADE'), primary_key=True, autoincrement=False)
+    operator_id = Column(Integer, nullable=False)
+    operator_business_name = Column(String(255), nullable=False)
+    operator_suburb = Column(String(100), nullable=False)
+    operator_state = Column(String(50), nullable=False)
+    operator_postcode = Column(String(10), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    service_radius = Column(Integer, nullable=False)  # in meters
+    category_id = Column(Integer, nullable=False)
+    category_name = Column(String(100), nullable=False)
+    category_path = Column(Text, nullable=False)  # "Earthmoving > Excavators > Mini Excavators"
+    name = Column(String(255), nullable=False)
+    description = Column(Text)
+    specifications = Column(JSONType)
+    daily_rate = Column(Float)
+    weekly_rate = Column(Float)
+    monthly_rate = Column(Float)
+    availability_status = Column(Boolean)
+    updated_at = Column(DateTime, nullable=False)  # when the row was last projected
+
+class AvailabilityBlockKind(str, Enum):
+    BOOKING = "booking"
+    BLACKOUT = "blackout"
+
+class EquipmentAvailabilityBlock(Base):
+    """A period when equipment can't be hired, from start_date up to (excluding) end_date"""
+    __tablename__ = 'equipment_availability_blocks'
+    __table_args__ = (
+        # Overlap checks for one piece of equipment; Postgres also gets a
+        # GiST range index in the migration
+        Index('ix_equipment_availability_blocks_equipment_dates', 'equipment_id', 'start_date', 'end_date'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False)
+    kind = Column(SQLEnum(AvailabilityBlockKind), nullable=False, default=AvailabilityBlockKind.BLACKOUT)
+    start_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False)
+    note = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    equipment = relationship("Equipment", back_populates="availability_blocks")
+
+class DeliveryPreference(str, Enum):
+    DELIVERY = "delivery"
+    PICKUP = "pickup"
+
+class RFQ(Base):
+    __tablename__ = 'rfqs'
+    __table_args__ = (
+        # Hirer dashboard: my RFQs, optionally by status, newest first
+        Index('ix_rfqs_hirer_status_created', 'hirer_id', 'status', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    hirer_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    equipment_id = Column(Integer, ForeignKey('equipment.id'))
+    category_id = Column(Integer, ForeignKey('equipment_categories.id'))
+    hire_start = Column(DateTime, nullable=False)
+    hire_end = Column(DateTime, nullable=False)
+    delivery_preference = Column(SQLEnum(DeliveryPreference), nullable=False, default=DeliveryPreference.DELIVERY)
+    delivery_address = Column(String(255))
+    requirements = Column(Text)  # Attachments, insurance, ...
+    status = Column(SQLEnum(RFQStatus), nullable=False, default=RFQStatus.PENDING)
+    expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    hirer = relationship("User")
+    equipment = relationship("Equipment")
+    category = relationship("EquipmentCategory")
+    recipients = relationship("RFQRecipient", back_populates="rfq")
+
+class RFQRecipient(Base):
+    """An operator an RFQ was sent to, and their response"""
+    __tablename__ = 'rfq_recipients'
+    __table_args__ = (
+        UniqueConstraint('rfq_id', 'operator_id'),
+        # Operator inbox
+        Index('ix_rfq_recipients_operator_status', 'operator_id', 'status'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    rfq_id = Column(Integer, ForeignKey('rfqs.id'), nullable=False)
+    operator_id = Column(Integer, ForeignKey('operators.id'), nullable=False)
+    status = Column(SQLEnum(RFQStatus), nullable=False, default=RFQStatus.PENDING)
+    quoted_price = Column(Float)
+    message = Column(Text)
+    notified_at = Column(DateTime)
+    reminded_at = Column(DateTime)
+    responded_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    rfq = relationship("RFQ", back_populates="recipients")
+    operator = relationship("Operator")
+
+class AvailabilityAlert(Base):
+    """A user waiting for equipment to become free for a date range"""
+    __tablename__ = 'availability_alerts'
+    __table_args__ = (
+        Index('ix_availability_alerts_pending', 'notified_at', 'end_date'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False)
+    start_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False)
+    notified_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User")
+    equipment = relationship("Equipment")
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class Job(Base):
+    """A background task run by the worker process"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers claim the oldest due pending jobs
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    dedupe_key = Column(String(255), unique=True)  # Scheduling the same key twice is a no-op
+    status = Column(SQLEnum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ScanWatermark(Base):
+    """How far an incremental batch scan has got"""
+    __tablename__ = 'scan_watermarks'
+
+    name = Column(String(100), primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Locality(Base):
+    """Gazetteer entry: a suburb and postcode with its centroid, for location searches"""
+    __tablename__ = 'localities'
+    __table_args__ = (
+        UniqueConstraint('suburb', 'state', 'postcode'),
+        Index('ix_localities_postcode', 'postcode'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    suburb = Column(String(100), nullable=False)
+    state = Column(String(50), nullable=False)
+    postcode = Column(String(10), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
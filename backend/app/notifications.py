@@ -0,0 +1,16 @@
+"""
+Outbound notifications.
+
+There is no mail provider wired up yet, so notifications are written to the
+log. Callers go through ``send_notification`` so a real transport only has
+to be plugged in here.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def send_notification(recipient, subject, body):
+    """Send a notification to an email address"""
+    logger.info(f'Notification to {recipient}: {subject}')
+    logger.debug(body)
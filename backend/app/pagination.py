@@ -0,0 +1,95 @@
+"""
+Keyset pagination and field selection for listing endpoints.
+
+Pages are addressed by an opaque cursor holding the last id of the previous
+page, so fetching page N is a ``WHERE id > :last_id ORDER BY id LIMIT n``
+index range scan rather than an OFFSET that gets slower the deeper it goes.
+"""
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_keyset(**values):
+    """Opaque cursor holding the sort key values of the last row of a page"""
+    payload = json.dumps(values, separators=(',', ':'), sort_keys=True, default=str).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_keyset(cursor, keys):
+    """Return the values stored in a cursor as a dict, or None for the first page"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, dict) or set(values) != set(keys):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def encode_cursor(last_id):
+    """Opaque cursor pointing just after ``last_id``"""
+    return encode_keyset(id=last_id)
+
+
+def decode_cursor(cursor):
+    """Return the last id stored in a cursor, or None for the first page"""
+    values = decode_keyset(cursor, ('id',))
+    if values is None:
+        return None
+    if not isinstance(values['id'], int):
+        raise ValueError('Invalid cursor')
+    return values['id']
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse the ``limit`` parameter, clamped to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def parse_fields(value, allowed, required=('id',)):
+    """
+    Parse a comma separated ``fields`` parameter against the allowed names.
+
+    Returns all allowed fields when ``value`` is empty. ``required`` fields
+    are always included since pagination depends on them.
+    """
+    if not value:
+        return list(allowed)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    for field in reversed(required):
+        if field not in fields:
+            fields.insert(0, field)
+    return fields
+
+
+def keyset_page(stmt, id_column, cursor, limit):
+    """Restrict an id-ordered statement to the page after ``cursor``"""
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        stmt = stmt.where(id_column > last_id)
+    # Fetch one extra row to know whether there is a next page
+    return stmt.order_by(None).order_by(id_column).limit(limit + 1)
+
+
+def page_result(items, limit, key='id'):
+    """Trim the extra row fetched by keyset_page and build the response body"""
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1][key])
+    return {'items': items, 'next_cursor': next_cursor}
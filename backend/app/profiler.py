@@ -0,0 +1,87 @@
+"""
+Sampling profiler for individual requests.
+
+One background thread wakes every ``interval`` seconds, grabs the current
+frame of each thread serving a profiled request (``sys._current_frames``)
+and counts its call stack. Nothing is traced, so the profiled request runs
+at close to full speed, and the thread exits once no request is being
+profiled.
+
+Stacks are written in the folded format (``root;caller;callee count``, one
+stack per line) that flamegraph.pl, speedscope and inferno read directly.
+
+Requests are attributed to profiles by thread, so this needs a thread (or
+process) per request, as with the Flask dev server and gunicorn sync or
+gthread workers, not greenlet workers.
+"""
+from collections import Counter
+from threading import Lock, Thread
+import os
+import sys
+import time
+
+DEFAULT_INTERVAL = 0.005  # seconds
+
+
+def frame_label(code):
+    path = code.co_filename.replace(os.sep, '/')
+    short = '/'.join(path.rsplit('/', 2)[-2:])
+    # ';' separates frames in the folded format
+    return f'{code.co_name} ({short}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def fold(frame):
+    """The stack of ``frame`` as a folded line, outermost call first"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered threads on a background thread"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self._active = {}
+        self._thread = None
+        self._lock = Lock()
+
+    def start(self, thread_id):
+        """Start sampling a thread; returns the Counter its stacks go into"""
+        samples = Counter()
+        with self._lock:
+            self._active[thread_id] = samples
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+        return samples
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[fold(frame)] += 1
+
+
+def write_folded(samples, path):
+    """Write sampled stacks to ``path`` in the folded format"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        for stack, count in samples.most_common():
+            f.write(f'{stack} {count}\n')
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,186 @@
+"""
+The ``equipment_search`` projection read by the listing, facet and search
+endpoints.
+
+It holds one flattened row per listing of a visible operator: the listing's
+own columns plus its operator's name and location and its category's name
+and path, so listings and searches read one table with no joins and no
+visibility filter. Postgres adds a generated ``search_vector`` column to
+each row.
+
+The table is kept in sync by mapper events running on the same connection
+as the flush, like the category closure table:
+
+* Equipment insert or update - its row is projected again, or dropped when
+  its operator isn't visible
+* Operator update of a projected column (name, location, moderation,
+  soft delete, ...) - all of its listings are projected again
+* Category rename or move - the listings in its subtree are projected again
+* Equipment or Operator delete - their rows are removed
+
+Writes that bypass the ORM must call ``rebuild_projection`` for what they
+touched before they commit. ``flask --app run search rebuild`` recomputes
+the whole table, for recovery.
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, event, inspect, insert, select
+
+from app import db
+from app.categories import closure
+from app.facets import equipment_facets
+from app.models import Equipment, EquipmentCategory, EquipmentSearch, Operator
+from app.search import equipment_search_index
+from app.spatial import visible_operators
+
+projection = EquipmentSearch.__table__
+
+DEFAULT_BATCH_SIZE = 5000
+PATH_SEPARATOR = ' > '
+
+SOURCE_COLUMNS = [
+    Equipment.id,
+    Equipment.operator_id,
+    Operator.business_name.label('operator_business_name'),
+    Operator.suburb.label('operator_suburb'),
+    Operator.state.label('operator_state'),
+    Operator.postcode.label('operator_postcode'),
+    Operator.latitude,
+    Operator.longitude,
+    Operator.service_radius,
+    Equipment.category_id,
+    EquipmentCategory.name.label('category_name'),
+    Equipment.name,
+    Equipment.description,
+    Equipment.specifications,
+    Equipment.daily_rate,
+    Equipment.weekly_rate,
+    Equipment.monthly_rate,
+    Equipment.availability_status,
+]
+
+# Operator attributes copied into the projection, or deciding visibility
+OPERATOR_ATTRIBUTES = ('business_name', 'suburb', 'state', 'postcode', 'latitude', 'longitude',
+                       'service_radius', 'moderation_status', 'deleted_at')
+
+
+def category_paths(connection, category_ids):
+    """{category id: 'Root > ... > Name'} for the given categories, from the closure table"""
+    rows = connection.execute(
+        select(closure.c.descendant_id, closure.c.depth, EquipmentCategory.name)
+        .join(EquipmentCategory, EquipmentCategory.id == closure.c.ancestor_id)
+        .where(closure.c.descendant_id.in_(category_ids))
+    )
+    ancestors = {}
+    for category_id, depth, name in rows:
+        ancestors.setdefault(category_id, []).append((depth, name))
+    return {category_id: PATH_SEPARATOR.join(name for depth, name in sorted(names, reverse=True))
+            for category_id, names in ancestors.items()}
+
+
+def _project(connection, where, limit=None):
+    """Projection rows for the visible listings matching ``where``, in id order"""
+    stmt = (
+        select(*SOURCE_COLUMNS)
+        .join(Operator, Equipment.operator_id == Operator.id)
+        .join(EquipmentCategory, Equipment.category_id == EquipmentCategory.id)
+        .where(*visible_operators(), *where)
+        .order_by(Equipment.id)
+        .limit(limit)
+    )
+    rows = connection.execute(stmt).mappings().all()
+    if not rows:
+        return []
+    paths = category_paths(connection, {row['category_id'] for row in rows})
+    now = datetime.utcnow()
+    return [dict(row, category_path=paths[row['category_id']], updated_at=now) for row in rows]
+
+
+def refresh(connection, source_where, projected_where):
+    """
+    Replace the projection rows matching ``projected_where`` with freshly
+    projected rows for the listings matching ``source_where``
+    """
+    removed = connection.execute(
+        delete(projection).where(projected_where).returning(projection.c.id)).scalars().all()
+    rows = _project(connection, source_where)
+    if rows:
+        connection.execute(insert(projection), rows)
+    equipment_search_index.replace(removed, rows)
+    equipment_facets.replace(removed, rows)
+
+
+def remove(connection, projected_where):
+    """Delete the projection rows matching ``projected_where``"""
+    removed = connection.execute(
+        delete(projection).where(projected_where).returning(projection.c.id)).scalars().all()
+    equipment_search_index.replace(removed, [])
+    equipment_facets.replace(removed, [])
+
+
+def changed(target, names):
+    """
+    Whether the flush changed any of the attributes ``names``; one set to a
+    SQL expression (``func.now()``) has no history left by then, only expired
+    """
+    state = inspect(target)
+    return any(getattr(state.attrs, name).history.has_changes() or name in state.expired_attributes
+               for name in names)
+
+
+@event.listens_for(Equipment, 'after_insert')
+@event.listens_for(Equipment, 'after_update')
+def _project_equipment(mapper, connection, target):
+    refresh(connection, [Equipment.id == target.id], projection.c.id == target.id)
+
+
+@event.listens_for(Equipment, 'before_delete')
+def _remove_equipment(mapper, connection, target):
+    remove(connection, projection.c.id == target.id)
+
+
+@event.listens_for(Operator, 'after_update')
+def _project_operator(mapper, connection, target):
+    if not changed(target, OPERATOR_ATTRIBUTES):
+        return
+    refresh(connection, [Equipment.operator_id == target.id], projection.c.operator_id == target.id)
+
+
+@event.listens_for(Operator, 'before_delete')
+def _remove_operator(mapper, connection, target):
+    remove(connection, projection.c.operator_id == target.id)
+
+
+@event.listens_for(EquipmentCategory, 'after_update')
+def _project_category(mapper, connection, target):
+    # Runs after the closure table listener, so a moved subtree already has
+    # its new ancestors
+    if not changed(target, ('name', 'parent_id')):
+        return
+    subtree = select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+    refresh(connection, [Equipment.category_id.in_(subtree)], projection.c.category_id.in_(subtree))
+
+
+def rebuild_projection(operator_id=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute the projection, or only one operator's rows, in the current
+    transaction. Returns the number of rows written. The caller commits,
+    then calls ``notify_bulk`` so the in-process search index rebuilds.
+    """
+    connection = db.session.connection()
+    source_where, projected_delete = [], delete(projection)
+    if operator_id is not None:
+        source_where = [Equipment.operator_id == operator_id]
+        projected_delete = projected_delete.where(projection.c.operator_id == operator_id)
+    connection.execute(projected_delete)
+
+    count, last_id = 0, None
+    while True:
+        where = source_where if last_id is None else source_where + [Equipment.id > last_id]
+        rows = _project(connection, where, batch_size)
+        if not rows:
+            break
+        connection.execute(insert(projection), rows)
+        count += len(rows)
+        last_id = rows[-1]['id']
+    return count
@@ -0,0 +1,89 @@
+"""
+Query layer for the equipment listing endpoints.
+
+Listings select the exact columns they serialize instead of loading
+Equipment objects and walking their lazy relationships (one extra SELECT
+per row). Callers pass the list of fields they want, which narrows the
+SELECT itself.
+
+The listing and search endpoints read the ``equipment_search`` projection
+instead of Equipment. It only has listings of visible operators, and their
+operator and category columns are already in the row.
+"""
+from sqlalchemy import select
+
+from app.models import Equipment, EquipmentSearch
+
+# Field name -> column, in response order
+EQUIPMENT_FIELDS = {
+    'id': Equipment.id,
+    'name': Equipment.name,
+    'description': Equipment.description,
+    'daily_rate': Equipment.daily_rate,
+    'weekly_rate': Equipment.weekly_rate,
+    'monthly_rate': Equipment.monthly_rate,
+    'availability_status': Equipment.availability_status,
+}
+
+# The same fields read from the search projection
+SEARCH_FIELDS = {field: getattr(EquipmentSearch, field) for field in EQUIPMENT_FIELDS}
+
+# Nearby results can also include the nested operator and category objects
+NEARBY_FIELDS = list(EQUIPMENT_FIELDS) + ['operator', 'category']
+
+OPERATOR_COLUMNS = [
+    EquipmentSearch.operator_id,
+    EquipmentSearch.operator_business_name,
+    EquipmentSearch.operator_suburb,
+    EquipmentSearch.operator_state,
+]
+
+CATEGORY_COLUMNS = [
+    EquipmentSearch.category_id,
+    EquipmentSearch.category_name,
+    EquipmentSearch.category_path,
+]
+
+
+def serialize_equipment_row(row, fields=tuple(EQUIPMENT_FIELDS)):
+    """Build the listing dict from a search_query row"""
+    return {field: getattr(row, field) for field in fields}
+
+
+def search_query(fields=tuple(EQUIPMENT_FIELDS)):
+    """SELECT of the requested fields from the search projection ordered by id"""
+    return select(*[SEARCH_FIELDS[field] for field in fields]).order_by(EquipmentSearch.id)
+
+
+def nearby_equipment_query(operator_ids, fields=NEARBY_FIELDS):
+    """
+    Single SELECT on the search projection for listings of the given
+    operators, with their operator and category columns when requested
+    """
+    columns = [SEARCH_FIELDS[field] for field in fields if field in SEARCH_FIELDS]
+    if 'operator' in fields:
+        columns += OPERATOR_COLUMNS
+    if 'category' in fields:
+        columns += CATEGORY_COLUMNS
+
+    stmt = select(*columns).select_from(EquipmentSearch)
+    return stmt.where(EquipmentSearch.operator_id.in_(operator_ids)).order_by(EquipmentSearch.id)
+
+
+def serialize_nearby_row(row, fields=NEARBY_FIELDS):
+    """Build the nearby listing dict from a nearby_equipment_query row"""
+    result = {field: getattr(row, field) for field in fields if field in EQUIPMENT_FIELDS}
+    if 'operator' in fields:
+        result['operator'] = {
+            'id': row.operator_id,
+            'business_name': row.operator_business_name,
+            'suburb': row.operator_suburb,
+            'state': row.operator_state
+        }
+    if 'category' in fields:
+        result['category'] = {
+            'id': row.category_id,
+            'name': row.category_name,
+            'path': row.category_path
+        }
+    return result
@@ -0,0 +1,341 @@
+"""
+Requests for quote.
+
+A hirer sends one RFQ to several operators at once. Creating it is three
+statements however many operators are picked: one SELECT to validate the
+operators, the RFQ INSERT and one executemany INSERT of the recipient rows.
+Notifying the operators happens afterwards on the task queue, so the request
+doesn't wait on email delivery.
+
+The hirer dashboard lists RFQs newest first with keyset pagination on
+(created_at, id), served by the (hirer_id, status, created_at) index.
+
+Expiry and reminders are periodic tasks run by the job worker. Both are
+set-based and only touch rows that still need it, so a retried run is safe.
+"""
+from datetime import datetime, timedelta
+import logging
+import math
+
+from flask import current_app
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.availability import parse_date_range, parse_text
+from app.models import (
+    DeliveryPreference, Equipment, EquipmentCategory, ModerationStatus, Operator, RFQ, RFQRecipient,
+    RFQStatus, User,
+)
+from app.notifications import send_notification
+from app.pagination import decode_keyset, encode_keyset
+from app.tasks import task_queue
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_STATUSES = (RFQStatus.ACCEPTED, RFQStatus.DECLINED)
+REMINDER_BATCH_SIZE = 500
+MAX_TEXT_LENGTH = 5000  # characters of requirements or a response message
+
+
+def parse_operator_ids(value, maximum):
+    if not isinstance(value, list) or not value:
+        raise ValueError('operator_ids must be a non-empty list')
+    try:
+        operator_ids = list(dict.fromkeys(int(operator_id) for operator_id in value))
+    except (TypeError, ValueError):
+        raise ValueError('operator_ids must be integers')
+    if len(operator_ids) > maximum:
+        raise ValueError(f'An RFQ can be sent to at most {maximum} operators')
+    return operator_ids
+
+
+def parse_reference(data, name, model):
+    """
+    The id in ``data[name]`` of an existing ``model`` row, or None when it's
+    not given. Raises ValueError for a non-integer and LookupError for an
+    unknown id.
+    """
+    value = data.get(name)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+    if db.session.get(model, value) is None:
+        raise LookupError(f'{model.__name__} {value} not found')
+    return value
+
+
+def create_rfq(data, max_recipients, expiry_days):
+    """Create an RFQ from request data and queue the operator notifications"""
+    hirer_id = data.get('hirer_id')
+    if not isinstance(hirer_id, int) or db.session.get(User, hirer_id) is None:
+        raise ValueError('hirer_id must be an existing user')
+    operator_ids = parse_operator_ids(data.get('operator_ids'), max_recipients)
+    hire_start, hire_end = parse_date_range(data.get('hire_start'), data.get('hire_end'),
+                                            names=('hire_start', 'hire_end'))
+    if hire_start is None:
+        raise ValueError('hire_start and hire_end are required')
+    equipment_id = parse_reference(data, 'equipment_id', Equipment)
+    category_id = parse_reference(data, 'category_id', EquipmentCategory)
+    requirements = parse_text(data, 'requirements', MAX_TEXT_LENGTH)
+    delivery_address = parse_text(data, 'delivery_address', RFQ.delivery_address.type.length)
+    delivery = DeliveryPreference(data.get('delivery_preference', DeliveryPreference.DELIVERY.value))
+    if delivery is DeliveryPreference.DELIVERY and not delivery_address:
+        raise ValueError('delivery_address is required for delivery')
+
+    # One query for every operator instead of a lookup each
+    found = set(db.session.execute(
+        select(Operator.id).where(
+            Operator.id.in_(operator_ids),
+            Operator.moderation_status == ModerationStatus.APPROVED,
+            Operator.deleted_at.is_(None),
+        )
+    ).scalars())
+    missing = [operator_id for operator_id in operator_ids if operator_id not in found]
+    if missing:
+        raise ValueError(f"Unknown operators: {', '.join(str(operator_id) for operator_id in missing)}")
+
+    now = datetime.utcnow()
+    rfq = RFQ(
+        hirer_id=hirer_id,
+        equipment_id=equipment_id,
+        category_id=category_id,
+        hire_start=hire_start,
+        hire_end=hire_end,
+        delivery_preference=delivery,
+        delivery_address=delivery_address,
+        requirements=requirements,
+        status=RFQStatus.PENDING,
+        expires_at=now + timedelta(days=expiry_days),
+        created_at=now,
+        updated_at=now,
+    )
+    db.session.add(rfq)
+    db.session.flush()
+    db.session.execute(insert(RFQRecipient), [
+        {'rfq_id': rfq.id, 'operator_id': operator_id, 'status': RFQStatus.PENDING,
+         'created_at': now, 'updated_at': now}
+        for operator_id in operator_ids
+    ])
+    db.session.commit()
+
+    task_queue.enqueue('notify_rfq_recipients', rfq_id=rfq.id)
+    return rfq
+
+
+@task_queue.task('notify_rfq_recipients')
+def notify_rfq_recipients(rfq_id):
+    """Email every operator of an RFQ that hasn't been notified yet"""
+    rows = db.session.execute(
+        select(RFQRecipient.id, User.email, Operator.business_name)
+        .join(Operator, Operator.id == RFQRecipient.operator_id)
+        .join(User, User.id == Operator.user_id)
+        .where(RFQRecipient.rfq_id == rfq_id, RFQRecipient.notified_at.is_(None))
+    ).all()
+    if not rows:
+        return
+    rfq = db.session.get(RFQ, rfq_id)
+    sent = []
+    for row in rows:
+        send_notification(
+            row.email,
+            f'New request for quote #{rfq.id}',
+            f'Hi {row.business_name}, a hirer has requested a quote for '
+            f'{rfq.hire_start:%d %b %Y} to {rfq.hire_end:%d %b %Y}.',
+        )
+        sent.append(row.id)
+    db.session.execute(
+        update(RFQRecipient).where(RFQRecipient.id.in_(sent)).values(notified_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+@task_queue.task('notify_rfq_hirer')
+def notify_rfq_hirer(rfq_id, recipient_id):
+    """Tell the hirer an operator has responded to their RFQ"""
+    recipient = db.session.get(RFQRecipient, recipient_id)
+    hirer = recipient.rfq.hirer
+    send_notification(
+        hirer.email,
+        f'{recipient.operator.business_name} {recipient.status.value} RFQ #{rfq_id}',
+        recipient.message or '',
+    )
+
+
+@task_queue.task('expire_rfqs')
+def expire_rfqs():
+    """Mark pending RFQs past their expiry, and their open responses, expired"""
+    now = datetime.utcnow()
+    expired = db.session.execute(
+        update(RFQ)
+        .where(RFQ.status == RFQStatus.PENDING, RFQ.expires_at <= now)
+        .values(status=RFQStatus.EXPIRED, updated_at=now)
+    ).rowcount
+    db.session.execute(
+        update(RFQRecipient)
+        .where(RFQRecipient.status == RFQStatus.PENDING,
+               RFQRecipient.rfq_id.in_(select(RFQ.id).where(RFQ.status == RFQStatus.EXPIRED)))
+        .values(status=RFQStatus.EXPIRED, updated_at=now)
+    )
+    db.session.commit()
+    if expired:
+        logger.info(f'Expired {expired} RFQs')
+
+
+@task_queue.task('remind_rfq_recipients')
+def remind_rfq_recipients():
+    """Remind operators once about RFQs they haven't answered"""
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['RFQ_REMINDER_HOURS'])
+    while True:
+        rows = db.session.execute(
+            select(RFQRecipient.id, RFQRecipient.rfq_id, User.email, Operator.business_name)
+            .join(RFQ, RFQ.id == RFQRecipient.rfq_id)
+            .join(Operator, Operator.id == RFQRecipient.operator_id)
+            .join(User, User.id == Operator.user_id)
+            .where(RFQ.status == RFQStatus.PENDING,
+                   RFQRecipient.status == RFQStatus.PENDING,
+                   RFQRecipient.notified_at <= cutoff,
+                   RFQRecipient.reminded_at.is_(None))
+            .order_by(RFQRecipient.id)
+            .limit(REMINDER_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        for row in rows:
+            send_notification(
+                row.email,
+                f'Reminder: request for quote #{row.rfq_id} is waiting for your response',
+                f'Hi {row.business_name}, a hirer is still waiting on your quote.',
+            )
+        db.session.execute(
+            update(RFQRecipient)
+            .where(RFQRecipient.id.in_([row.id for row in rows]))
+            .values(reminded_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+
+def respond_to_rfq(rfq, data):
+    """Record an operator's response and update the RFQ status"""
+    try:
+        status = RFQStatus(data.get('status'))
+    except ValueError:
+        status = None
+    if status not in RESPONSE_STATUSES:
+        raise ValueError('status must be accepted or declined')
+    if rfq.status is not RFQStatus.PENDING:
+        raise ValueError(f'RFQ is already {rfq.status.value}')
+    quoted_price = data.get('quoted_price')
+    if status is RFQStatus.ACCEPTED:
+        if (isinstance(quoted_price, bool) or not isinstance(quoted_price, (int, float))
+                or not math.isfinite(quoted_price) or quoted_price < 0):
+            raise ValueError('quoted_price is required when accepting')
+    message = parse_text(data, 'message', MAX_TEXT_LENGTH)
+    operator_id = data.get('operator_id')
+    if isinstance(operator_id, bool) or not isinstance(operator_id, int):
+        raise ValueError('operator_id must be an integer')
+
+    recipient = db.session.execute(
+        select(RFQRecipient).where(RFQRecipient.rfq_id == rfq.id,
+                                   RFQRecipient.operator_id == operator_id)
+    ).scalar_one_or_none()
+    if recipient is None:
+        raise LookupError('Operator was not sent this RFQ')
+    if recipient.status is not RFQStatus.PENDING:
+        raise ValueError(f'Operator has already {recipient.status.value} this RFQ')
+
+    recipient.status = status
+    recipient.quoted_price = quoted_price if status is RFQStatus.ACCEPTED else None
+    recipient.message = message
+    recipient.responded_at = datetime.utcnow()
+    db.session.flush()
+
+    if status is RFQStatus.ACCEPTED:
+        rfq.status = RFQStatus.ACCEPTED
+    elif not db.session.execute(
+        select(RFQRecipient.id).where(RFQRecipient.rfq_id == rfq.id,
+                                      RFQRecipient.status != RFQStatus.DECLINED).limit(1)
+    ).first():
+        rfq.status = RFQStatus.DECLINED
+    db.session.commit()
+
+    task_queue.enqueue('notify_rfq_hirer', rfq_id=rfq.id, recipient_id=recipient.id)
+    return recipient
+
+
+def hirer_rfqs(hirer_id, status, cursor, limit):
+    """A page of a hirer's RFQs, newest first"""
+    stmt = select(RFQ).where(RFQ.hirer_id == hirer_id)
+    if status is not None:
+        stmt = stmt.where(RFQ.status == status)
+    last = decode_keyset(cursor, ('created_at', 'id'))
+    if last is not None:
+        try:
+            created_at = datetime.fromisoformat(last['created_at'])
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+        stmt = stmt.where(or_(
+            RFQ.created_at < created_at,
+            and_(RFQ.created_at == created_at, RFQ.id < last['id']),
+        ))
+    stmt = stmt.order_by(RFQ.created_at.desc(), RFQ.id.desc()).limit(limit + 1)
+    rfqs = db.session.execute(stmt.options(selectinload(RFQ.recipients))).scalars().all()
+
+    next_cursor = None
+    if len(rfqs) > limit:
+        rfqs = rfqs[:limit]
+        next_cursor = encode_keyset(created_at=rfqs[-1].created_at.isoformat(), id=rfqs[-1].id)
+    return {'items': [serialize_rfq(rfq) for rfq in rfqs], 'next_cursor': next_cursor}
+
+
+def operator_rfqs(operator_id, status):
+    """RFQs sent to an operator, with their own response"""
+    stmt = (
+        select(RFQRecipient, RFQ)
+        .join(RFQ, RFQ.id == RFQRecipient.rfq_id)
+        .where(RFQRecipient.operator_id == operator_id)
+        .order_by(RFQ.created_at.desc(), RFQ.id.desc())
+    )
+    if status is not None:
+        stmt = stmt.where(RFQRecipient.status == status)
+    return [
+        dict(serialize_rfq(rfq, include_recipients=False), response=serialize_recipient(recipient))
+        for recipient, rfq in db.session.execute(stmt)
+    ]
+
+
+def serialize_recipient(recipient):
+    return {
+        'operator_id': recipient.operator_id,
+        'status': recipient.status.value,
+        'quoted_price': recipient.quoted_price,
+        'message': recipient.message,
+        'notified_at': recipient.notified_at.isoformat() if recipient.notified_at else None,
+        'reminded_at': recipient.reminded_at.isoformat() if recipient.reminded_at else None,
+        'responded_at': recipient.responded_at.isoformat() if recipient.responded_at else None,
+    }
+
+
+def serialize_rfq(rfq, include_recipients=True):
+    data = {
+        'id': rfq.id,
+        'hirer_id': rfq.hirer_id,
+        'equipment_id': rfq.equipment_id,
+        'category_id': rfq.category_id,
+        'hire_start': rfq.hire_start.isoformat(),
+        'hire_end': rfq.hire_end.isoformat(),
+        'delivery_preference': rfq.delivery_preference.value,
+        'delivery_address': rfq.delivery_address,
+        'requirements': rfq.requirements,
+        'status': rfq.status.value,
+        'expires_at': rfq.expires_at.isoformat() if rfq.expires_at else None,
+        'created_at': rfq.created_at.isoformat(),
+    }
+    if include_recipients:
+        data['recipients'] = [serialize_recipient(recipient) for recipient in rfq.recipients]
+    return data
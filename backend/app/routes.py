@@ -1,81 +1,600 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+import io
+from sqlalchemy import select
 from app import db
-from app.models import Equipment, EquipmentCategory, Operator, User
-import math
+from app.availability import (
+    available_between, blocks_for, create_alert, parse_date_range, parse_text, serialize_alert,
+    serialize_block,
+)
+from app.cache import cache
+from app.categories import category_tree, in_category, subtree_ids
+from app.clusters import map_clusters
+from app.compliance import EXPIRY_TYPES, expiring_soon
+from app.conditional import conditional, watermark
+from app.facets import equipment_facets, iter_bits, validate_rate_buckets
+from app.importer import import_equipment_csv
+from app.jobs import queue_stats
+from app.jsonfields import json_filter
+from app.localities import localities, serialize_locality
+from app.matching import match_electricians, parse_enum
+from app.models import (
+    AustralianState, AvailabilityBlockKind, CertificationType, Equipment, EquipmentAvailabilityBlock,
+    EquipmentCategory, EquipmentSearch, Operator, RFQ, RFQStatus, SpecialtyArea, User, VoltageLevel,
+)
+from app.pagination import (
+    decode_cursor, keyset_page, page_result, parse_fields, parse_limit,
+)
+from app.queries import (
+    EQUIPMENT_FIELDS, NEARBY_FIELDS, nearby_equipment_query, search_query,
+    serialize_equipment_row, serialize_nearby_row,
+)
+from app.rfqs import (
+    create_rfq, hirer_rfqs, operator_rfqs, respond_to_rfq, serialize_rfq,
+)
+from app.search import search_equipment
+from app.spatial import find_nearby_operators, find_operators_near_any, parse_points, validate_point
+from app.streaming import requested_stream_format, stream_response
 
 # Create a Blueprint for API routes
 api = Blueprint('api', __name__)
 
+def bad_request(message):
+    return jsonify({'error': message}), 400
+
+def json_object():
+    """The request's JSON body, {} when there is none; raises ValueError unless it's an object"""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    return data
+
+def category_filter(category_id, model=Equipment):
+    """WHERE clauses limiting equipment to a category subtree, for watermarks"""
+    if category_id is None:
+        return []
+    return [model.category_id.in_(subtree_ids(category_id))]
+
+def spec_filters(expressions, model=Equipment):
+    """WHERE clauses for ``spec`` parameters like power_kw>=20, all must match"""
+    return [json_filter(model.specifications, expression) for expression in expressions]
+
 @api.route('/equipment', methods=['GET'])
 def get_equipment():
-    """Get all equipment"""
-    equipment_list = Equipment.query.all()
-    result = []
-    for equipment in equipment_list:
-        result.append({
-            'id': equipment.id,
-            'name': equipment.name,
-            'description': equipment.description,
-            'daily_rate': equipment.daily_rate,
-            'weekly_rate': equipment.weekly_rate,
-            'monthly_rate': equipment.monthly_rate,
-            'availability_status': equipment.availability_status
-        })
-    return jsonify(result)
+    """Get a page of equipment, or all of it as a stream"""
+    try:
+        fields = parse_fields(request.args.get('fields'), EQUIPMENT_FIELDS)
+        category_id = request.args.get('category', type=int)
+        available = request.args.get('available')
+        max_daily_rate = request.args.get('max_daily_rate', type=float)
+        specs = request.args.getlist('spec')
+        where = spec_filters(specs, EquipmentSearch)
+        if available is not None:
+            where.append(EquipmentSearch.availability_status if parse_bool(available)
+                         else ~EquipmentSearch.availability_status)
+        if max_daily_rate is not None:
+            where.append(EquipmentSearch.daily_rate <= max_daily_rate)
+        cursor = request.args.get('cursor')
+        limit = parse_limit(request.args.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+        # The projection only has listings of visible operators
+        query = search_query(fields).where(*where)
+        if category_id is not None:
+            # Includes equipment in every subcategory
+            query = in_category(query, category_id, EquipmentSearch)
+        stmt = keyset_page(query, EquipmentSearch.id, cursor, limit)
+    except ValueError as e:
+        return bad_request(str(e))
+    stream_format = requested_stream_format()
+
+    def build_response():
+        if stream_format:
+            return stream_response(query,
+                                   lambda row: serialize_equipment_row(row, fields), stream_format,
+                                   current_app.config['STREAM_BATCH_SIZE'])
+
+        def build_page():
+            rows = db.session.execute(stmt)
+            result = [serialize_equipment_row(row, fields) for row in rows]
+            return page_result(result, limit)
+
+        params = {'fields': fields, 'category': category_id, 'available': available,
+                  'max_daily_rate': max_daily_rate, 'spec': specs, 'limit': limit, 'cursor': cursor}
+        return jsonify(cache.get_or_set('equipment', params, build_page))
+
+    # Answer polling clients from one aggregate query when nothing changed
+    mark = watermark(EquipmentSearch.updated_at, where=category_filter(category_id, EquipmentSearch) + where)
+    params = {'fields': fields, 'category': category_id, 'available': available,
+              'max_daily_rate': max_daily_rate, 'spec': specs, 'limit': limit, 'cursor': cursor,
+              'stream': stream_format}
+    return conditional('equipment', mark, params, build_response)
 
 @api.route('/equipment/nearby', methods=['GET'])
 def get_nearby_equipment():
-    """Get equipment near a location"""
+    """Get a page of equipment near a location, or all of it as a stream"""
     # Get parameters
-    lat = float(request.args.get('lat', 0))
-    lng = float(request.args.get('lng', 0))
-    radius = float(request.args.get('radius', 10000))  # Default 10km
-    
-    # Get all operators
-    operators = Operator.query.all()
-    nearby_operators = []
-    
-    # Calculate distance using Haversine formula
-    for operator in operators:
-        distance = calculate_distance(lat, lng, operator.latitude, operator.longitude)
-        if distance <= radius:
-            nearby_operators.append(operator.id)
-    
-    # Get equipment from nearby operators
-    equipment_list = Equipment.query.filter(Equipment.operator_id.in_(nearby_operators)).all()
-    
-    result = []
-    for equipment in equipment_list:
-        result.append({
-            'id': equipment.id,
-            'name': equipment.name,
-            'description': equipment.description,
-            'daily_rate': equipment.daily_rate,
-            'weekly_rate': equipment.weekly_rate,
-            'monthly_rate': equipment.monthly_rate,
-            'availability_status': equipment.availability_status,
-            'operator': {
-                'id': equipment.operator.id,
-                'business_name': equipment.operator.business_name,
-                'suburb': equipment.operator.suburb,
-                'state': equipment.operator.state
-            }
-        })
-    
-    return jsonify(result)
-
-def calculate_distance(lat1, lon1, lat2, lon2):
+    try:
+        suburb, postcode = request.args.get('suburb'), request.args.get('postcode')
+        if suburb or postcode:
+            # Centroid from the local gazetteer
+            if 'lat' in request.args or 'lng' in request.args:
+                raise ValueError('Give either lat and lng, or suburb and/or postcode')
+            gazetteer = localities.index(current_app.config['LOCALITY_INDEX_MAX_AGE'])
+            lat, lng = gazetteer.resolve(suburb, postcode, request.args.get('state'))
+        else:
+            lat = float(request.args.get('lat', 0))
+            lng = float(request.args.get('lng', 0))
+        # Only operators whose service area includes the search point; the
+        # radius then defaults to no further limit
+        delivers = parse_bool(request.args.get('delivers', 'false'))
+        radius = request.args.get('radius', None if delivers else 10000)  # Default 10km
+        radius = float(radius) if radius is not None else None
+        validate_point(lat, lng, radius, current_app.config['NEARBY_MAX_RADIUS'])
+        category_id = request.args.get('category', type=int)
+        available_from, available_to = parse_date_range(request.args.get('available_from'),
+                                                        request.args.get('available_to'))
+        specs = request.args.getlist('spec')
+        spec_where = spec_filters(specs, EquipmentSearch)
+        cursor = request.args.get('cursor')
+        decode_cursor(cursor)
+        fields = parse_fields(request.args.get('fields'), NEARBY_FIELDS)
+        limit = parse_limit(request.args.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return bad_request(str(e))
+    stream_format = requested_stream_format()
+
+    # Snap the search point to the cache grid so that nearby searches share
+    # cache entries, and compute the result for the snapped point
+    if cache.enabled:
+        lat, lng = cache.snap(lat), cache.snap(lng)
+
+    # Look up operators through the spatial index; haversine only runs on
+    # the operators in grid cells overlapping the search bounding box, or
+    # with ``delivers`` on the service areas overlapping the point's cell
+    nearby_operators = [
+        operator_id for operator_id, distance
+        in find_nearby_operators(lat, lng, radius, current_app.config, covered=delivers)
+    ]
+
+    # Get equipment from nearby operators off the search projection, which
+    # has their operator and category columns in the same row
+    query = nearby_equipment_query(nearby_operators, fields).where(*spec_where)
+    if category_id is not None:
+        query = in_category(query, category_id, EquipmentSearch)
+    # Drop equipment booked or blacked out during the requested dates
+    availability_filter = []
+    if available_from is not None:
+        availability_filter = available_between(available_from, available_to, EquipmentSearch)
+        query = query.where(*availability_filter)
+
+    def build_response():
+        if stream_format:
+            return stream_response(query,
+                                   lambda row: serialize_nearby_row(row, fields), stream_format,
+                                   current_app.config['STREAM_BATCH_SIZE'])
+
+        def build_page():
+            stmt = keyset_page(query, EquipmentSearch.id, cursor, limit)
+            rows = db.session.execute(stmt)
+            result = [serialize_nearby_row(row, fields) for row in rows]
+            return page_result(result, limit)
+
+        params = {'lat': lat, 'lng': lng, 'radius': radius, 'delivers': delivers,
+                  'category': category_id, 'available_from': available_from,
+                  'available_to': available_to, 'spec': specs, 'fields': fields, 'limit': limit,
+                  'cursor': cursor}
+        return jsonify(cache.get_or_set('nearby', params, build_page))
+
+    # Projection rows are rewritten whenever their equipment, operator or
+    # category columns change, so their updated_at covers all of them
+    mark = watermark(
+        EquipmentSearch.updated_at,
+        where=[EquipmentSearch.operator_id.in_(nearby_operators)]
+              + category_filter(category_id, EquipmentSearch) + availability_filter + spec_where,
+    )
+    params = {'lat': lat, 'lng': lng, 'radius': radius, 'delivers': delivers,
+              'category': category_id, 'available_from': available_from,
+              'available_to': available_to, 'spec': specs, 'fields': fields, 'limit': limit,
+              'cursor': cursor, 'stream': stream_format}
+    return conditional('nearby', mark, params, build_response)
+
+@api.route('/equipment/nearby/batch', methods=['POST'])
+def get_nearby_equipment_batch():
     """
-    Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees)
+    Get a page of equipment near any of many points, e.g. a set of job
+    sites. Each item carries the indexes of the points it is within range
+    of and its distance to the closest one. With ``delivers``, a point
+    only counts when it is inside the operator's service area too.
     """
-    # Convert decimal degrees to radians
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    r = 6371000  # Radius of earth in meters
-    return c * r
+    try:
+        data = json_object()
+        points = parse_points(data.get('points'), data.get('radius', 10000),
+                              current_app.config['NEARBY_BATCH_MAX_POINTS'],
+                              current_app.config['NEARBY_MAX_RADIUS'])
+        delivers = data.get('delivers', False)
+        if not isinstance(delivers, bool):
+            raise ValueError('delivers must be a boolean')
+        category_id = data.get('category')
+        if category_id is not None and not isinstance(category_id, int):
+            raise ValueError('category must be an integer')
+        available_from, available_to = parse_date_range(data.get('available_from'),
+                                                        data.get('available_to'))
+        specs = data.get('spec') or []
+        specs = [specs] if isinstance(specs, str) else list(specs)
+        spec_where = spec_filters(specs, EquipmentSearch)
+        cursor = data.get('cursor')
+        decode_cursor(cursor)
+        fields = data.get('fields')
+        fields = parse_fields(','.join(fields) if isinstance(fields, list) else fields, NEARBY_FIELDS)
+        limit = parse_limit(data.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+    except (TypeError, ValueError) as e:
+        return bad_request(str(e))
+
+    if cache.enabled:
+        points = [(cache.snap(lat), cache.snap(lng), radius) for lat, lng, radius in points]
+
+    def build_page():
+        # One distance matrix for all points, then one equipment query over
+        # every operator in range of any of them
+        operator_ids, nearest, hits = find_operators_near_any(points, current_app.config, delivers)
+        column = {operator_id: index for index, operator_id in enumerate(operator_ids.tolist())}
+        query = nearby_equipment_query(list(column), fields).where(*spec_where) \
+            .add_columns(EquipmentSearch.operator_id.label('batch_operator_id'))
+        if category_id is not None:
+            query = in_category(query, category_id, EquipmentSearch)
+        if available_from is not None:
+            query = query.where(*available_between(available_from, available_to, EquipmentSearch))
+
+        result = []
+        for row in db.session.execute(keyset_page(query, EquipmentSearch.id, cursor, limit)):
+            item = serialize_nearby_row(row, fields)
+            index = column[row.batch_operator_id]
+            item['distance'] = round(float(nearest[index]), 1)
+            item['points'] = hits[:, index].nonzero()[0].tolist()
+            result.append(item)
+        return page_result(result, limit)
+
+    params = {'points': points, 'delivers': delivers, 'category': category_id, 'available_from': available_from,
+              'available_to': available_to, 'spec': specs, 'fields': fields, 'limit': limit,
+              'cursor': cursor}
+    return jsonify(cache.get_or_set('nearby_batch', params, build_page))
+
+@api.route('/locations/autocomplete', methods=['GET'])
+def autocomplete_locations():
+    """Suburbs and postcodes starting with ``q``, from the local gazetteer"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return bad_request('q is required')
+    try:
+        limit = parse_limit(request.args.get('limit'), 10, 50)
+    except ValueError as e:
+        return bad_request(str(e))
+    entries = localities.index(current_app.config['LOCALITY_INDEX_MAX_AGE']).autocomplete(query, limit)
+    return jsonify({'items': [serialize_locality(entry) for entry in entries]})
+
+@api.route('/map/clusters', methods=['GET'])
+def get_map_clusters():
+    """
+    Operator clusters for a map view: count, centroid, equipment count and
+    daily rate range per tile. ``bbox`` is min_lng,min_lat,max_lng,max_lat.
+    """
+    try:
+        try:
+            bbox = [float(value) for value in request.args.get('bbox', '').split(',')]
+        except ValueError:
+            raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat')
+        if len(bbox) != 4:
+            raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat')
+        min_lng, min_lat, max_lng, max_lat = bbox
+        if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+            raise ValueError('bbox is out of range')
+        zoom = request.args.get('zoom', type=int)
+        if zoom is None or not 0 <= zoom <= 24:
+            raise ValueError('zoom must be an integer between 0 and 24')
+        config = current_app.config
+        map_clusters.configure(config['MAP_CLUSTER_MAX_ZOOM'], config['MAP_CLUSTER_MAX_AGE'])
+        level, clusters = map_clusters.query(bbox, zoom, config['MAP_CLUSTER_DETAIL'],
+                                             config['MAP_CLUSTER_MAX_TILES'])
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify({'zoom': zoom, 'cluster_zoom': level, 'clusters': clusters})
+
+@api.route('/equipment/search', methods=['GET'])
+def search_equipment_listings():
+    """Full-text search over equipment name, category, description and specifications"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return bad_request('q is required')
+    try:
+        fields = parse_fields(request.args.get('fields'), EQUIPMENT_FIELDS)
+        limit = parse_limit(request.args.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+        available_from, available_to = parse_date_range(request.args.get('available_from'),
+                                                        request.args.get('available_to'))
+    except ValueError as e:
+        return bad_request(str(e))
+
+    def build_result():
+        where = []
+        if available_from is not None:
+            where = available_between(available_from, available_to, EquipmentSearch)
+        ranked = search_equipment(query, limit, where, current_app.config['SEARCH_INDEX_MAX_AGE'])
+        scores = dict(ranked)
+        rows = db.session.execute(search_query(fields).where(EquipmentSearch.id.in_(scores)))
+        items = {row.id: serialize_equipment_row(row, fields) for row in rows}
+        result = []
+        for equipment_id, score in ranked:
+            if equipment_id in items:
+                items[equipment_id]['score'] = round(score, 4)
+                result.append(items[equipment_id])
+        return {'items': result}
+
+    params = {'q': query, 'fields': fields, 'limit': limit,
+              'available_from': available_from, 'available_to': available_to}
+    return jsonify(cache.get_or_set('search', params, build_result))
+
+def parse_list(name, convert=str):
+    """Parse a comma separated query parameter"""
+    value = request.args.get(name)
+    if not value:
+        return []
+    try:
+        return [convert(item.strip()) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError(f'Invalid value for {name}')
+
+def parse_bool(value):
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'Invalid boolean: {value}')
+
+@api.route('/equipment/facets', methods=['GET'])
+def get_equipment_facets():
+    """Get a page of filtered equipment together with facet counts"""
+    try:
+        filters = {
+            'category': parse_list('category', int),
+            'daily_rate': parse_list('daily_rate'),
+            'availability_status': parse_list('available', parse_bool),
+            'state': parse_list('state'),
+        }
+        validate_rate_buckets(filters['daily_rate'], current_app.config['FACET_RATE_BUCKETS'])
+        fields = parse_fields(request.args.get('fields'), EQUIPMENT_FIELDS)
+        cursor = request.args.get('cursor')
+        last_id = decode_cursor(cursor)
+        limit = parse_limit(request.args.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+    except ValueError as e:
+        return bad_request(str(e))
+
+    def build_result():
+        equipment_facets.configure(current_app.config['FACET_RATE_BUCKETS'],
+                                   current_app.config['FACET_INDEX_MAX_AGE'])
+        matches, counts = equipment_facets.query(filters)
+
+        # Keyset page straight off the result bitmap
+        page_ids = []
+        for equipment_id in iter_bits(matches, last_id):
+            page_ids.append(equipment_id)
+            if len(page_ids) > limit:
+                break
+        rows = db.session.execute(
+            search_query(fields).where(EquipmentSearch.id.in_(page_ids)))
+        result = page_result([serialize_equipment_row(row, fields) for row in rows], limit)
+        result['total'] = matches.bit_count()
+        result['facets'] = counts
+        return result
+
+    params = {'filters': filters, 'fields': fields, 'limit': limit, 'cursor': cursor}
+    return jsonify(cache.get_or_set('facets', params, build_result))
+
+@api.route('/electricians/match', methods=['GET'])
+def get_electrician_matches():
+    """Rank electricians for a job spec"""
+    try:
+        spec = {
+            'certifications': parse_list('certifications', lambda v: parse_enum(CertificationType, v)),
+            'states': parse_list('state', lambda v: parse_enum(AustralianState, v)),
+            'voltage_level': None,
+            'specialty': None,
+            'max_hourly_rate': request.args.get('max_hourly_rate', type=float),
+        }
+        if request.args.get('voltage_level'):
+            spec['voltage_level'] = parse_enum(VoltageLevel, request.args['voltage_level'])
+        if request.args.get('specialty'):
+            spec['specialty'] = parse_enum(SpecialtyArea, request.args['specialty'])
+        limit = parse_limit(request.args.get('limit'), 20, current_app.config['PAGE_SIZE_MAX'])
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify(match_electricians(spec, limit, current_app.config['MATCH_INDEX_MAX_AGE']))
+
+@api.route('/compliance/expiring', methods=['GET'])
+def get_expiring_compliance():
+    """Get licences, certifications and insurance expiring within a window"""
+    try:
+        within_days = request.args.get('within_days', 30, type=int)
+        if not 0 < within_days <= 365:
+            raise ValueError('within_days must be between 1 and 365')
+        types = parse_list('type') or list(EXPIRY_TYPES)
+        unknown = [kind for kind in types if kind not in EXPIRY_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown types: {', '.join(unknown)}")
+        limit = parse_limit(request.args.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+        return jsonify(expiring_soon(within_days, types, request.args.get('cursor'), limit))
+    except ValueError as e:
+        return bad_request(str(e))
+
+@api.route('/equipment/<int:equipment_id>/availability', methods=['GET'])
+def get_equipment_availability(equipment_id):
+    """Get the bookings and blackouts of a piece of equipment"""
+    try:
+        start, end = parse_date_range(request.args.get('from'), request.args.get('to'),
+                                      names=('from', 'to'))
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify([serialize_block(block) for block in blocks_for(equipment_id, start, end)])
+
+@api.route('/equipment/<int:equipment_id>/availability', methods=['POST'])
+def create_availability_block(equipment_id):
+    """Block a date range for a piece of equipment"""
+    if db.session.get(Equipment, equipment_id) is None:
+        return jsonify({'error': 'Equipment not found'}), 404
+    try:
+        data = json_object()
+        start, end = parse_date_range(data.get('start_date'), data.get('end_date'),
+                                      names=('start_date', 'end_date'))
+        if start is None:
+            raise ValueError('start_date and end_date are required')
+        kind = AvailabilityBlockKind(data.get('kind', AvailabilityBlockKind.BLACKOUT.value))
+        note = parse_text(data, 'note', EquipmentAvailabilityBlock.note.type.length)
+    except ValueError as e:
+        return bad_request(str(e))
+
+    block = EquipmentAvailabilityBlock(equipment_id=equipment_id, kind=kind, start_date=start,
+                                       end_date=end, note=note)
+    db.session.add(block)
+    db.session.commit()
+    return jsonify(serialize_block(block)), 201
+
+@api.route('/equipment/<int:equipment_id>/availability/<int:block_id>', methods=['DELETE'])
+def delete_availability_block(equipment_id, block_id):
+    """Remove a booking or blackout"""
+    block = db.session.get(EquipmentAvailabilityBlock, block_id)
+    if block is None or block.equipment_id != equipment_id:
+        return jsonify({'error': 'Availability block not found'}), 404
+    db.session.delete(block)
+    db.session.commit()
+    return '', 204
+
+@api.route('/equipment/<int:equipment_id>/availability/alerts', methods=['POST'])
+def create_availability_alert(equipment_id):
+    """Get notified when a piece of equipment is free for a date range"""
+    if db.session.get(Equipment, equipment_id) is None:
+        return jsonify({'error': 'Equipment not found'}), 404
+    try:
+        alert = create_alert(equipment_id, json_object())
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify(serialize_alert(alert)), 201
+
+@api.route('/operators/<int:operator_id>/equipment/import', methods=['POST'])
+def import_operator_equipment(operator_id):
+    """Bulk import equipment listings from a CSV upload"""
+    if db.session.get(Operator, operator_id) is None:
+        return jsonify({'error': 'Operator not found'}), 404
+
+    # Accept a multipart upload ('file') or a raw text/csv body, and parse
+    # it as it streams in
+    upload = request.files.get('file')
+    raw = upload.stream if upload else request.stream
+    stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    try:
+        report = import_equipment_csv(stream, operator_id,
+                                      batch_size=current_app.config['IMPORT_BATCH_SIZE'])
+    except (ValueError, UnicodeDecodeError) as e:
+        return bad_request(str(e))
+    return jsonify(report)
+
+def parse_rfq_status():
+    value = request.args.get('status')
+    if not value:
+        return None
+    try:
+        return RFQStatus(value)
+    except ValueError:
+        raise ValueError(f'Invalid status: {value}')
+
+@api.route('/rfqs', methods=['POST'])
+def create_rfq_request():
+    """Send a request for quote to several operators at once"""
+    try:
+        rfq = create_rfq(json_object(), current_app.config['RFQ_MAX_RECIPIENTS'],
+                         current_app.config['RFQ_EXPIRY_DAYS'])
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify(serialize_rfq(rfq)), 201
+
+@api.route('/rfqs', methods=['GET'])
+def get_rfqs():
+    """Get a page of a hirer's RFQs, newest first"""
+    hirer_id = request.args.get('hirer_id', type=int)
+    if hirer_id is None:
+        return bad_request('hirer_id is required')
+    try:
+        status = parse_rfq_status()
+        limit = parse_limit(request.args.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+        return jsonify(hirer_rfqs(hirer_id, status, request.args.get('cursor'), limit))
+    except ValueError as e:
+        return bad_request(str(e))
+
+@api.route('/rfqs/<int:rfq_id>', methods=['GET'])
+def get_rfq(rfq_id):
+    """Get an RFQ with every operator's response"""
+    rfq = db.session.get(RFQ, rfq_id)
+    if rfq is None:
+        return jsonify({'error': 'RFQ not found'}), 404
+    return jsonify(serialize_rfq(rfq))
+
+@api.route('/rfqs/<int:rfq_id>/responses', methods=['POST'])
+def respond_to_rfq_request(rfq_id):
+    """Accept or decline an RFQ on behalf of an operator"""
+    rfq = db.session.get(RFQ, rfq_id)
+    if rfq is None:
+        return jsonify({'error': 'RFQ not found'}), 404
+    try:
+        respond_to_rfq(rfq, json_object())
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify(serialize_rfq(rfq))
+
+@api.route('/operators/<int:operator_id>/rfqs', methods=['GET'])
+def get_operator_rfqs(operator_id):
+    """Get the RFQs sent to an operator"""
+    try:
+        status = parse_rfq_status()
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify(operator_rfqs(operator_id, status))
+
+@api.route('/categories', methods=['GET'])
+def get_categories():
+    """Get all equipment categories"""
+    def build_response():
+        categories = db.session.execute(select(
+            EquipmentCategory.id, EquipmentCategory.parent_id,
+            EquipmentCategory.name, EquipmentCategory.description,
+        ).order_by(EquipmentCategory.name))
+        return jsonify([dict(row._mapping) for row in categories])
+
+    return conditional('categories', watermark(EquipmentCategory.updated_at), None, build_response)
+
+@api.route('/categories/tree', methods=['GET'])
+def get_category_tree():
+    """Get the whole category hierarchy as a nested tree"""
+    def build_response():
+        return jsonify(cache.get_or_set('category_tree', {}, category_tree))
+
+    return conditional('category_tree', watermark(EquipmentCategory.updated_at), None, build_response)
+
+@api.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit/miss counters"""
+    return jsonify(cache.stats())
+
+@api.route('/jobs/stats', methods=['GET'])
+def get_job_stats():
+    """Get background job queue depth and latency"""
+    return jsonify(queue_stats())
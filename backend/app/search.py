@@ -0,0 +1,260 @@
+"""
+Full-text search over equipment name, category path, description and
+specifications, read from the ``equipment_search`` projection (see
+app/projection.py), which only has listings of visible operators.
+
+On Postgres the search runs against the projection's generated, weighted
+``search_vector`` column with a GIN index on it (see the
+equipment_search_projection migration), ranked with ``ts_rank_cd``.
+
+Other databases (SQLite in development) use an in-process inverted index
+ranked with BM25. It is built from the projection on first use and then
+updated with the rows the projection writes. Only this process's writes
+reach it that way, so it is also rebuilt every ``SEARCH_INDEX_MAX_AGE``
+seconds.
+
+Both backends match listings containing every query term.
+"""
+from collections import Counter
+from threading import Lock
+import heapq
+import json
+import math
+import re
+import time
+
+from sqlalchemy import func, literal_column, select
+
+from app import db
+from app.events import on_change
+from app.models import Equipment, EquipmentCategory, EquipmentSearch, Operator
+
+# Per-field weights, matching the A/B/C weights of the tsvector
+FIELD_WEIGHTS = {'name': 3, 'category': 2, 'specifications': 2, 'description': 1}
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in is it of on or the to with'.split()
+)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+DEFAULT_MAX_AGE = 300  # seconds
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def specifications_text(specifications):
+    """Flatten the specifications JSON into 'key value' text"""
+    if not specifications:
+        return ''
+    try:
+        value = json.loads(specifications) if isinstance(specifications, str) else specifications
+    except ValueError:
+        return specifications
+    parts = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, child in node.items():
+                parts.append(str(key).replace('_', ' '))
+                walk(child)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+        elif node is not None:
+            parts.append(str(node))
+
+    walk(value)
+    return ' '.join(parts)
+
+
+class InvertedIndex:
+    """In-memory inverted index with BM25 ranking"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.postings = {}  # term -> {doc_id: weighted term frequency}
+        self.doc_terms = {}  # doc_id -> Counter of terms, needed for removal
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, doc_id, fields):
+        """Index a document given as {field name: text}, replacing any old version"""
+        self.remove(doc_id)
+        terms = Counter()
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1)
+            for token in tokenize(text or ''):
+                terms[token] += weight
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query, limit=20):
+        """
+        Return [(doc_id, score)] for documents containing every query term,
+        best first; ``limit=None`` returns all of them
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_terms:
+            return []
+        postings = [self.postings.get(term) for term in terms]
+        if not all(postings):
+            return []
+
+        # Intersect starting from the rarest term
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        count = len(self.doc_terms)
+        average_length = self.total_length / count
+        scores = []
+        for doc_id in candidates:
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+            score = 0.0
+            for posting in postings:
+                frequency = posting[doc_id]
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append((doc_id, score))
+        key = lambda item: (-item[1], item[0])
+        if limit is None:
+            return sorted(scores, key=key)
+        return heapq.nsmallest(limit, scores, key=key)
+
+
+def equipment_document(name, category_path, description, specifications):
+    return {
+        'name': name,
+        'category': category_path,
+        'description': description,
+        'specifications': specifications_text(specifications),
+    }
+
+
+class EquipmentSearchIndex:
+    """Process-wide InvertedIndex over the search projection, fed by its writes"""
+
+    def __init__(self):
+        self._index = None
+        self._built_at = 0
+        self._lock = Lock()
+
+    def index(self, max_age=DEFAULT_MAX_AGE):
+        if self._index is None or time.monotonic() - self._built_at > max_age:
+            with self._lock:
+                # Another thread may have rebuilt it while we waited
+                if self._index is None or time.monotonic() - self._built_at > max_age:
+                    self._index = self._build()
+                    self._built_at = time.monotonic()
+        return self._index
+
+    def _build(self):
+        index = InvertedIndex()
+        rows = db.session.execute(
+            select(EquipmentSearch.id, EquipmentSearch.name, EquipmentSearch.category_path,
+                   EquipmentSearch.description, EquipmentSearch.specifications)
+            .execution_options(yield_per=1000)
+        )
+        for row in rows:
+            index.add(row.id, equipment_document(
+                row.name, row.category_path, row.description, row.specifications))
+        return index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def replace(self, removed_ids, rows):
+        """Apply a projection write: rows deleted by id, then projection rows (dicts) inserted"""
+        with self._lock:
+            if self._index is None:
+                # Not built yet; it will see these rows when it is
+                return
+            for doc_id in removed_ids:
+                self._index.remove(doc_id)
+            for row in rows:
+                self._index.add(row['id'], equipment_document(
+                    row['name'], row['category_path'], row['description'], row['specifications']))
+
+    def search(self, query, limit, max_age=DEFAULT_MAX_AGE):
+        index = self.index(max_age)
+        with self._lock:
+            return index.search(query, limit)
+
+
+equipment_search_index = EquipmentSearchIndex()
+
+
+@on_change(Equipment, Operator, EquipmentCategory, EquipmentSearch)
+def _reset_search_index(action, target):
+    # Row-level writes reach the index through the projection; only bulk
+    # writes and rollbacks need a rebuild
+    if action == 'reset':
+        equipment_search_index.invalidate()
+
+
+def search_vector():
+    """The projection's generated tsvector column (Postgres only)"""
+    return literal_column('equipment_search.search_vector')
+
+
+def search_equipment(query, limit=20, where=(), max_age=DEFAULT_MAX_AGE):
+    """
+    Return [(equipment_id, score)] ranked best first, keeping only
+    projection rows matching the extra ``where`` clauses; ``max_age`` is for
+    the in-process index
+    """
+    if db.engine.dialect.name == 'postgresql':
+        vector = search_vector()
+        tsquery = func.websearch_to_tsquery('english', query)
+        rank = func.ts_rank_cd(vector, tsquery)
+        stmt = (
+            select(EquipmentSearch.id, rank.label('score'))
+            .where(vector.op('@@')(tsquery), *where)
+            .order_by(rank.desc(), EquipmentSearch.id)
+            .limit(limit)
+        )
+        return [(row.id, row.score) for row in db.session.execute(stmt)]
+
+    if not where:
+        return equipment_search_index.search(query, limit, max_age)
+    # Filter the ranked matches through the database a chunk at a time
+    # until the page is full
+    result = []
+    ranked = equipment_search_index.search(query, None, max_age)
+    chunk_size = max(limit * 4, 100)
+    for offset in range(0, len(ranked), chunk_size):
+        chunk = ranked[offset:offset + chunk_size]
+        allowed = set(db.session.execute(
+            select(EquipmentSearch.id).where(EquipmentSearch.id.in_([doc_id for doc_id, score in chunk]), *where)
+        ).scalars())
+        result.extend(item for item in chunk if item[0] in allowed)
+        if len(result) >= limit:
+            break
+    return result[:limit]
@@ -0,0 +1,399 @@
+"""
+Synthetic data for load testing and query plan checks.
+
+``seed_database`` generates realistic looking Australian marketplace data at
+a configurable scale: operators spread around the capital cities and
+regional centres of every state, a two level category tree, equipment with
+specifications and rates, availability blocks, electricians with licences,
+certifications, skills and projects, and hirer RFQs sent to operators.
+
+Rows are generated lazily and written in batches with executemany INSERTs,
+one commit per batch, so a million rows don't have to fit in memory. Ids
+are assigned up front (continuing from the current maximum) so child rows
+can reference their parents without reading them back; Postgres sequences
+are moved past them afterwards.
+
+Categories go through the ORM so the closure table stays in sync, and
+existing categories with the same name are reused.
+"""
+from datetime import datetime, timedelta
+import itertools
+import logging
+import random
+
+from sqlalchemy import func, insert, select, text
+
+from app import db
+from app.events import notify_bulk
+from app.projection import rebuild_projection
+from app.models import (
+    RFQ, AustralianState, AvailabilityBlockKind, Certification, CertificationType,
+    DeliveryPreference, Electrician, Equipment, EquipmentAvailabilityBlock, EquipmentCategory,
+    License, LicenseType, ModerationStatus, Operator, Project, ProjectRole, ProjectType,
+    Qualification, QualificationType, RFQRecipient, RFQStatus, Skill, SpecialtyArea, User,
+    UserRole, VoltageLevel,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# (state, centre, latitude, longitude, spread in degrees, weight, suburbs, postcode)
+REGIONS = [
+    ('NSW', 'Sydney', -33.87, 151.21, 0.35, 22,
+     ['Parramatta', 'Blacktown', 'Penrith', 'Liverpool', 'Campbelltown', 'Chatswood'], '2150'),
+    ('NSW', 'Newcastle', -32.93, 151.78, 0.2, 4, ['Hamilton', 'Mayfield', 'Cardiff'], '2300'),
+    ('NSW', 'Dubbo', -32.25, 148.60, 0.3, 1, ['Dubbo', 'Wellington'], '2830'),
+    ('VIC', 'Melbourne', -37.81, 144.96, 0.35, 20,
+     ['Dandenong', 'Footscray', 'Ringwood', 'Werribee', 'Frankston', 'Epping'], '3000'),
+    ('VIC', 'Geelong', -38.15, 144.36, 0.15, 2, ['Corio', 'Belmont'], '3220'),
+    ('VIC', 'Bendigo', -36.76, 144.28, 0.2, 1, ['Bendigo', 'Eaglehawk'], '3550'),
+    ('QLD', 'Brisbane', -27.47, 153.03, 0.35, 14,
+     ['Ipswich', 'Logan', 'Chermside', 'Capalaba', 'Springwood'], '4000'),
+    ('QLD', 'Gold Coast', -28.02, 153.40, 0.15, 4, ['Southport', 'Nerang', 'Robina'], '4215'),
+    ('QLD', 'Townsville', -19.26, 146.82, 0.2, 2, ['Garbutt', 'Aitkenvale'], '4810'),
+    ('QLD', 'Mackay', -21.14, 149.19, 0.3, 2, ['Paget', 'Moranbah'], '4740'),
+    ('WA', 'Perth', -31.95, 115.86, 0.35, 10,
+     ['Welshpool', 'Osborne Park', 'Malaga', 'Canning Vale', 'Midland'], '6000'),
+    ('WA', 'Kalgoorlie', -30.75, 121.47, 0.3, 1, ['Kalgoorlie', 'Boulder'], '6430'),
+    ('WA', 'Port Hedland', -20.31, 118.58, 0.4, 1, ['South Hedland', 'Wedgefield'], '6721'),
+    ('SA', 'Adelaide', -34.93, 138.60, 0.3, 7, ['Salisbury', 'Wingfield', 'Lonsdale', 'Elizabeth'], '5000'),
+    ('TAS', 'Hobart', -42.88, 147.33, 0.2, 2, ['Glenorchy', 'Moonah'], '7000'),
+    ('TAS', 'Launceston', -41.44, 147.14, 0.15, 1, ['Invermay', 'Mowbray'], '7250'),
+    ('NT', 'Darwin', -12.46, 130.84, 0.2, 1, ['Winnellie', 'Berrimah'], '0800'),
+    ('ACT', 'Canberra', -35.28, 149.13, 0.15, 2, ['Fyshwick', 'Mitchell', 'Hume'], '2600'),
+]
+
+STATE_ENUMS = {member.name: member for member in AustralianState}
+
+# Top level category -> subcategory -> (brands, daily rate range)
+CATEGORY_TREE = {
+    'Earthmoving': {
+        'Mini Excavators': (['Kubota', 'Yanmar', 'Takeuchi'], (180, 450)),
+        'Excavators': (['Caterpillar', 'Komatsu', 'Hitachi', 'Volvo'], (500, 1800)),
+        'Skid Steer Loaders': (['Bobcat', 'Caterpillar', 'Kubota'], (250, 600)),
+        'Backhoes': (['JCB', 'Caterpillar', 'Case'], (400, 900)),
+        'Bulldozers': (['Caterpillar', 'Komatsu'], (900, 2500)),
+    },
+    'Lifting': {
+        'Scissor Lifts': (['Genie', 'JLG', 'Skyjack'], (120, 350)),
+        'Boom Lifts': (['Genie', 'JLG', 'Haulotte'], (250, 800)),
+        'Telehandlers': (['Manitou', 'JCB', 'Merlo'], (350, 900)),
+        'Franna Cranes': (['Terex Franna'], (900, 2200)),
+        'Forklifts': (['Toyota', 'Hyster', 'Linde'], (100, 300)),
+    },
+    'Compaction': {
+        'Plate Compactors': (['Wacker Neuson', 'Bomag'], (60, 150)),
+        'Rollers': (['Bomag', 'Dynapac', 'Hamm'], (250, 900)),
+        'Rammers': (['Wacker Neuson', 'Mikasa'], (60, 120)),
+    },
+    'Power & Air': {
+        'Generators': (['Cummins', 'Atlas Copco', 'Kohler'], (80, 700)),
+        'Air Compressors': (['Atlas Copco', 'Sullair'], (120, 500)),
+        'Lighting Towers': (['Atlas Copco', 'Generac'], (70, 180)),
+    },
+    'Trucks & Transport': {
+        'Tipper Trucks': (['Isuzu', 'Hino', 'Volvo'], (400, 1200)),
+        'Water Carts': (['Isuzu', 'Mercedes-Benz'], (500, 1300)),
+        'Trailers': (['Tagalong', 'Brian James'], (60, 250)),
+    },
+    'Concrete': {
+        'Concrete Mixers': (['Belle', 'Altrad'], (60, 200)),
+        'Concrete Saws': (['Husqvarna', 'Stihl'], (80, 250)),
+        'Power Trowels': (['Allen', 'Wacker Neuson'], (90, 220)),
+    },
+}
+
+BUSINESS_WORDS = ['Plant', 'Equipment', 'Machinery', 'Earthmoving', 'Hire', 'Civil', 'Access', 'Lift']
+FIRST_NAMES = ['Jack', 'Olivia', 'Liam', 'Charlotte', 'Noah', 'Mia', 'William', 'Ava', 'James',
+               'Amelia', 'Thomas', 'Isla', 'Lachlan', 'Chloe', 'Ethan', 'Grace', 'Cooper', 'Ruby']
+LAST_NAMES = ['Smith', 'Jones', 'Williams', 'Brown', 'Wilson', 'Taylor', 'Nguyen', 'Johnson',
+              'Martin', 'White', 'Anderson', 'Walker', 'Thompson', 'Kelly', 'Ryan', 'Singh']
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _sync_sequence(model):
+    """Move a Postgres serial past ids we inserted explicitly"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    table = model.__tablename__
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+    ))
+    db.session.commit()
+
+
+def _write(model, rows, batch_size):
+    """Insert an iterable of row dicts in batches; returns the row count"""
+    count = 0
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        count += len(batch)
+    _sync_sequence(model)
+    logger.info(f'Seeded {count} {model.__tablename__}')
+    return count
+
+
+def seed_categories():
+    """Create the category tree, reusing categories that already exist by name"""
+    existing = {category.name: category for category in db.session.query(EquipmentCategory)}
+    subcategories = {}
+    for parent_name, children in CATEGORY_TREE.items():
+        parent = existing.get(parent_name)
+        if parent is None:
+            parent = EquipmentCategory(name=parent_name)
+            db.session.add(parent)
+            db.session.flush()
+        for name, (brands, rates) in children.items():
+            category = existing.get(name)
+            if category is None:
+                category = EquipmentCategory(name=name, parent_id=parent.id)
+                db.session.add(category)
+                db.session.flush()
+            subcategories[category.id] = (name, brands, rates)
+    db.session.commit()
+    return subcategories
+
+
+def _region(rng):
+    return rng.choices(REGIONS, weights=[region[5] for region in REGIONS])[0]
+
+
+def seed_database(equipment=10000, operators=None, electricians=None, hirers=None, rfqs=None,
+                  batch_size=DEFAULT_BATCH_SIZE, seed=None, now=None):
+    """
+    Generate a marketplace with ``equipment`` listings. The other counts
+    default to proportions of it. Returns what was created, including the
+    id ranges, for benchmarks to build requests from.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    operators = operators if operators is not None else max(equipment // 10, 1)
+    electricians = electricians if electricians is not None else max(equipment // 5, 1)
+    hirers = hirers if hirers is not None else max(operators // 2, 1)
+    rfqs = rfqs if rfqs is not None else equipment // 5
+
+    subcategories = seed_categories()
+    category_ids = sorted(subcategories)
+
+    first_user = _next_id(User)
+    first_operator = _next_id(Operator)
+    first_equipment = _next_id(Equipment)
+    first_electrician = _next_id(Electrician)
+    first_hirer = first_user + operators
+    operator_ids = range(first_operator, first_operator + operators)
+    equipment_ids = range(first_equipment, first_equipment + equipment)
+    hirer_ids = range(first_hirer, first_hirer + hirers)
+
+    def users():
+        for offset in range(operators + hirers):
+            user_id = first_user + offset
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield {
+                'id': user_id, 'email': f'{first}.{last}.{user_id}@example.com'.lower(),
+                'password_hash': 'seeded', 'full_name': f'{first} {last}',
+                'role': UserRole.OPERATOR if offset < operators else UserRole.HIRER,
+                'phone': f'04{rng.randint(0, 99999999):08d}', 'created_at': now, 'updated_at': now,
+            }
+
+    def operator_rows():
+        for offset, operator_id in enumerate(operator_ids):
+            state, centre, lat, lng, spread, _, suburbs, postcode = _region(rng)
+            suburb = rng.choice(suburbs)
+            # Mostly approved; some waiting on moderation, a few rejected or gone
+            roll = rng.random()
+            status = ModerationStatus.APPROVED if roll < 0.9 else \
+                ModerationStatus.PENDING if roll < 0.97 else ModerationStatus.REJECTED
+            yield {
+                'id': operator_id, 'user_id': first_user + offset,
+                'business_name': f'{suburb} {rng.choice(BUSINESS_WORDS)} Hire {operator_id}',
+                'abn': f'{rng.randint(10**10, 10**11 - 1)}',
+                'latitude': lat + rng.gauss(0, spread), 'longitude': lng + rng.gauss(0, spread),
+                'service_radius': rng.choice([10000, 25000, 50000, 100000]),
+                'address_line1': f'{rng.randint(1, 300)} Industrial Drive',
+                'suburb': suburb, 'state': state, 'postcode': postcode,
+                'operating_hours': {'mon-fri': '06:00-17:00', 'sat': '07:00-12:00'},
+                'moderation_status': status,
+                'deleted_at': now if rng.random() < 0.01 else None,
+                'created_at': now - timedelta(days=rng.randint(0, 1500)), 'updated_at': now,
+            }
+
+    def equipment_rows():
+        for equipment_id in equipment_ids:
+            category_id = rng.choice(category_ids)
+            name, brands, (low, high) = subcategories[category_id]
+            brand = rng.choice(brands)
+            daily = float(rng.randrange(low, high + 1, 5))
+            singular = name[:-1] if name.endswith('s') else name
+            yield {
+                'id': equipment_id, 'operator_id': rng.choice(operator_ids), 'category_id': category_id,
+                'name': f'{brand} {singular} {rng.choice("ABCDEFGHJKLMNPRSTUVWX")}{rng.randint(10, 990)}',
+                'description': f'{brand} {singular.lower()}, serviced and ready for site',
+                'specifications': {
+                    'brand': brand,
+                    'year': rng.randint(2008, now.year),
+                    'power_kw': rng.randint(5, 400),
+                    'weight_t': round(rng.uniform(0.5, 40), 1),
+                    'fuel': rng.choice(['diesel', 'diesel', 'petrol', 'electric']),
+                },
+                'daily_rate': daily, 'weekly_rate': daily * 5, 'monthly_rate': daily * 18,
+                'availability_status': rng.random() < 0.85,
+                'created_at': now - timedelta(days=rng.randint(0, 1000)),
+                'updated_at': now - timedelta(minutes=rng.randint(0, 200000)),
+            }
+
+    def availability_blocks():
+        for equipment_id in equipment_ids:
+            for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+                start = now + timedelta(days=rng.randint(-30, 120))
+                kind = AvailabilityBlockKind.BOOKING if rng.random() < 0.8 else AvailabilityBlockKind.BLACKOUT
+                yield {
+                    'equipment_id': equipment_id, 'kind': kind,
+                    'start_date': start, 'end_date': start + timedelta(days=rng.randint(1, 14)),
+                    'created_at': now, 'updated_at': now,
+                }
+
+    counts = {
+        'categories': len(category_ids),
+        'users': _write(User, users(), batch_size),
+        'operators': _write(Operator, operator_rows(), batch_size),
+        'equipment': _write(Equipment, equipment_rows(), batch_size),
+        'availability_blocks': _write(EquipmentAvailabilityBlock, availability_blocks(), batch_size),
+    }
+    counts.update(seed_electricians(electricians, first_electrician, rng, now, batch_size))
+
+    first_rfq = _next_id(RFQ)
+
+    def rfq_rows():
+        for rfq_id in range(first_rfq, first_rfq + rfqs):
+            start = now + timedelta(days=rng.randint(1, 60))
+            created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+            yield {
+                'id': rfq_id, 'hirer_id': rng.choice(hirer_ids), 'category_id': rng.choice(category_ids),
+                'hire_start': start, 'hire_end': start + timedelta(days=rng.randint(1, 21)),
+                'delivery_preference': rng.choice(list(DeliveryPreference)),
+                'status': rng.choices(list(RFQStatus), weights=[6, 2, 1, 1])[0],
+                'expires_at': created + timedelta(days=7), 'created_at': created, 'updated_at': created,
+            }
+
+    counts['rfqs'] = _write(RFQ, rfq_rows(), batch_size)
+
+    def recipients():
+        for rfq_id in range(first_rfq, first_rfq + counts['rfqs']):
+            for operator_id in rng.sample(operator_ids, min(rng.randint(1, 5), operators)):
+                yield {
+                    'rfq_id': rfq_id, 'operator_id': operator_id, 'status': RFQStatus.PENDING,
+                    'notified_at': now, 'created_at': now, 'updated_at': now,
+                }
+
+    counts['rfq_recipients'] = _write(RFQRecipient, recipients(), batch_size)
+
+    # Everything above bypassed the ORM, so the search projection and the
+    # in-process indexes must rebuild
+    rebuild_projection()
+    db.session.commit()
+    notify_bulk(Operator, Equipment, EquipmentAvailabilityBlock, Electrician, License,
+                Certification, Skill, Project)
+    counts.update({
+        'category_ids': category_ids,
+        'operator_ids': [operator_ids.start, operator_ids.stop - 1],
+        'equipment_ids': [equipment_ids.start, equipment_ids.stop - 1],
+        'hirer_ids': [hirer_ids.start, hirer_ids.stop - 1],
+    })
+    return counts
+
+
+def seed_electricians(count, first_id, rng, now, batch_size=DEFAULT_BATCH_SIZE):
+    """Electrician profiles with their licences, certifications, skills and projects"""
+    electrician_ids = range(first_id, first_id + count)
+    states = {}
+
+    def electricians():
+        for electrician_id in electrician_ids:
+            state = STATE_ENUMS[_region(rng)[0]]
+            states[electrician_id] = state
+            preferred = {state} | set(rng.sample(list(AustralianState), rng.randint(0, 2)))
+            yield {
+                'id': electrician_id,
+                'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                'years_experience': rng.randint(0, 35), 'hourly_rate': rng.randrange(60, 165, 5),
+                'available_from': now + timedelta(days=rng.randint(0, 60)),
+                'preferred_locations': [member.value for member in preferred],
+                'primary_license_state': state,
+                'insurance_status': rng.random() < 0.8,
+                'insurance_expiry': now + timedelta(days=rng.randint(-60, 730)),
+                'insurance_policy_number': f'PL{electrician_id:08d}',
+                'verified_status': rng.random() < 0.6, 'profile_completion': rng.randint(20, 100),
+            }
+
+    def licenses():
+        for electrician_id in electrician_ids:
+            for number, license_type in enumerate(rng.sample(list(LicenseType), rng.choice([1, 1, 1, 2]))):
+                issued = now - timedelta(days=rng.randint(30, 5000))
+                yield {
+                    'electrician_id': electrician_id, 'license_type': license_type,
+                    'license_number': f'{states[electrician_id].name}-{electrician_id:08d}-{number}',
+                    'issuing_state': states[electrician_id], 'issue_date': issued,
+                    'expiry_date': now + timedelta(days=rng.randint(-60, 1500)), 'status': 'Active',
+                }
+
+    def certifications():
+        for electrician_id in electrician_ids:
+            for cert in rng.sample(list(CertificationType), rng.randint(0, 5)):
+                yield {
+                    'electrician_id': electrician_id, 'certification_type': cert,
+                    'issuing_body': rng.choice(['TAFE NSW', 'Box Hill Institute', 'St John Ambulance', 'RTO']),
+                    'issue_date': now - timedelta(days=rng.randint(30, 2000)),
+                    'expiry_date': now + timedelta(days=rng.randint(-60, 1100)),
+                    'certificate_number': f'C{electrician_id}-{cert.name[:6]}', 'status': 'Active',
+                }
+
+    def qualifications():
+        for electrician_id in electrician_ids:
+            yield {
+                'electrician_id': electrician_id,
+                'qualification_type': rng.choice(list(QualificationType)),
+                'institution': rng.choice(['TAFE NSW', 'TAFE Queensland', 'Box Hill Institute', 'North Metro TAFE']),
+                'completion_date': now - timedelta(days=rng.randint(365, 10000)),
+            }
+
+    def skills():
+        for electrician_id in electrician_ids:
+            for specialty in rng.sample(list(SpecialtyArea), rng.randint(1, 3)):
+                yield {
+                    'electrician_id': electrician_id, 'specialty': specialty,
+                    'years_experience': rng.randint(1, 20), 'proficiency_level': rng.randint(1, 5),
+                    'last_used_date': now - timedelta(days=rng.randint(0, 700)),
+                }
+
+    def projects():
+        for electrician_id in electrician_ids:
+            for _ in range(rng.randint(0, 3)):
+                start = now - timedelta(days=rng.randint(60, 3000))
+                yield {
+                    'electrician_id': electrician_id, 'project_type': rng.choice(list(ProjectType)),
+                    'project_value': rng.randrange(10000, 5000000, 10000),
+                    'start_date': start, 'end_date': start + timedelta(days=rng.randint(14, 400)),
+                    'voltage_levels': [level.value for level in rng.sample(list(VoltageLevel), rng.randint(1, 2))],
+                    'role': rng.choice(list(ProjectRole)),
+                    'specialties': [area.value for area in rng.sample(list(SpecialtyArea), rng.randint(1, 2))],
+                    'team_size': rng.randint(1, 40), 'safety_incidents': 0,
+                }
+
+    return {
+        'electricians': _write(Electrician, electricians(), batch_size),
+        'licenses': _write(License, licenses(), batch_size),
+        'certifications': _write(Certification, certifications(), batch_size),
+        'qualifications': _write(Qualification, qualifications(), batch_size),
+        'skills': _write(Skill, skills(), batch_size),
+        'projects': _write(Project, projects(), batch_size),
+    }
@@ -0,0 +1,493 @@
+"""
+Spatial lookup for operator locations.
+
+Nearby searches used to load every operator and run haversine on each one.
+Instead we keep an in-process uniform grid of operator coordinates: a query
+only visits the grid cells overlapping the search bounding box and runs the
+exact haversine on the operators found there.
+
+The grid is rebuilt lazily - committed writes to Operator mark it dirty,
+and it is also refreshed after ``SPATIAL_INDEX_MAX_AGE`` seconds so that
+changes made by other worker processes are picked up. When the index is disabled the same
+bounding box is pushed down to the database, where it hits the partial
+(latitude, longitude) index of visible operators.
+
+Searches around many points at once (``find_operators_near_any``) use
+``OperatorArrays`` instead: the same coordinates as contiguous float64
+arrays sorted by latitude, with radians and cosines precomputed. Each
+query point's latitude band is a slice found by binary search. The
+(point, operator) pairs in those slices are checked against the longitude
+bounds and then haversine, each step one NumPy expression over every
+pair, in blocks so that memory stays bounded.
+
+Operators only deliver within their ``service_radius``. The reverse
+question, which operators' service areas contain a point, is answered by
+``CoverageIndex``: a coarser grid where each cell lists the coverage
+circles overlapping it, so a lookup reads one cell and checks only the
+circles there. The searcher's own radius is checked in the same pass.
+
+Only approved operators that haven't been deleted show up in searches.
+"""
+from threading import Lock
+import math
+import time
+
+import numpy as np
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.events import on_change
+from app.models import ModerationStatus, Operator
+
+EARTH_RADIUS = 6371000  # Radius of earth in meters
+
+DEFAULT_CELL_SIZE = 0.1  # degrees, roughly 11km north-south
+DEFAULT_MAX_AGE = 30  # seconds
+DEFAULT_COVERAGE_CELL_SIZE = 0.5  # degrees, service radii are tens of km
+
+# (query point, operator) pairs evaluated at once in batch searches
+MAX_BLOCK_PAIRS = 1 << 21
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate the great circle distance between two points
+    on the earth (specified in decimal degrees)
+    """
+    # Convert decimal degrees to radians
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+
+    # Haversine formula
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    return c * EARTH_RADIUS
+
+
+def validate_point(lat, lng, radius=None, max_radius=None):
+    """
+    Raise ValueError unless (lat, lng) is a finite coordinate in range and
+    ``radius``, when given, is a positive number of meters up to ``max_radius``
+    """
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('lat must be between -90 and 90 and lng between -180 and 180')
+    if radius is not None:
+        if not (radius > 0 and math.isfinite(radius)):
+            raise ValueError('radius must be a positive number')
+        if max_radius is not None and radius > max_radius:
+            raise ValueError(f'radius must be at most {max_radius:g} meters')
+
+
+def bounding_box(lat, lng, radius):
+    """
+    Return (min_lat, min_lng, max_lat, max_lng) enclosing the circle of
+    ``radius`` meters around (lat, lng)
+    """
+    dlat = math.degrees(radius / EARTH_RADIUS)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if min_lat <= -90 or max_lat >= 90 or cos_lat <= 0:
+        # The circle covers a pole, so every longitude is in range
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+    dlng = math.degrees(radius / (EARTH_RADIUS * cos_lat))
+    if dlng >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, lng - dlng, max_lat, lng + dlng
+
+
+class GridIndex:
+    """Uniform lat/lng grid of (id, lat, lng) points"""
+
+    def __init__(self, points=(), cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        for point_id, lat, lng, *_ in points:
+            self.add(point_id, lat, lng)
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lng / self.cell_size))
+
+    def add(self, point_id, lat, lng):
+        self.cells.setdefault(self._cell(lat, lng), []).append((point_id, lat, lng))
+        self.size += 1
+
+    def candidates(self, min_lat, min_lng, max_lat, max_lng):
+        """Yield every point inside the bounding box"""
+        min_row, min_col = self._cell(min_lat, min_lng)
+        max_row, max_col = self._cell(max_lat, max_lng)
+        cells = self.cells
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(cells):
+            # A box larger than the populated area; walk the cells we have
+            # instead of probing every empty one
+            keys = [key for key in cells
+                    if min_row <= key[0] <= max_row and min_col <= key[1] <= max_col]
+        else:
+            keys = ((row, col) for row in range(min_row, max_row + 1)
+                    for col in range(min_col, max_col + 1))
+        for key in keys:
+            for point in cells.get(key, ()):
+                if min_lat <= point[1] <= max_lat and min_lng <= point[2] <= max_lng:
+                    yield point
+
+    def within(self, lat, lng, radius):
+        """Return [(id, distance)] for points within ``radius`` meters"""
+        result = []
+        for point_id, point_lat, point_lng in self.candidates(*bounding_box(lat, lng, radius)):
+            distance = calculate_distance(lat, lng, point_lat, point_lng)
+            if distance <= radius:
+                result.append((point_id, distance))
+        return result
+
+
+class CoverageIndex:
+    """
+    Uniform lat/lng grid of (id, lat, lng, radius) circles, where every
+    cell lists the circles whose bounding box overlaps it
+    """
+
+    def __init__(self, circles=(), cell_size=DEFAULT_COVERAGE_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        for circle_id, lat, lng, radius in circles:
+            self.add(circle_id, lat, lng, radius)
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lng / self.cell_size))
+
+    def add(self, circle_id, lat, lng, radius):
+        min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius)
+        min_row, min_col = self._cell(min_lat, min_lng)
+        max_row, max_col = self._cell(max_lat, max_lng)
+        circle = (circle_id, lat, lng, radius)
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                self.cells.setdefault((row, col), []).append(circle)
+        self.size += 1
+
+    def covering(self, lat, lng, radius=None):
+        """
+        Return [(id, distance)] for circles containing (lat, lng), and
+        within ``radius`` meters of it when given
+        """
+        limit = math.inf if radius is None else radius
+        result = []
+        for circle_id, circle_lat, circle_lng, circle_radius in self.cells.get(self._cell(lat, lng), ()):
+            distance = calculate_distance(lat, lng, circle_lat, circle_lng)
+            if distance <= circle_radius and distance <= limit:
+                result.append((circle_id, distance))
+        return result
+
+
+class OperatorArrays:
+    """
+    (id, lat, lng[, service radius]) points as contiguous float64 arrays
+    sorted by latitude, in radians, for vectorized haversine against many
+    query points
+    """
+
+    def __init__(self, points=()):
+        points = list(points)
+        ids = np.fromiter((point[0] for point in points), dtype=np.int64, count=len(points))
+        lats = np.fromiter((point[1] for point in points), dtype=np.float64, count=len(points))
+        lngs = np.fromiter((point[2] for point in points), dtype=np.float64, count=len(points))
+        service_radii = np.fromiter((point[3] if len(point) > 3 else np.inf for point in points),
+                                    dtype=np.float64, count=len(points))
+        order = np.argsort(lats, kind='stable')
+        self.ids = ids[order]
+        self.lat = np.ascontiguousarray(np.radians(lats[order]))
+        self.lng = np.ascontiguousarray(np.radians(lngs[order]))
+        self.cos_lat = np.cos(self.lat)
+        self.service_radius = service_radii[order]
+
+    def within_many(self, lats, lngs, radii, covered=False):
+        """
+        Points within range of any of the query points (degrees, meters).
+        With ``covered``, a point must also be within its own service
+        radius of the query point.
+
+        Returns (ids, nearest, hits): the matching ids, the distance to the
+        closest query point in range, and a (query points x ids) boolean
+        matrix of which query points each one is in range of.
+        """
+        lat = np.radians(np.asarray(lats, dtype=np.float64))
+        lng = np.radians(np.asarray(lngs, dtype=np.float64))
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), lat.shape)
+        cos_lat = np.cos(lat)
+        # Angular radius, and the widest longitude offset inside that circle
+        dlat = radii / EARTH_RADIUS
+        reaches_pole = np.abs(lat) + dlat >= np.pi / 2
+        dlng = np.where(reaches_pole, np.pi,
+                        np.arcsin(np.minimum(np.sin(dlat) / np.maximum(cos_lat, 1e-12), 1.0)))
+
+        # Each query point's latitude band is a slice of the sorted arrays;
+        # cut the slices into segments of at most MAX_BLOCK_PAIRS pairs
+        starts = np.searchsorted(self.lat, lat - dlat, side='left')
+        ends = np.searchsorted(self.lat, lat + dlat, side='right')
+        pieces = -(-(ends - starts) // MAX_BLOCK_PAIRS)
+        segment_point = np.repeat(np.arange(len(lat)), pieces)
+        segment_start = starts[segment_point] + MAX_BLOCK_PAIRS * (
+            np.arange(len(segment_point)) - np.repeat(np.cumsum(pieces) - pieces, pieces))
+        segment_end = np.minimum(segment_start + MAX_BLOCK_PAIRS, ends[segment_point])
+        # Group consecutive segments into blocks of about MAX_BLOCK_PAIRS pairs
+        block = (np.cumsum(segment_end - segment_start) - 1) // MAX_BLOCK_PAIRS
+        bounds = np.flatnonzero(np.diff(block)) + 1
+
+        matched_points, matched_index, matched_distance = [], [], []
+        for segments in np.split(np.arange(len(segment_point)), bounds):
+            counts = segment_end[segments] - segment_start[segments]
+            if not len(counts):
+                continue
+            # Expand the segments to (point, operator) pairs
+            point = np.repeat(segment_point[segments], counts)
+            index = np.repeat(segment_start[segments] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            # The longitude test is much cheaper than the trigonometry
+            lng_offset = np.abs(self.lng[index] - lng[point])
+            lng_offset = np.minimum(lng_offset, 2 * np.pi - lng_offset)
+            box = lng_offset <= dlng[point]
+            point, index, lng_offset = point[box], index[box], lng_offset[box]
+            # Haversine on the pairs left
+            a = np.sin((self.lat[index] - lat[point]) / 2) ** 2 + \
+                cos_lat[point] * self.cos_lat[index] * np.sin(lng_offset / 2) ** 2
+            distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+            in_range = distance <= radii[point]
+            if covered:
+                in_range &= distance <= self.service_radius[index]
+            matched_points.append(point[in_range])
+            matched_index.append(index[in_range])
+            matched_distance.append(distance[in_range])
+
+        if not matched_index:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.zeros((len(lat), 0), dtype=bool)
+        point, distance = np.concatenate(matched_points), np.concatenate(matched_distance)
+        found, column = np.unique(np.concatenate(matched_index), return_inverse=True)
+        nearest = np.full(len(found), np.inf)
+        np.minimum.at(nearest, column, distance)
+        hits = np.zeros((len(lat), len(found)), dtype=bool)
+        hits[point, column] = True
+        return self.ids[found], nearest, hits
+
+
+class OperatorIndex:
+    """Process-wide GridIndex over operator locations, rebuilt on change"""
+
+    def __init__(self):
+        self._grid = None
+        self._points = []
+        self._arrays = None
+        self._coverage = None
+        self._built_at = 0
+        self._dirty = True
+        self._lock = Lock()
+
+    def invalidate(self):
+        self._dirty = True
+
+    def grid(self, cell_size=DEFAULT_CELL_SIZE, max_age=DEFAULT_MAX_AGE):
+        stale = time.monotonic() - self._built_at > max_age
+        if self._dirty or stale or self._grid is None or self._grid.cell_size != cell_size:
+            with self._lock:
+                # Another thread may have rebuilt it while we waited
+                stale = time.monotonic() - self._built_at > max_age
+                if self._dirty or stale or self._grid is None or self._grid.cell_size != cell_size:
+                    self._dirty = False
+                    self._points = load_operator_points()
+                    self._grid = GridIndex(self._points, cell_size)
+                    self._arrays = None
+                    self._coverage = None
+                    self._built_at = time.monotonic()
+        return self._grid
+
+    def arrays(self, cell_size=DEFAULT_CELL_SIZE, max_age=DEFAULT_MAX_AGE):
+        """OperatorArrays of the same snapshot as the grid, built on first use"""
+        self.grid(cell_size, max_age)
+        arrays = self._arrays
+        if arrays is None:
+            with self._lock:
+                if self._arrays is None:
+                    self._arrays = OperatorArrays(self._points)
+                arrays = self._arrays
+        return arrays
+
+    def coverage(self, cell_size=DEFAULT_COVERAGE_CELL_SIZE, max_age=DEFAULT_MAX_AGE,
+                 grid_cell_size=DEFAULT_CELL_SIZE):
+        """CoverageIndex of service areas, of the same snapshot as the grid"""
+        self.grid(grid_cell_size, max_age)
+        coverage = self._coverage
+        if coverage is None or coverage.cell_size != cell_size:
+            with self._lock:
+                if self._coverage is None or self._coverage.cell_size != cell_size:
+                    self._coverage = CoverageIndex(self._points, cell_size)
+                coverage = self._coverage
+        return coverage
+
+
+operator_index = OperatorIndex()
+
+
+@on_change(Operator)
+def _invalidate_operator_index(action, target):
+    # Mapper events fire at flush; a rebuild before the commit would
+    # load the old rows and clear the flag
+    session = None if action == 'reset' else object_session(target)
+    if session is None:
+        operator_index.invalidate()
+    else:
+        session.info['operator_index_dirty'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('operator_index_dirty', False):
+        operator_index.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('operator_index_dirty', None)
+
+
+OPERATOR_POINT_COLUMNS = (Operator.id, Operator.latitude, Operator.longitude, Operator.service_radius)
+
+
+def visible_operators():
+    """Operators shown in searches; matches the ix_operators_visible_location predicate"""
+    return [Operator.moderation_status == ModerationStatus.APPROVED, Operator.deleted_at.is_(None)]
+
+
+def load_operator_points():
+    """Load (id, latitude, longitude, service radius) for every visible operator"""
+    query = db.session.query(*OPERATOR_POINT_COLUMNS).filter(*visible_operators())
+    return [tuple(row) for row in query]
+
+
+def operators_in_bbox(min_lat, min_lng, max_lat, max_lng):
+    """Bounding box prefilter on the indexed latitude/longitude columns"""
+    query = db.session.query(*OPERATOR_POINT_COLUMNS).filter(
+        Operator.latitude.between(min_lat, max_lat),
+        Operator.longitude.between(min_lng, max_lng),
+        *visible_operators(),
+    )
+    return [tuple(row) for row in query]
+
+
+def operators_in_bboxes(boxes):
+    """Operators inside any of the bounding boxes, in one query"""
+    query = db.session.query(*OPERATOR_POINT_COLUMNS).filter(
+        or_(*[and_(Operator.latitude.between(min_lat, max_lat),
+                   Operator.longitude.between(min_lng, max_lng))
+              for min_lat, min_lng, max_lat, max_lng in boxes]),
+        *visible_operators(),
+    )
+    return [tuple(row) for row in query]
+
+
+def find_nearby_operators(lat, lng, radius, config=None, covered=False):
+    """
+    Return [(operator_id, distance)] for operators within ``radius`` meters.
+
+    With ``covered``, only operators whose service area contains the point,
+    and ``radius`` may be None to not limit the distance any further.
+
+    Uses the in-process grid unless ``SPATIAL_INDEX_ENABLED`` is off, in which
+    case the bounding box query runs against the database.
+    """
+    config = config or {}
+    if covered:
+        return find_covering_operators(lat, lng, radius, config)
+    if config.get('SPATIAL_INDEX_ENABLED', True):
+        grid = operator_index.grid(
+            cell_size=config.get('SPATIAL_INDEX_CELL_SIZE', DEFAULT_CELL_SIZE),
+            max_age=config.get('SPATIAL_INDEX_MAX_AGE', DEFAULT_MAX_AGE),
+        )
+        return grid.within(lat, lng, radius)
+
+    result = []
+    for operator_id, operator_lat, operator_lng, _ in operators_in_bbox(*bounding_box(lat, lng, radius)):
+        distance = calculate_distance(lat, lng, operator_lat, operator_lng)
+        if distance <= radius:
+            result.append((operator_id, distance))
+    return result
+
+
+def find_covering_operators(lat, lng, radius=None, config=None):
+    """
+    Return [(operator_id, distance)] for operators whose service area
+    contains the point, within ``radius`` meters of it when given.
+
+    Without ``SPATIAL_INDEX_ENABLED`` the database is searched within the
+    largest service radius (or ``radius`` if smaller) instead.
+    """
+    config = config or {}
+    if config.get('SPATIAL_INDEX_ENABLED', True):
+        coverage = operator_index.coverage(
+            cell_size=config.get('SPATIAL_COVERAGE_CELL_SIZE', DEFAULT_COVERAGE_CELL_SIZE),
+            max_age=config.get('SPATIAL_INDEX_MAX_AGE', DEFAULT_MAX_AGE),
+            grid_cell_size=config.get('SPATIAL_INDEX_CELL_SIZE', DEFAULT_CELL_SIZE),
+        )
+        return coverage.covering(lat, lng, radius)
+
+    reach = db.session.query(func.max(Operator.service_radius)).filter(*visible_operators()).scalar()
+    if reach is None:
+        return []
+    limit = reach if radius is None else min(radius, reach)
+    result = []
+    for operator_id, operator_lat, operator_lng, service_radius in operators_in_bbox(
+            *bounding_box(lat, lng, limit)):
+        distance = calculate_distance(lat, lng, operator_lat, operator_lng)
+        if distance <= service_radius and distance <= limit:
+            result.append((operator_id, distance))
+    return result
+
+
+def find_operators_near_any(points, config=None, covered=False):
+    """
+    Operators within range of any of ``points``, a list of (lat, lng,
+    radius in meters), and with ``covered`` also delivering there. Returns
+    OperatorArrays.within_many's (ids, nearest, hits).
+
+    Without ``SPATIAL_INDEX_ENABLED`` the candidates come from one database
+    query over the points' bounding boxes instead of the in-process arrays.
+    """
+    config = config or {}
+    lats, lngs, radii = zip(*points)
+    if config.get('SPATIAL_INDEX_ENABLED', True):
+        arrays = operator_index.arrays(
+            cell_size=config.get('SPATIAL_INDEX_CELL_SIZE', DEFAULT_CELL_SIZE),
+            max_age=config.get('SPATIAL_INDEX_MAX_AGE', DEFAULT_MAX_AGE),
+        )
+    else:
+        arrays = OperatorArrays(operators_in_bboxes([bounding_box(*point) for point in points]))
+    return arrays.within_many(lats, lngs, radii, covered)
+
+
+def parse_points(values, default_radius, maximum, max_radius=None):
+    """
+    (lat, lng, radius) tuples from a JSON list of ``{lat, lng, radius}``
+    objects or ``[lat, lng]`` pairs; raises ValueError if malformed or out
+    of range (see validate_point)
+    """
+    if not isinstance(values, list) or not values:
+        raise ValueError('points must be a non-empty list')
+    if len(values) > maximum:
+        raise ValueError(f'At most {maximum} points per request')
+    points = []
+    for index, value in enumerate(values):
+        try:
+            if isinstance(value, dict):
+                lat, lng = float(value['lat']), float(value['lng'])
+                radius = float(value.get('radius', default_radius))
+            else:
+                lat, lng = map(float, value)
+                radius = float(default_radius)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Invalid point at index {index}')
+        try:
+            validate_point(lat, lng, radius, max_radius)
+        except ValueError as e:
+            raise ValueError(f'Point at index {index}: {e}')
+        points.append((lat, lng, radius))
+    return points
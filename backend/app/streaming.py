@@ -0,0 +1,62 @@
+"""
+Streaming responses for large listings.
+
+Instead of materializing every row, every dict and the encoded body at the
+same time, rows are pulled from a server-side cursor (``yield_per``) and
+encoded a batch at a time. Two formats are supported:
+
+* NDJSON - one JSON object per line, requested with
+  ``Accept: application/x-ndjson`` or ``?format=ndjson``
+* a chunked JSON array, requested with ``?format=stream``
+"""
+from flask import Response, current_app, request, stream_with_context
+
+from app import db
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def requested_stream_format():
+    """Return 'ndjson', 'json' or None depending on the request"""
+    fmt = request.args.get('format')
+    if fmt == 'ndjson':
+        return 'ndjson'
+    if fmt == 'stream':
+        return 'json'
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    return None
+
+
+def _encode_rows(stmt, serialize, batch_size):
+    """Yield lists of encoded rows, ``batch_size`` rows at a time"""
+    dumps = current_app.json.dumps
+    rows = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in rows.partitions():
+        yield [dumps(serialize(row)) for row in partition]
+
+
+def _ndjson(stmt, serialize, batch_size):
+    for encoded in _encode_rows(stmt, serialize, batch_size):
+        yield '\n'.join(encoded) + '\n'
+
+
+def _json_array(stmt, serialize, batch_size):
+    yield '['
+    first = True
+    for encoded in _encode_rows(stmt, serialize, batch_size):
+        chunk = ','.join(encoded)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']'
+
+
+def stream_response(stmt, serialize, fmt, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream every row of ``stmt`` through ``serialize`` in the given format"""
+    if fmt == 'ndjson':
+        body, mimetype = _ndjson(stmt, serialize, batch_size), NDJSON_MIMETYPE
+    else:
+        body, mimetype = _json_array(stmt, serialize, batch_size), 'application/json'
+    return Response(stream_with_context(body), mimetype=mimetype)
@@ -0,0 +1,100 @@
+"""
+Background task queue.
+
+Work that doesn't have to finish before the response (sending RFQ
+notifications, ...) is registered as a named task and enqueued with keyword
+arguments. Tasks always run inside an app context. Backends are picked with
+``TASK_QUEUE_BACKEND``:
+
+* ``thread`` (default) - a thread pool in the web process
+* ``inline`` - run immediately in the caller, handy for tests and scripts
+* ``database`` - store the task in the jobs table for ``worker.py`` to run,
+  with retries (see app/jobs.py)
+
+Tasks are looked up by name and take JSON-friendly kwargs, so a durable
+backend can persist them and run them in another process.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+
+class InlineBackend:
+    def submit(self, run, name, kwargs):
+        run(name, kwargs)
+
+    def shutdown(self):
+        pass
+
+
+class ThreadPoolBackend:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task')
+
+    def submit(self, run, name, kwargs):
+        self.executor.submit(run, name, kwargs)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class DatabaseBackend:
+    def submit(self, run, name, kwargs):
+        from app.jobs import schedule
+        schedule(name, kwargs)
+
+    def shutdown(self):
+        pass
+
+
+class TaskQueue:
+    """Flask extension holding the task registry and the queue backend"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        self.tasks = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.backend = make_backend(app.config)
+        app.extensions['task_queue'] = self
+
+    def task(self, name):
+        """Decorator registering a function as a named task"""
+        def decorator(fn):
+            self.tasks[name] = fn
+            return fn
+        return decorator
+
+    def enqueue(self, name, **kwargs):
+        if name not in self.tasks:
+            raise KeyError(f'Unknown task: {name}')
+        self.backend.submit(self.run, name, kwargs)
+
+    def run(self, name, kwargs):
+        """Run a task inside an app context; failures are logged, not raised"""
+        with self.app.app_context():
+            try:
+                self.tasks[name](**kwargs)
+            except Exception:
+                logger.exception(f'Task {name} failed')
+
+
+def make_backend(config):
+    name = config.get('TASK_QUEUE_BACKEND', 'thread')
+    if name == 'thread':
+        return ThreadPoolBackend(config.get('TASK_QUEUE_WORKERS', DEFAULT_WORKERS))
+    if name == 'inline':
+        return InlineBackend()
+    if name == 'database':
+        return DatabaseBackend()
+    raise ValueError(f'Unknown TASK_QUEUE_BACKEND: {name}')
+
+
+task_queue = TaskQueue()
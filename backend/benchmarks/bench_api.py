@@ -0,0 +1,258 @@
+"""
+Load benchmark for the API endpoints.
+
+Drives each endpoint with randomised requests built from the seeded data
+(see seed_data.py) and reports latency percentiles and throughput. By
+default requests go through the Flask test client in this process; with
+--url they go over HTTP to a running server (e.g. gunicorn), which must use
+the same DATABASE_URL since request parameters are sampled from it.
+
+Results can be written as JSON and compared with an earlier run; the
+comparison exits non-zero when an endpoint's p95 got slower than the
+threshold.
+
+Usage:
+    python benchmarks/bench_api.py [--requests 200] [--concurrency 4] [--endpoints nearby search]
+                                   [--url http://localhost:5000] [--json results.json]
+                                   [--compare baseline.json] [--threshold 0.2]
+
+Response caching follows the app config; run with CACHE_BACKEND=none to
+measure uncached requests.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import RFQ, AustralianState, Equipment, EquipmentCategory, Operator  # noqa: E402
+from app.seeding import REGIONS  # noqa: E402
+
+SEARCH_TERMS = ['excavator', 'kubota', 'scissor lift', 'generator', 'roller', 'tipper truck',
+                'caterpillar', 'forklift', 'compactor', 'diesel']
+
+
+def sample_data(app):
+    """Id ranges and values to build requests from"""
+    with app.app_context():
+        def bounds(column):
+            return tuple(db.session.execute(select(func.min(column), func.max(column))).one())
+        data = {
+            'categories': db.session.scalars(select(EquipmentCategory.id)).all(),
+            'equipment': bounds(Equipment.id),
+            'operators': bounds(Operator.id),
+            'hirers': bounds(RFQ.hirer_id),
+        }
+    if data['equipment'][0] is None:
+        sys.exit('No equipment found, seed the database first (python seed_data.py)')
+    return data
+
+
+def endpoints(data):
+    """name -> function(rng) returning a request path"""
+    def category(rng):
+        return rng.choice(data['categories'])
+
+    def point(rng):
+        region = rng.choices(REGIONS, weights=[region[5] for region in REGIONS])[0]
+        return round(region[2] + rng.gauss(0, region[4]), 4), round(region[3] + rng.gauss(0, region[4]), 4)
+
+    def dates(rng):
+        start = datetime.utcnow().date() + timedelta(days=rng.randint(1, 60))
+        return f'available_from={start}&available_to={start + timedelta(days=rng.randint(1, 10))}'
+
+    def nearby(rng, extra=''):
+        lat, lng = point(rng)
+        return f'/api/equipment/nearby?lat={lat}&lng={lng}&radius={rng.choice([5000, 10000, 25000])}{extra}'
+
+    def map_view(rng):
+        # A 1280x800 pixel viewport around a seeded point
+        lat, lng = point(rng)
+        zoom = rng.randint(5, 14)
+        half_width = 640 * 360 / (256 << zoom)
+        half_height = 400 * 360 / (256 << zoom) * math.cos(math.radians(lat))
+        bbox = (max(lng - half_width, -180), max(lat - half_height, -85), min(lng + half_width, 180),
+                min(lat + half_height, 85))
+        return f"/api/map/clusters?bbox={','.join(f'{value:.5f}' for value in bbox)}&zoom={zoom}"
+
+    def in_range(bounds):
+        return lambda rng: rng.randint(*bounds) if bounds[0] is not None else 1
+
+    equipment_id, operator_id, hirer_id = (
+        in_range(data['equipment']), in_range(data['operators']), in_range(data['hirers']))
+    states = [member.name for member in AustralianState]
+    return {
+        'equipment_list': lambda rng: '/api/equipment?limit=50',
+        'equipment_category': lambda rng: f'/api/equipment?category={category(rng)}&limit=50',
+        'equipment_filtered': lambda rng: (
+            f'/api/equipment?category={category(rng)}&available=true'
+            f'&max_daily_rate={rng.choice([200, 500, 1000])}&limit=50'),
+        'equipment_spec': lambda rng: f"/api/equipment?spec=fuel={rng.choice(['diesel', 'electric'])}&limit=50",
+        'nearby': lambda rng: nearby(rng),
+        'nearby_category': lambda rng: nearby(rng, f'&category={category(rng)}'),
+        'nearby_dates': lambda rng: nearby(rng, f'&{dates(rng)}'),
+        'map_clusters': map_view,
+        'locations_autocomplete': lambda rng: (
+            f"/api/locations/autocomplete?q={rng.choice(rng.choice(REGIONS)[6])[:rng.randint(2, 6)].replace(' ', '+')}"),
+        'search': lambda rng: f'/api/equipment/search?q={rng.choice(SEARCH_TERMS).replace(" ", "+")}&limit=20',
+        'facets': lambda rng: f'/api/equipment/facets?category={category(rng)}&available=true&limit=20',
+        'availability': lambda rng: f'/api/equipment/{equipment_id(rng)}/availability',
+        'electrician_match': lambda rng: (
+            f'/api/electricians/match?state={rng.choice(states)}'
+            f"&voltage_level={rng.choice(['low_voltage', 'high_voltage'])}&limit=20"),
+        'compliance_expiring': lambda rng: f'/api/compliance/expiring?within_days={rng.choice([7, 30, 90])}',
+        'hirer_rfqs': lambda rng: f'/api/rfqs?hirer_id={hirer_id(rng)}&limit=20',
+        'operator_rfqs': lambda rng: f'/api/operators/{operator_id(rng)}/rfqs',
+        'category_tree': lambda rng: '/api/categories/tree',
+    }
+
+
+def make_client(app, url):
+    """function(path) -> status code, over HTTP or through the test client"""
+    if url:
+        def fetch(path):
+            try:
+                with urllib.request.urlopen(url.rstrip('/') + path, timeout=60) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return lambda: fetch
+
+    def client():
+        test_client = app.test_client()
+        return lambda path: test_client.get(path).status_code
+    return client
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def run_endpoint(new_client, paths, concurrency):
+    """Run the requests across ``concurrency`` threads; returns the stats dict"""
+    chunks = [paths[i::concurrency] for i in range(concurrency)]
+
+    def worker(chunk):
+        get = new_client()
+        latencies, errors = [], 0
+        for path in chunk:
+            start = time.perf_counter()
+            status = get(path)
+            latencies.append(time.perf_counter() - start)
+            errors += status >= 400
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, chunks))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for chunk, _ in results for latency in chunk)
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'rps': round(len(latencies) / wall, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print p95 changes against a baseline run; returns the regressed endpoints"""
+    regressed = []
+    for key in ('target', 'database', 'concurrency'):
+        if baseline['meta'].get(key) != results['meta'][key]:
+            print(f"\nWarning: baseline {key} was {baseline['meta'].get(key)}, not {results['meta'][key]}")
+    print(f"\n{'endpoint':<22} {'base p95':>9} {'p95':>9} {'change':>8}")
+    for name, stats in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressed.append(name)
+            flag = '  REGRESSED'
+        print(f"{name:<22} {before['p95_ms']:>9.2f} {stats['p95_ms']:>9.2f} {change:>+8.0%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per endpoint first')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--endpoints', nargs='+', help='only endpoints whose name contains one of these')
+    parser.add_argument('--url', help='base URL of a running server instead of the test client')
+    parser.add_argument('--json', dest='json_path', help='write the results to this file')
+    parser.add_argument('--compare', help='results JSON of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='p95 slowdown (fraction) counted as a regression')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app()
+    data = sample_data(app)
+    new_client = make_client(app, args.url)
+    rng = random.Random(args.seed)
+
+    selected = {name: build for name, build in endpoints(data).items()
+                if not args.endpoints or any(part in name for part in args.endpoints)}
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'target': args.url or 'test-client',
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'python': platform.python_version(),
+            'seed': args.seed,
+        },
+        'endpoints': {},
+    }
+
+    print(f"{'endpoint':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'req/s':>8} {'errors':>6}")
+    for name, build in selected.items():
+        warm = new_client()
+        for _ in range(args.warmup):
+            warm(build(rng))
+        paths = [build(rng) for _ in range(args.requests)]
+        stats = results['endpoints'][name] = run_endpoint(new_client, paths, args.concurrency)
+        print(f"{name:<22} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+              f"{stats['max_ms']:>8.2f} {stats['rps']:>8.1f} {stats['errors']:>6}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults written to {args.json_path}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline, args.threshold)
+        if regressed:
+            print(f"\np95 regressed more than {args.threshold:.0%}: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark CSV equipment import throughput (rows/sec).
+
+Generates a CSV of --rows listings (about 5% of them invalid) and imports it
+through app.importer into the database named by DATABASE_URL. Defaults to
+a throwaway SQLite file; point DATABASE_URL at Postgres to measure the COPY
+path.
+
+Usage:
+    python benchmarks/bench_import.py [--rows 100000] [--batch-size 1000]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Excavators', 'Mini Excavators', 'Generators', 'Scissor Lifts', 'Boom Lifts',
+              'Telehandlers', 'Compactors', 'Light Towers', 'Air Compressors', 'Trucks']
+
+
+def generate_csv(rows, rng):
+    buffer = io.StringIO()
+    buffer.write('name,category,description,specifications,daily_rate,weekly_rate,monthly_rate,availability_status\n')
+    for i in range(rows):
+        category = rng.choice(CATEGORIES)
+        daily_rate = rng.randint(50, 2000)
+        if rng.random() < 0.05:
+            category = 'Unknown'  # invalid row
+        specifications = json.dumps({'power_kw': rng.randint(2, 300)}).replace('"', '""')
+        buffer.write(f'Listing {i},{category},Well maintained unit,"{specifications}",'
+                     f'{daily_rate},{daily_rate * 5},{daily_rate * 18},{rng.choice(["true", "false"])}\n')
+    buffer.seek(0)
+    return buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{tmpdir.name}/bench_import.db')
+
+    from app import create_app, db
+    from app.importer import import_equipment_csv
+    from app.models import EquipmentCategory, ModerationStatus, Operator, User, UserRole
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(email='bench-import@example.com', password_hash='x', role=UserRole.OPERATOR,
+                    full_name='Bench')
+        db.session.add(user)
+        db.session.flush()
+        operator = Operator(user_id=user.id, business_name=f'Bench Import {time.time()}',
+                            latitude=-33.87, longitude=151.21, service_radius=50000,
+                            address_line1='1 George St', suburb='Sydney', state='NSW',
+                            postcode='2000', moderation_status=ModerationStatus.APPROVED)
+        db.session.add(operator)
+        for name in CATEGORIES:
+            if not EquipmentCategory.query.filter_by(name=name).first():
+                db.session.add(EquipmentCategory(name=name))
+        db.session.commit()
+
+        data = generate_csv(args.rows, random.Random(args.seed))
+        start = time.perf_counter()
+        report = import_equipment_csv(data, operator.id, args.batch_size)
+        elapsed = time.perf_counter() - start
+        backend = db.engine.url.get_backend_name()
+
+    print(f'database:   {backend}')
+    print(f"rows:       {report['rows']} ({report['inserted']} inserted, {report['failed']} rejected)")
+    print(f'elapsed:    {elapsed:.2f}s')
+    print(f"throughput: {report['rows'] / elapsed:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
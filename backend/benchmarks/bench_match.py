@@ -0,0 +1,125 @@
+"""
+Benchmark electrician matching on the NumPy feature matrix.
+
+Builds a matrix of synthetic profiles in memory and times matches against
+it, next to a plain Python loop over the same feature dicts (roughly what
+walking the ORM relationships per electrician costs, minus the queries).
+
+Usage:
+    python benchmarks/bench_match.py [--sizes 10000 100000] [--queries 100]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.matching import (  # noqa: E402
+    CERT_BITS, MATCH_WEIGHTS, SPECIALTIES, SPECIALTY_BITS, STATE_BITS, VOLTAGE_BITS,
+    ElectricianMatrix, empty_features,
+)
+from app.models import AustralianState, CertificationType, SpecialtyArea, VoltageLevel  # noqa: E402
+
+
+def random_features(rng):
+    features = empty_features()
+    for cert in rng.sample(list(CertificationType), rng.randint(0, 6)):
+        features['certs'] |= CERT_BITS[cert]
+    for level in rng.sample(list(VoltageLevel), rng.randint(1, 2)):
+        features['voltage'] |= VOLTAGE_BITS[level]
+    for specialty in rng.sample(list(SpecialtyArea), rng.randint(1, 3)):
+        features['specialties'] |= SPECIALTY_BITS[specialty]
+        features['proficiency'][SPECIALTIES.index(specialty)] = rng.randint(1, 5)
+    for state in rng.sample(list(AustralianState), rng.randint(1, 2)):
+        features['states'] |= STATE_BITS[state]
+    features['rate'] = rng.choice([60, 80, 100, 120, 150])
+    features['years'] = rng.randint(0, 30)
+    features['verified'] = rng.random() < 0.6
+    features['insured'] = rng.random() < 0.7
+    features['completion'] = rng.randint(20, 100)
+    return features
+
+
+def random_spec(rng):
+    return {
+        'certifications': rng.sample(list(CertificationType), rng.randint(0, 2)),
+        'voltage_level': rng.choice([None, *VoltageLevel]),
+        'states': [rng.choice(list(AustralianState))],
+        'specialty': rng.choice(list(SpecialtyArea)),
+        'max_hourly_rate': rng.choice([None, 100, 130]),
+    }
+
+
+def loop_match(profiles, spec, limit=20, weights=MATCH_WEIGHTS):
+    """The same ranking as ElectricianMatrix.match, one profile at a time"""
+    required = 0
+    for cert in spec['certifications']:
+        required |= CERT_BITS[cert]
+    states = 0
+    for state in spec['states']:
+        states |= STATE_BITS[state]
+    position = SPECIALTIES.index(spec['specialty'])
+    scored = []
+    for electrician_id, f in profiles:
+        if f['certs'] & required != required:
+            continue
+        if spec['voltage_level'] is not None and not f['voltage'] & VOLTAGE_BITS[spec['voltage_level']]:
+            continue
+        if not f['states'] & states:
+            continue
+        budget = spec['max_hourly_rate']
+        if budget is not None and f['rate'] > budget:
+            continue
+        score = weights['experience'] * min(f['years'], 20) / 20
+        score += weights['verified'] * f['verified'] + weights['insured'] * f['insured']
+        score += weights['profile'] * f['completion'] / 100
+        score += weights['proficiency'] * f['proficiency'][position] / 5
+        score += weights['specialty_projects'] * bool(f['specialties'] & SPECIALTY_BITS[spec['specialty']])
+        if budget:
+            score += weights['budget'] * min(max((budget - f['rate']) / budget, 0), 1)
+        scored.append((score, electrician_id))
+    scored.sort(key=lambda item: -item[0])
+    return scored[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--loop-queries', type=int, default=5,
+                        help='queries for the Python loop, which is much slower')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'profiles':>10} {'build (s)':>10} {'loop (ms)':>10} {'matrix (ms)':>12} {'speedup':>8}")
+    for size in args.sizes:
+        profiles = [(i, random_features(rng)) for i in range(1, size + 1)]
+        specs = [random_spec(rng) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        matrix = ElectricianMatrix(size)
+        for electrician_id, features in profiles:
+            matrix.set(electrician_id, features)
+        build = time.perf_counter() - start
+
+        # Sanity check that both paths agree on the matches
+        ids, _, total = matrix.match(**specs[0], limit=size)
+        assert total == len(loop_match(profiles, specs[0], limit=size))
+
+        start = time.perf_counter()
+        for spec in specs[:args.loop_queries]:
+            loop_match(profiles, spec)
+        loop = (time.perf_counter() - start) / args.loop_queries
+
+        start = time.perf_counter()
+        for spec in specs:
+            matrix.match(**spec)
+        vectorized = (time.perf_counter() - start) / len(specs)
+        print(f'{size:>10} {build:>10.2f} {loop * 1000:>10.2f} {vectorized * 1000:>12.3f} {loop / vectorized:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the operator grid index against the old full scan.
+
+The full scan is what /api/equipment/nearby used to do: haversine against
+every operator. The grid index only runs haversine on operators in cells
+overlapping the search bounding box. Both are measured in memory so the
+numbers reflect the lookup itself, not the database.
+
+The same is done for ``delivers=true`` searches: testing every operator's
+service area against the point, against the CoverageIndex lookup.
+
+Usage:
+    python benchmarks/bench_nearby.py [--sizes 10000 100000 1000000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.spatial import CoverageIndex, GridIndex, calculate_distance  # noqa: E402
+
+# Rough bounding box of mainland Australia
+AU_LAT = (-38.5, -12.0)
+AU_LNG = (114.0, 153.5)
+
+# Major cities, most operators cluster around these
+CITIES = [
+    (-33.87, 151.21),  # Sydney
+    (-37.81, 144.96),  # Melbourne
+    (-27.47, 153.03),  # Brisbane
+    (-31.95, 115.86),  # Perth
+    (-34.93, 138.60),  # Adelaide
+]
+
+
+def random_point(rng):
+    if rng.random() < 0.7:
+        lat, lng = rng.choice(CITIES)
+        return lat + rng.gauss(0, 0.3), lng + rng.gauss(0, 0.3)
+    return rng.uniform(*AU_LAT), rng.uniform(*AU_LNG)
+
+
+def full_scan(points, lat, lng, radius):
+    result = []
+    for point_id, point_lat, point_lng in points:
+        distance = calculate_distance(lat, lng, point_lat, point_lng)
+        if distance <= radius:
+            result.append((point_id, distance))
+    return result
+
+
+def covering_scan(circles, lat, lng):
+    result = []
+    for circle_id, circle_lat, circle_lng, radius in circles:
+        distance = calculate_distance(lat, lng, circle_lat, circle_lng)
+        if distance <= radius:
+            result.append((circle_id, distance))
+    return result
+
+
+def time_queries(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scan-queries', type=int, default=5,
+                        help='queries for the full scan, which is much slower')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'operators':>10} {'build (s)':>10} {'scan (ms)':>10} {'grid (ms)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        points = [(i, *random_point(rng)) for i in range(size)]
+        queries = [(*random_point(rng), rng.choice([10000, 25000, 50000])) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        grid = GridIndex(points)
+        build = time.perf_counter() - start
+
+        # Sanity check that both paths agree
+        lat, lng, radius = queries[0]
+        assert sorted(full_scan(points, lat, lng, radius)) == sorted(grid.within(lat, lng, radius))
+
+        scan = time_queries(lambda *q: full_scan(points, *q), queries[:args.scan_queries])
+        indexed = time_queries(grid.within, queries)
+        print(f'{size:>10} {build:>10.2f} {scan * 1000:>10.2f} {indexed * 1000:>10.3f} {scan / indexed:>7.0f}x')
+
+    print(f"\n{'operators':>10} {'build (s)':>10} {'scan (ms)':>10} {'cover (ms)':>10} {'speedup':>8}  (service areas)")
+    for size in args.sizes:
+        circles = [(i, *random_point(rng), rng.choice([10000, 25000, 50000, 100000])) for i in range(size)]
+        queries = [random_point(rng) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        coverage = CoverageIndex(circles)
+        build = time.perf_counter() - start
+
+        lat, lng = queries[0]
+        assert sorted(covering_scan(circles, lat, lng)) == sorted(coverage.covering(lat, lng))
+
+        scan = time_queries(lambda lat, lng: covering_scan(circles, lat, lng), queries[:args.scan_queries])
+        indexed = time_queries(coverage.covering, queries)
+        print(f'{size:>10} {build:>10.2f} {scan * 1000:>10.2f} {indexed * 1000:>10.3f} {scan / indexed:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
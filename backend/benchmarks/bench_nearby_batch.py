@@ -0,0 +1,151 @@
+"""
+Benchmark multi-point nearby searches: one batch against one search per point.
+
+Kernel: for each batch of query points, GridIndex.within once per point
+(what /api/equipment/nearby does per request) against a single
+OperatorArrays.within_many call, in memory.
+
+API (--api): for each batch, every page of GET /api/equipment/nearby per
+point against every page of one POST /api/equipment/nearby/batch. The
+database is whatever DATABASE_URL points to; seed it first with
+seed_data.py. Run with CACHE_BACKEND=none, or repeated points are served
+from the response cache.
+
+Usage:
+    python benchmarks/bench_nearby_batch.py [--sizes 10000 100000 1000000] [--points 10 50 100]
+                                            [--batches 20] [--api] [--url http://localhost:8000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_nearby import random_point  # noqa: E402
+
+from app.spatial import GridIndex, OperatorArrays  # noqa: E402
+
+RADII = [5000, 10000, 25000]
+
+
+def make_batches(rng, count, size):
+    return [[(*random_point(rng), rng.choice(RADII)) for _ in range(size)] for _ in range(count)]
+
+
+def time_batches(fn, batches):
+    start = time.perf_counter()
+    for batch in batches:
+        fn(batch)
+    return (time.perf_counter() - start) / len(batches)
+
+
+def bench_kernel(args, rng):
+    print(f"{'operators':>10} {'points':>6} {'grid (ms)':>10} {'numpy (ms)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        operators = [(i, *random_point(rng)) for i in range(size)]
+        grid = GridIndex(operators)
+        arrays = OperatorArrays(operators)
+        for count in args.points:
+            batches = make_batches(rng, args.batches, count)
+
+            def per_point(batch):
+                return [grid.within(*point) for point in batch]
+
+            def batched(batch):
+                return arrays.within_many(*zip(*batch))
+
+            # Sanity check that both paths agree
+            ids = {point_id for result in per_point(batches[0]) for point_id, _ in result}
+            assert ids == set(batched(batches[0])[0].tolist())
+
+            grid_time = time_batches(per_point, batches)
+            numpy_time = time_batches(batched, batches)
+            print(f'{size:>10} {count:>6} {grid_time * 1000:>10.2f} {numpy_time * 1000:>10.2f} '
+                  f'{grid_time / numpy_time:>7.1f}x')
+
+
+def make_http(app, url):
+    """(get(path), post(path, body)) returning parsed JSON, over HTTP or the test client"""
+    if url:
+        def get(path):
+            with urllib.request.urlopen(url.rstrip('/') + path, timeout=60) as response:
+                return json.load(response)
+
+        def post(path, body):
+            req = urllib.request.Request(url.rstrip('/') + path, data=json.dumps(body).encode(),
+                                         headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return json.load(response)
+        return get, post
+
+    client = app.test_client()
+    return (lambda path: client.get(path).get_json(),
+            lambda path, body: client.post(path, json=body).get_json())
+
+
+def bench_api(args, rng):
+    from app import create_app
+
+    app = create_app()
+    limit = app.config['PAGE_SIZE_MAX']
+    get, post = make_http(app, args.url)
+
+    def per_point(batch):
+        ids = set()
+        for lat, lng, radius in batch:
+            cursor = None
+            while True:
+                page = get(f'/api/equipment/nearby?lat={lat}&lng={lng}&radius={radius}&limit={limit}'
+                           + (f'&cursor={cursor}' if cursor else ''))
+                ids.update(item['id'] for item in page['items'])
+                cursor = page['next_cursor']
+                if not cursor:
+                    break
+        return ids
+
+    def batched(batch):
+        ids, cursor = set(), None
+        points = [{'lat': lat, 'lng': lng, 'radius': radius} for lat, lng, radius in batch]
+        while True:
+            page = post('/api/equipment/nearby/batch', {'points': points, 'limit': limit, 'cursor': cursor})
+            ids.update(item['id'] for item in page['items'])
+            cursor = page['next_cursor']
+            if not cursor:
+                return ids
+
+    print(f"\n{'points':>6} {'per point (ms)':>15} {'batch (ms)':>11} {'speedup':>8} {'equipment':>10}")
+    for count in args.points:
+        batches = make_batches(rng, args.batches, count)
+        # Warm up the in-process indexes, and check both return the same equipment
+        found = per_point(batches[0])
+        assert found == batched(batches[0])
+        per_point_time = time_batches(per_point, batches)
+        batch_time = time_batches(batched, batches)
+        print(f'{count:>6} {per_point_time * 1000:>15.1f} {batch_time * 1000:>11.1f} '
+              f'{per_point_time / batch_time:>7.1f}x {len(found):>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='operator counts for the kernel benchmark')
+    parser.add_argument('--points', type=int, nargs='+', default=[10, 50, 100], help='query points per batch')
+    parser.add_argument('--batches', type=int, default=20, help='batches timed per configuration')
+    parser.add_argument('--api', action='store_true', help='also benchmark the endpoints')
+    parser.add_argument('--url', help='base URL of a running server instead of the test client')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bench_kernel(args, rng)
+    if args.api or args.url:
+        bench_api(args, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark the in-process equipment search index at 100k listings.
+
+Measures index build time, incremental update cost and query latency
+(p50/p95) of the inverted index used when not running on Postgres, with a
+naive substring scan over the same documents for comparison.
+
+Usage:
+    python benchmarks/bench_search.py [--listings 100000] [--queries 500]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.search import InvertedIndex, equipment_document, tokenize  # noqa: E402
+
+BRANDS = ['Kubota', 'Caterpillar', 'Komatsu', 'Hitachi', 'Volvo', 'JCB', 'Bobcat',
+          'Honda', 'Genie', 'Manitou', 'Takeuchi', 'Yanmar', 'Atlas Copco', 'Doosan']
+TYPES = ['excavator', 'mini excavator', 'skid steer', 'generator', 'scissor lift',
+         'boom lift', 'telehandler', 'compactor', 'trencher', 'light tower',
+         'air compressor', 'scaffolding', 'tipper truck', 'backhoe']
+FUELS = ['diesel', 'petrol', 'electric', 'lpg']
+WORDS = ('reliable well maintained late model hire daily weekly rates delivery available '
+         'attachments included operator optional low hours serviced').split()
+
+
+def random_listing(rng):
+    brand, kind = rng.choice(BRANDS), rng.choice(TYPES)
+    name = f'{brand} {kind} {rng.randint(1, 900)}'
+    description = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+    specifications = json.dumps({
+        'fuel': rng.choice(FUELS),
+        'power_kw': rng.randint(2, 300),
+        'weight_kg': rng.randint(100, 40000),
+    })
+    return name, description, specifications
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listings', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    listings = [random_listing(rng) for _ in range(args.listings)]
+    queries = [
+        rng.choice([
+            lambda: rng.choice(BRANDS),
+            lambda: rng.choice(TYPES),
+            lambda: f'{rng.choice(BRANDS)} {rng.choice(TYPES)}',
+            lambda: f'{rng.choice(FUELS)} {rng.choice(TYPES)}',
+        ])()
+        for _ in range(args.queries)
+    ]
+
+    index = InvertedIndex()
+    start = time.perf_counter()
+    for doc_id, listing in enumerate(listings):
+        index.add(doc_id, equipment_document(*listing))
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for doc_id in range(1000):
+        index.add(doc_id, equipment_document(*random_listing(rng)))
+    update = (time.perf_counter() - start) / 1000
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, 20)
+        latencies.append(time.perf_counter() - start)
+
+    # Baseline: scan every listing for all query tokens
+    texts = [' '.join(listing).lower() for listing in listings]
+    scan = []
+    for query in queries[:20]:
+        terms = tokenize(query)
+        start = time.perf_counter()
+        [doc_id for doc_id, text in enumerate(texts) if all(term in text for term in terms)]
+        scan.append(time.perf_counter() - start)
+
+    print(f'listings:          {args.listings}')
+    print(f'index build:       {build:.2f}s ({args.listings / build:,.0f} docs/s)')
+    print(f'incremental add:   {update * 1e6:.0f}us per listing')
+    print(f'query p50 / p95:   {percentile(latencies, 0.5) * 1000:.2f}ms / {percentile(latencies, 0.95) * 1000:.2f}ms')
+    print(f'scan  p50:         {statistics.median(scan) * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
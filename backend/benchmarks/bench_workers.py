@@ -0,0 +1,132 @@
+"""
+Measure how throughput scales with the number of gunicorn workers.
+
+For each worker count, starts ``gunicorn -c gunicorn.conf.py wsgi:app`` on
+a local port and waits for it to come up. It then warms it up and drives
+it with a mixed read workload from the endpoints in bench_api.py, and
+finally stops it. The database is whatever DATABASE_URL points to; seed it
+first with seed_data.py. See DEPLOYMENT.md for the full procedure.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4 8] [--clients 16] [--requests 2000]
+                                       [--worker-class sync] [--threads 1] [--json scaling.json]
+
+The load generator is Python threads in this process and becomes the
+bottleneck at a few thousand requests per second. Run it from another
+machine, or use wrk/hey with the same URLs, for more than that.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_api import endpoints, make_client, run_endpoint, sample_data  # noqa: E402
+
+from app import create_app  # noqa: E402
+
+DEFAULT_MIX = ['nearby', 'nearby_dates', 'equipment_category', 'equipment_filtered', 'search',
+               'facets', 'availability', 'electrician_match', 'hirer_rfqs']
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{url}/api/test', timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not come up on {url}')
+
+
+def start_server(workers, port, args):
+    env = dict(os.environ)
+    env.update({
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKER_CLASS': args.worker_class,
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_LOG_LEVEL': 'warning',
+    })
+    env.setdefault('SECRET_KEY', 'benchmark')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND, env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--worker-class', default='sync', choices=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker for gthread')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests per worker count')
+    parser.add_argument('--warmup', type=int, default=50, help='warmup requests per worker')
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_MIX)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', dest='json_path', help='write the results to this file')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app()
+    builders = endpoints(sample_data(app))
+    unknown = [name for name in args.endpoints if name not in builders]
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(unknown)}")
+    mix = [builders[name] for name in args.endpoints]
+    rng = random.Random(args.seed)
+    url = f'http://127.0.0.1:{args.port}'
+    new_client = make_client(app, url)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+            'worker_class': args.worker_class,
+            'threads': args.threads,
+            'clients': args.clients,
+            'requests': args.requests,
+            'endpoints': args.endpoints,
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+        },
+        'runs': [],
+    }
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for workers in args.workers:
+        server = start_server(workers, args.port, args)
+        try:
+            wait_until_up(url)
+            # Every worker builds its own in-process indexes on first use
+            warm = [rng.choice(mix)(rng) for _ in range(args.warmup * workers)]
+            run_endpoint(new_client, warm, args.clients)
+            paths = [rng.choice(mix)(rng) for _ in range(args.requests)]
+            stats = run_endpoint(new_client, paths, args.clients)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        results['runs'].append(dict(stats, workers=workers))
+        print(f"{workers:>7} {stats['rps']:>8.1f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+              f"{stats['p99_ms']:>8.2f} {stats['errors']:>6}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults written to {args.json_path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Gunicorn settings, all overridable from the environment:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker classes (GUNICORN_WORKER_CLASS):
+
+* ``sync`` (default) - one request per process at a time. Each process
+  builds its own in-process indexes (spatial grid, search, facets,
+  matching), so prefer fewer, longer lived workers. Those only see other
+  processes' writes when they are next rebuilt, see DEPLOYMENT.md.
+* ``gthread`` - GUNICORN_THREADS requests per process sharing those
+  indexes. Keep DB_POOL_SIZE at least the thread count.
+* ``gevent`` - needs ``pip install gevent psycogreen``. psycopg2 is made
+  cooperative with psycogreen. The app is not preloaded, so it is imported
+  after gevent has patched threading. Size DB_POOL_SIZE + DB_MAX_OVERFLOW
+  for GUNICORN_WORKER_CONNECTIONS concurrent requests, or put PgBouncer in
+  between. The sampling profiler doesn't work with greenlets.
+
+With ``preload_app`` the app is created once in the master and forked, so
+every worker drops the pooled connections it inherited (see post_fork).
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))  # gevent only
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Restarting workers every N requests throws away their in-process indexes,
+# so it is off unless asked for
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false' if worker_class == 'gevent' else 'true').lower() == 'true'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None  # '-' for stdout
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Don't share the master's pooled connections between workers"""
+    if not preload_app:
+        return
+    from wsgi import app
+    from app import db
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the sockets to the master; the worker's pool
+            # just forgets them and opens its own
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            worker.log.warning('psycogreen is not installed, database calls will block the gevent worker')
+        else:
+            patch_psycopg()
+
+    # Build the facet bitmaps in the background before a request needs them
+    from app.facets import equipment_facets
+    equipment_facets.warm(worker.wsgi)
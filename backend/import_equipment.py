@@ -0,0 +1,42 @@
+"""
+Bulk import equipment listings for an operator from a CSV file.
+
+Usage:
+    python import_equipment.py listings.csv --operator-id 42 [--batch-size 1000]
+"""
+import argparse
+import json
+import sys
+
+from app import create_app, db
+from app.importer import DEFAULT_BATCH_SIZE, import_equipment_csv
+from app.models import Operator
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import equipment listings from CSV')
+    parser.add_argument('path', help="CSV file, or '-' for stdin")
+    parser.add_argument('--operator-id', type=int, required=True)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if db.session.get(Operator, args.operator_id) is None:
+            print(f'Operator {args.operator_id} not found')
+            return 1
+
+        if args.path == '-':
+            report = import_equipment_csv(sys.stdin, args.operator_id, args.batch_size)
+        else:
+            with open(args.path, newline='', encoding='utf-8-sig') as f:
+                report = import_equipment_csv(f, args.operator_id, args.batch_size)
+
+    print(f"Imported {report['inserted']} of {report['rows']} rows, {report['failed']} failed")
+    for error in report['errors']:
+        print(f"  line {error['line']}: {error['error']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""add indexes for hot filter and join columns
+
+Revision ID: 0b7e3d5a9c42
+Revises: f19a4b6c8e27
+Create Date: 2026-10-18 17:55:03.774190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e3d5a9c42'
+down_revision = 'f19a4b6c8e27'
+branch_labels = None
+depends_on = None
+
+VISIBLE_OPERATOR = sa.text("moderation_status = 'APPROVED' AND deleted_at IS NULL")
+
+# Foreign keys used in joins and lookups
+FK_INDEXES = [
+    ('ix_operators_user_id', 'operators', ['user_id']),
+    ('ix_equipment_categories_parent_id', 'equipment_categories', ['parent_id']),
+    ('ix_licenses_electrician_id', 'licenses', ['electrician_id']),
+    ('ix_certifications_electrician_id', 'certifications', ['electrician_id']),
+    ('ix_qualifications_electrician_id', 'qualifications', ['electrician_id']),
+    ('ix_projects_electrician_id', 'projects', ['electrician_id']),
+    ('ix_skills_electrician_id', 'skills', ['electrician_id']),
+    ('ix_equipment_operator_id', 'equipment', ['operator_id', 'id']),
+    ('ix_equipment_category_id', 'equipment', ['category_id', 'id']),
+]
+
+
+def upgrade():
+    for name, table, columns in FK_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+    op.create_index('ix_equipment_updated_at', 'equipment', ['updated_at'], unique=False)
+    op.create_index('ix_equipment_available_category_rate', 'equipment', ['category_id', 'daily_rate'],
+                    unique=False, postgresql_where=sa.text('availability_status'),
+                    sqlite_where=sa.text('availability_status = 1'))
+    # Nearby searches only look at visible operators, so the location index
+    # becomes partial
+    op.create_index('ix_operators_visible_location', 'operators', ['latitude', 'longitude'],
+                    unique=False, postgresql_where=VISIBLE_OPERATOR, sqlite_where=VISIBLE_OPERATOR)
+    op.drop_index('ix_operators_latitude_longitude', table_name='operators')
+
+
+def downgrade():
+    op.create_index('ix_operators_latitude_longitude', 'operators', ['latitude', 'longitude'], unique=False)
+    op.drop_index('ix_operators_visible_location', table_name='operators')
+    op.drop_index('ix_equipment_available_category_rate', table_name='equipment')
+    op.drop_index('ix_equipment_updated_at', table_name='equipment')
+    for name, table, columns in reversed(FK_INDEXES):
+        op.drop_index(name, table_name=table)
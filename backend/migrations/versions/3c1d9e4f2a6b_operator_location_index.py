@@ -0,0 +1,24 @@
+"""add operator location index
+
+Revision ID: 3c1d9e4f2a6b
+Revises: 57a87587a90f
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d9e4f2a6b'
+down_revision = '57a87587a90f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_operators_latitude_longitude', 'operators', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_operators_latitude_longitude', table_name='operators')
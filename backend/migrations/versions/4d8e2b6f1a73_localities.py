@@ -0,0 +1,35 @@
+"""suburb and postcode gazetteer
+
+Revision ID: 4d8e2b6f1a73
+Revises: 7c4f1a9d2b58
+Create Date: 2026-10-18 21:04:17.332905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8e2b6f1a73'
+down_revision = '7c4f1a9d2b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('localities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('suburb', sa.String(length=100), nullable=False),
+    sa.Column('state', sa.String(length=50), nullable=False),
+    sa.Column('postcode', sa.String(length=10), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('suburb', 'state', 'postcode')
+    )
+    op.create_index('ix_localities_postcode', 'localities', ['postcode'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_localities_postcode', table_name='localities')
+    op.drop_table('localities')
@@ -0,0 +1,28 @@
+"""cover updated_at in the equipment category index
+
+Revision ID: 7c4f1a9d2b58
+Revises: 0b7e3d5a9c42
+Create Date: 2026-10-18 19:12:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4f1a9d2b58'
+down_revision = '0b7e3d5a9c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The count/max(updated_at) watermark of category listings can then be
+    # answered from the index alone
+    op.drop_index('ix_equipment_category_id', table_name='equipment')
+    op.create_index('ix_equipment_category_id', 'equipment', ['category_id', 'id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_equipment_category_id', table_name='equipment')
+    op.create_index('ix_equipment_category_id', 'equipment', ['category_id', 'id'], unique=False)
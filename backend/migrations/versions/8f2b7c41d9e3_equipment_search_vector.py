@@ -0,0 +1,36 @@
+"""add full-text search index on equipment
+
+Revision ID: 8f2b7c41d9e3
+Revises: 3c1d9e4f2a6b
+Create Date: 2026-10-18 11:40:07.392518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2b7c41d9e3'
+down_revision = '3c1d9e4f2a6b'
+branch_labels = None
+depends_on = None
+
+# Must match app.search.search_vector()
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(equipment.name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(equipment.specifications, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(equipment.description, '')), 'C')"
+)
+
+
+def upgrade():
+    # Other databases use the in-process inverted index instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(f'CREATE INDEX ix_equipment_search_vector ON equipment USING gin (({SEARCH_VECTOR}))')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_equipment_search_vector')
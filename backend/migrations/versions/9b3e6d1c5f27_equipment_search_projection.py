@@ -0,0 +1,118 @@
+"""flattened equipment_search projection
+
+Revision ID: 9b3e6d1c5f27
+Revises: 4d8e2b6f1a73
+Create Date: 2026-10-18 22:15:42.118604
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e6d1c5f27'
+down_revision = '4d8e2b6f1a73'
+branch_labels = None
+depends_on = None
+
+# Must match the weights in app.search
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(category_path, '')), 'B') || "
+    "setweight(coalesce(jsonb_to_tsvector('english', specifications, '[\"string\", \"numeric\", \"key\"]'), ''), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+# The equipment index searches used before, from c6b8d2f4e913
+OLD_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(equipment.name, '')), 'A') || "
+    "setweight(coalesce(jsonb_to_tsvector('english', equipment.specifications, '[\"string\", \"numeric\", \"key\"]'), ''), 'B') || "
+    "setweight(to_tsvector('english', coalesce(equipment.description, '')), 'C')"
+)
+
+PROJECTED_COLUMNS = (
+    'id, operator_id, operator_business_name, operator_suburb, operator_state, operator_postcode, '
+    'latitude, longitude, service_radius, category_id, category_name, category_path, name, description, '
+    'specifications, daily_rate, weekly_rate, monthly_rate, availability_status, updated_at'
+)
+
+
+def upgrade():
+    json_type = sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+    op.create_table('equipment_search',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('operator_id', sa.Integer(), nullable=False),
+    sa.Column('operator_business_name', sa.String(length=255), nullable=False),
+    sa.Column('operator_suburb', sa.String(length=100), nullable=False),
+    sa.Column('operator_state', sa.String(length=50), nullable=False),
+    sa.Column('operator_postcode', sa.String(length=10), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('service_radius', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('category_name', sa.String(length=100), nullable=False),
+    sa.Column('category_path', sa.Text(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('specifications', json_type, nullable=True),
+    sa.Column('daily_rate', sa.Float(), nullable=True),
+    sa.Column('weekly_rate', sa.Float(), nullable=True),
+    sa.Column('monthly_rate', sa.Float(), nullable=True),
+    sa.Column('availability_status', sa.Boolean(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['equipment.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_equipment_search_operator_id', 'equipment_search', ['operator_id', 'id'], unique=False)
+    op.create_index('ix_equipment_search_category_id', 'equipment_search',
+                    ['category_id', 'id', 'updated_at'], unique=False)
+    op.create_index('ix_equipment_search_available_category_rate', 'equipment_search',
+                    ['category_id', 'daily_rate'], unique=False,
+                    postgresql_where=sa.text('availability_status'),
+                    sqlite_where=sa.text('availability_status = 1'))
+
+    # Backfill; the category paths are filled in per category below
+    bind = op.get_bind()
+    bind.execute(sa.text(f"""
+        INSERT INTO equipment_search ({PROJECTED_COLUMNS})
+        SELECT e.id, o.id, o.business_name, o.suburb, o.state, o.postcode,
+               o.latitude, o.longitude, o.service_radius, c.id, c.name, c.name, e.name, e.description,
+               e.specifications, e.daily_rate, e.weekly_rate, e.monthly_rate, e.availability_status, :now
+        FROM equipment e
+        JOIN operators o ON o.id = e.operator_id
+        JOIN equipment_categories c ON c.id = e.category_id
+        WHERE o.moderation_status = 'APPROVED' AND o.deleted_at IS NULL
+    """), {'now': datetime.utcnow()})
+    parents = dict(bind.execute(sa.text('SELECT id, parent_id FROM equipment_categories')).all())
+    names = dict(bind.execute(sa.text('SELECT id, name FROM equipment_categories')).all())
+    for category_id in parents:
+        path, node = [], category_id
+        while node is not None:
+            path.append(names[node])
+            node = parents[node]
+        bind.execute(sa.text('UPDATE equipment_search SET category_path = :path WHERE category_id = :id'),
+                     {'path': ' > '.join(reversed(path)), 'id': category_id})
+
+    # Other databases use the in-process inverted index instead
+    if bind.dialect.name != 'postgresql':
+        return
+    op.create_index('ix_equipment_search_specifications', 'equipment_search', ['specifications'],
+                    unique=False, postgresql_using='gin', postgresql_ops={'specifications': 'jsonb_path_ops'})
+    op.execute(f'ALTER TABLE equipment_search ADD COLUMN search_vector tsvector '
+               f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED')
+    op.execute('CREATE INDEX ix_equipment_search_search_vector ON equipment_search USING gin (search_vector)')
+    # Searches no longer read equipment directly
+    op.execute('DROP INDEX IF EXISTS ix_equipment_search_vector')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(f'CREATE INDEX ix_equipment_search_vector ON equipment USING gin (({OLD_SEARCH_VECTOR}))')
+        op.drop_index('ix_equipment_search_specifications', table_name='equipment_search')
+    op.drop_index('ix_equipment_search_available_category_rate', table_name='equipment_search')
+    op.drop_index('ix_equipment_search_category_id', table_name='equipment_search')
+    op.drop_index('ix_equipment_search_operator_id', table_name='equipment_search')
+    op.drop_table('equipment_search')
@@ -0,0 +1,26 @@
+"""index equipment_search.updated_at for listing watermarks
+
+Revision ID: a3f6c2e8d147
+Revises: 9b3e6d1c5f27
+Create Date: 2026-10-18 23:41:09.372815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f6c2e8d147'
+down_revision = '9b3e6d1c5f27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GET /equipment reads the projection now; its unfiltered watermark
+    # takes max(updated_at) from this index
+    op.create_index('ix_equipment_search_updated_at', 'equipment_search', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_equipment_search_updated_at', table_name='equipment_search')
@@ -0,0 +1,45 @@
+"""add equipment category closure table
+
+Revision ID: b5e04a7c3f18
+Revises: 8f2b7c41d9e3
+Create Date: 2026-10-18 13:05:52.640211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e04a7c3f18'
+down_revision = '8f2b7c41d9e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('equipment_category_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['equipment_categories.id'], ),
+    sa.ForeignKeyConstraint(['descendant_id'], ['equipment_categories.id'], ),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_equipment_category_closure_descendant', 'equipment_category_closure', ['descendant_id', 'ancestor_id'], unique=False)
+
+    # Materialize the existing hierarchy
+    op.execute("""
+        INSERT INTO equipment_category_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM equipment_categories
+            UNION ALL
+            SELECT tree.ancestor_id, c.id, tree.depth + 1
+            FROM tree JOIN equipment_categories c ON c.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_equipment_category_closure_descendant', table_name='equipment_category_closure')
+    op.drop_table('equipment_category_closure')
@@ -0,0 +1,99 @@
+"""store json documents as jsonb
+
+Revision ID: c6b8d2f4e913
+Revises: a93c5e2d7b16
+Create Date: 2026-10-18 16:37:25.610482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6b8d2f4e913'
+down_revision = 'a93c5e2d7b16'
+branch_labels = None
+depends_on = None
+
+# Columns that held JSON as strings
+JSON_COLUMNS = {
+    'electricians': ['preferred_locations'],
+    'projects': ['tools_used', 'voltage_levels', 'specialties', 'compliance_standards', 'key_achievements'],
+    'operators': ['operating_hours'],
+    'equipment': ['specifications'],
+}
+
+# Containment (@>) indexes
+GIN_INDEXES = [
+    ('ix_electricians_preferred_locations', 'electricians', 'preferred_locations'),
+    ('ix_projects_voltage_levels', 'projects', 'voltage_levels'),
+    ('ix_projects_specialties', 'projects', 'specialties'),
+    ('ix_equipment_specifications', 'equipment', 'specifications'),
+]
+
+# Must match app.search.search_vector()
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(equipment.name, '')), 'A') || "
+    "setweight(coalesce(jsonb_to_tsvector('english', equipment.specifications, '[\"string\", \"numeric\", \"key\"]'), ''), 'B') || "
+    "setweight(to_tsvector('english', coalesce(equipment.description, '')), 'C')"
+)
+
+# The text version from 8f2b7c41d9e3
+OLD_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(equipment.name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(equipment.specifications, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(equipment.description, '')), 'C')"
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite keeps JSON as text, existing values are already in that form
+        for table, columns in JSON_COLUMNS.items():
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in columns:
+                    batch_op.alter_column(column, existing_type=sa.String(), type_=sa.JSON())
+        return
+
+    # The search index expression reads specifications as text
+    op.execute('DROP INDEX IF EXISTS ix_equipment_search_vector')
+    # Values that aren't valid JSON are kept as JSON strings rather than
+    # failing the migration
+    op.execute("""
+        CREATE FUNCTION pg_temp.try_jsonb(value text) RETURNS jsonb AS $$
+        BEGIN
+            IF value IS NULL OR btrim(value) = '' THEN
+                RETURN NULL;
+            END IF;
+            RETURN value::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN to_jsonb(value);
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    for table, columns in JSON_COLUMNS.items():
+        for column in columns:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE jsonb USING pg_temp.try_jsonb({column})')
+    for name, table, column in GIN_INDEXES:
+        op.create_index(name, table, [column], unique=False, postgresql_using='gin',
+                        postgresql_ops={column: 'jsonb_path_ops'})
+    op.execute(f'CREATE INDEX ix_equipment_search_vector ON equipment USING gin (({SEARCH_VECTOR}))')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        for table, columns in JSON_COLUMNS.items():
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in columns:
+                    batch_op.alter_column(column, existing_type=sa.JSON(), type_=sa.String())
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_equipment_search_vector')
+    for name, table, column in GIN_INDEXES:
+        op.drop_index(name, table_name=table)
+    for table, columns in JSON_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column, existing_type=postgresql.JSONB(), type_=sa.String(),
+                            postgresql_using=f'{column}::text')
+    op.execute(f'CREATE INDEX ix_equipment_search_vector ON equipment USING gin (({OLD_SEARCH_VECTOR}))')
@@ -0,0 +1,49 @@
+"""add equipment availability blocks
+
+Revision ID: d71a3e9b0c54
+Revises: b5e04a7c3f18
+Create Date: 2026-10-18 14:21:36.905127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd71a3e9b0c54'
+down_revision = 'b5e04a7c3f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('equipment_availability_blocks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('equipment_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Enum('BOOKING', 'BLACKOUT', name='availabilityblockkind'), nullable=False),
+    sa.Column('start_date', sa.DateTime(), nullable=False),
+    sa.Column('end_date', sa.DateTime(), nullable=False),
+    sa.Column('note', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_equipment_availability_blocks_equipment_dates', 'equipment_availability_blocks', ['equipment_id', 'start_date', 'end_date'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Range overlap (&&) lookups per equipment; btree_gist lets the
+        # integer column share the GiST index with the range
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute(
+            'CREATE INDEX ix_equipment_availability_blocks_range ON equipment_availability_blocks '
+            'USING gist (equipment_id, tsrange(start_date, end_date))'
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_equipment_availability_blocks_range')
+    op.drop_index('ix_equipment_availability_blocks_equipment_dates', table_name='equipment_availability_blocks')
+    op.drop_table('equipment_availability_blocks')
+    sa.Enum(name='availabilityblockkind').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,67 @@
+"""add rfqs and rfq recipients
+
+Revision ID: e42f8a1c6d97
+Revises: d71a3e9b0c54
+Create Date: 2026-10-18 15:02:11.418530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e42f8a1c6d97'
+down_revision = 'd71a3e9b0c54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rfqs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('hirer_id', sa.Integer(), nullable=False),
+    sa.Column('equipment_id', sa.Integer(), nullable=True),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('hire_start', sa.DateTime(), nullable=False),
+    sa.Column('hire_end', sa.DateTime(), nullable=False),
+    sa.Column('delivery_preference', sa.Enum('DELIVERY', 'PICKUP', name='deliverypreference'), nullable=False),
+    sa.Column('delivery_address', sa.String(length=255), nullable=True),
+    sa.Column('requirements', sa.Text(), nullable=True),
+    sa.Column('status', sa.Enum('PENDING', 'ACCEPTED', 'DECLINED', 'EXPIRED', name='rfqstatus'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['equipment_categories.id'], ),
+    sa.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], ),
+    sa.ForeignKeyConstraint(['hirer_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rfqs_hirer_status_created', 'rfqs', ['hirer_id', 'status', 'created_at'], unique=False)
+    op.create_table('rfq_recipients',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rfq_id', sa.Integer(), nullable=False),
+    sa.Column('operator_id', sa.Integer(), nullable=False),
+    # The type was created with rfqs
+    sa.Column('status', postgresql.ENUM('PENDING', 'ACCEPTED', 'DECLINED', 'EXPIRED', name='rfqstatus', create_type=False), nullable=False),
+    sa.Column('quoted_price', sa.Float(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('notified_at', sa.DateTime(), nullable=True),
+    sa.Column('responded_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['operator_id'], ['operators.id'], ),
+    sa.ForeignKeyConstraint(['rfq_id'], ['rfqs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('rfq_id', 'operator_id')
+    )
+    op.create_index('ix_rfq_recipients_operator_status', 'rfq_recipients', ['operator_id', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_rfq_recipients_operator_status', table_name='rfq_recipients')
+    op.drop_table('rfq_recipients')
+    op.drop_index('ix_rfqs_hirer_status_created', table_name='rfqs')
+    op.drop_table('rfqs')
+    sa.Enum(name='deliverypreference').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='rfqstatus').drop(op.get_bind(), checkfirst=True)
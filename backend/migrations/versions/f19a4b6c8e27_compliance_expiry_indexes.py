@@ -0,0 +1,35 @@
+"""add compliance expiry indexes and scan watermarks
+
+Revision ID: f19a4b6c8e27
+Revises: c6b8d2f4e913
+Create Date: 2026-10-18 17:12:48.051736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f19a4b6c8e27'
+down_revision = 'c6b8d2f4e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scan_watermarks',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('watermark', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_index('ix_licenses_expiry_date', 'licenses', ['expiry_date', 'electrician_id'], unique=False)
+    op.create_index('ix_certifications_expiry_date', 'certifications', ['expiry_date', 'electrician_id'], unique=False)
+    op.create_index('ix_electricians_insurance_expiry', 'electricians', ['insurance_expiry'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_electricians_insurance_expiry', table_name='electricians')
+    op.drop_index('ix_certifications_expiry_date', table_name='certifications')
+    op.drop_index('ix_licenses_expiry_date', table_name='licenses')
+    op.drop_table('scan_watermarks')
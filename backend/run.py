@@ -3,4 +3,5 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    # Development server only, use wsgi.py with gunicorn in production
+    app.run(debug=app.config['DEBUG']) 
\ No newline at end of file
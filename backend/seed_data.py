@@ -0,0 +1,53 @@
+"""
+Fill a database with synthetic marketplace data for load testing.
+
+Usage:
+    python seed_data.py --equipment 100000 [--operators N] [--electricians N]
+                        [--hirers N] [--rfqs N] [--batch-size 5000] [--seed 42]
+
+Counts not given default to proportions of --equipment. Run migrations
+first (``flask --app run db upgrade``); seeding adds to whatever is there.
+"""
+import argparse
+import json
+import sys
+import time
+
+from app import create_app
+from app.seeding import DEFAULT_BATCH_SIZE, seed_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed synthetic marketplace data')
+    parser.add_argument('--equipment', type=int, default=10000)
+    parser.add_argument('--operators', type=int)
+    parser.add_argument('--electricians', type=int)
+    parser.add_argument('--hirers', type=int)
+    parser.add_argument('--rfqs', type=int)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--seed', type=int, help='random seed, for repeatable data')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        summary = seed_database(
+            equipment=args.equipment, operators=args.operators, electricians=args.electricians,
+            hirers=args.hirers, rfqs=args.rfqs, batch_size=args.batch_size, seed=args.seed,
+        )
+        elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(dict(summary, seconds=round(elapsed, 2))))
+        return 0
+    rows = sum(value for value in summary.values() if isinstance(value, int))
+    for name, value in summary.items():
+        if isinstance(value, int):
+            print(f'{name:>20}: {value}')
+    print(f'Seeded {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Shared fixtures: a fresh SQLite database per test, created from the
+models, with the response cache off and background tasks run inline.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.events import notify_bulk  # noqa: E402
+from app.facets import equipment_facets  # noqa: E402
+from app.models import (  # noqa: E402
+    Equipment, EquipmentCategory, ModerationStatus, Operator, User, UserRole,
+)
+
+
+def reset_indexes():
+    """Drop the process-wide in-process indexes so they rebuild from this test's database"""
+    notify_bulk(*[mapper.class_ for mapper in db.Model.registry.mappers])
+    # Facets keep serving their old index while rebuilding in the background
+    equipment_facets.wait()
+    equipment_facets.invalidate()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('CACHE_BACKEND', 'none')
+    monkeypatch.setenv('TASK_QUEUE_BACKEND', 'inline')
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        reset_indexes()
+        yield app
+        db.session.remove()
+        reset_indexes()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_operator(app):
+    """Create an operator (approved unless told otherwise) with its user"""
+    counter = iter(range(1, 1000000))
+
+    def make(latitude=-33.87, longitude=151.21, **fields):
+        n = next(counter)
+        user = User(email=f'operator{n}@example.com', password_hash='x', role=UserRole.OPERATOR,
+                    full_name=f'Operator {n}')
+        values = {
+            'business_name': f'Hire Co {n}', 'latitude': latitude, 'longitude': longitude,
+            'service_radius': 50000, 'address_line1': '1 Test St', 'suburb': 'Sydney',
+            'state': 'NSW', 'postcode': '2000', 'moderation_status': ModerationStatus.APPROVED,
+        }
+        values.update(fields)
+        operator = Operator(user=user, **values)
+        db.session.add(operator)
+        db.session.commit()
+        return operator
+    return make
+
+
+@pytest.fixture
+def category(app):
+    category = EquipmentCategory(name='Excavators')
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+
+@pytest.fixture
+def make_equipment(app, category):
+    """Create ``count`` listings for an operator"""
+    def make(operator, count=1, **fields):
+        items = [Equipment(operator=operator, category_id=fields.pop('category_id', category.id),
+                           name=f'Excavator {i}', daily_rate=100 + i, **fields)
+                 for i in range(count)]
+        db.session.add_all(items)
+        db.session.commit()
+        return items
+    return make
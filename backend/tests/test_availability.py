@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+from app.availability import parse_date_param
+
+
+@pytest.mark.parametrize('value', [20261102, 1.5, ['2026-11-02'], {'date': '2026-11-02'}, True])
+def test_parse_date_param_rejects_non_strings(value):
+    with pytest.raises(ValueError):
+        parse_date_param(value)
+
+
+@pytest.mark.parametrize('path', ['availability', 'availability/alerts'])
+@pytest.mark.parametrize('start', [20261102, ['2026-11-02']])
+def test_non_string_dates_are_rejected(client, make_operator, make_equipment, path, start):
+    equipment, = make_equipment(make_operator())
+    response = client.post(f'/api/equipment/{equipment.id}/{path}',
+                           json={'user_id': equipment.operator.user_id, 'start_date': start,
+                                 'end_date': '2026-11-06'})
+    assert response.status_code == 400
+    assert 'Invalid date' in response.get_json()['error']
+
+
+def test_offsets_are_converted_to_naive_utc():
+    assert parse_date_param('2026-11-03T00:00:00+10:00') == datetime(2026, 11, 2, 14)
+    assert parse_date_param('2026-11-02T12:00:00Z') == datetime(2026, 11, 2, 12)
+
+
+@pytest.mark.parametrize('path', [
+    '/api/equipment/nearby?lat=-33.87&lng=151.21&radius=1000&',
+    '/api/equipment/search?q=excavator&',
+])
+def test_mixed_naive_and_aware_dates(client, path):
+    response = client.get(f'{path}available_from=2026-11-02&available_to=2026-11-03T00:00:00%2B10:00')
+    assert response.status_code == 200, response.get_json()
+    response = client.get(f'{path}available_from=2026-11-03T00:00:00%2B10:00&available_to=2026-11-02T12:00:00')
+    assert response.status_code == 400
+    assert 'must be after' in response.get_json()['error']
+
+
+def test_block_with_offset_dates(client, make_operator, make_equipment):
+    equipment, = make_equipment(make_operator())
+    response = client.post(f'/api/equipment/{equipment.id}/availability',
+                           json={'start_date': '2026-11-02', 'end_date': '2026-11-03T09:00:00+10:00'})
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['end_date'].startswith('2026-11-02T23:00:00')
+
+
+@pytest.mark.parametrize('body, message', [
+    (['x'], 'JSON object'),
+    ({'start_date': '2026-11-02', 'end_date': '2026-11-06', 'note': {'a': 1}}, 'note must be a string'),
+    ({'start_date': '2026-11-02', 'end_date': '2026-11-06', 'note': 'x' * 256}, 'longer than 255'),
+])
+def test_block_rejects_bad_bodies(client, make_operator, make_equipment, body, message):
+    equipment, = make_equipment(make_operator())
+    response = client.post(f'/api/equipment/{equipment.id}/availability', json=body)
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+
+
+def test_alert_with_offset_dates(client, make_operator, make_equipment):
+    equipment, = make_equipment(make_operator())
+    response = client.post(f'/api/equipment/{equipment.id}/availability/alerts',
+                           json={'user_id': equipment.operator.user_id, 'start_date': '2099-11-02',
+                                 'end_date': '2099-11-03T09:00:00+10:00'})
+    assert response.status_code == 201, response.get_json()
+
+
+def test_alert_body_must_be_an_object(client, make_operator, make_equipment):
+    equipment, = make_equipment(make_operator())
+    response = client.post(f'/api/equipment/{equipment.id}/availability/alerts', json=['x'])
+    assert response.status_code == 400
+    assert 'JSON object' in response.get_json()['error']
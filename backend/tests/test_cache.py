@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from app.cache import LRUCache, ResponseCache, cache
+
+
+def test_generation_bumps_on_commit_not_flush(app, monkeypatch, make_operator, make_equipment):
+    monkeypatch.setattr(cache, 'backend', LRUCache())
+    equipment = make_equipment(make_operator())[0]
+    generation = cache.backend.generation()
+
+    equipment.daily_rate = 999
+    db.session.flush()
+    assert cache.backend.generation() == generation
+    db.session.commit()
+    assert cache.backend.generation() == generation + 1
+
+
+def test_rolled_back_write_does_not_leave_a_pending_bump(app, monkeypatch, make_operator, make_equipment):
+    monkeypatch.setattr(cache, 'backend', LRUCache())
+    equipment = make_equipment(make_operator())[0]
+    equipment.daily_rate = 999
+    db.session.flush()
+    db.session.rollback()
+    generation = cache.backend.generation()
+
+    db.session.commit()  # nothing written
+    assert cache.backend.generation() == generation
+
+
+def test_counters_are_thread_safe():
+    response_cache = ResponseCache()
+    response_cache.backend = LRUCache()
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: response_cache.get_or_set('x', {'i': i % 10}, lambda: i), range(4000)))
+    stats = response_cache.stats()
+    assert stats['hits'] + stats['misses'] == 4000
@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import select
+
+from app import db
+from app.categories import closure, rebuild_closure
+from app.models import EquipmentCategory
+
+
+def closure_rows():
+    return set(db.session.execute(select(closure.c.ancestor_id, closure.c.descendant_id, closure.c.depth)))
+
+
+def expected_rows():
+    """(ancestor, descendant, depth) for every pair, walked from parent_id"""
+    parents = dict(db.session.execute(select(EquipmentCategory.id, EquipmentCategory.parent_id)).all())
+    rows = set()
+    for category_id in parents:
+        ancestor_id, depth = category_id, 0
+        while ancestor_id is not None:
+            rows.add((ancestor_id, category_id, depth))
+            ancestor_id, depth = parents[ancestor_id], depth + 1
+    return rows
+
+
+@pytest.fixture
+def tree(app):
+    """Earthmoving > Diggers > Mini diggers, and Trucks"""
+    machinery = EquipmentCategory(name='Earthmoving')
+    excavators = EquipmentCategory(name='Diggers', parent=machinery)
+    mini = EquipmentCategory(name='Mini diggers', parent=excavators)
+    trucks = EquipmentCategory(name='Trucks')
+    db.session.add_all([machinery, excavators, mini, trucks])
+    db.session.commit()
+    return machinery, excavators, mini, trucks
+
+
+def test_inserts(tree):
+    machinery, excavators, mini, trucks = tree
+    assert (machinery.id, mini.id, 2) in closure_rows()
+    assert closure_rows() == expected_rows()
+
+
+def test_move_subtree(tree):
+    machinery, excavators, mini, trucks = tree
+    excavators.parent = trucks
+    db.session.commit()
+    rows = closure_rows()
+    assert rows == expected_rows()
+    assert (trucks.id, mini.id, 2) in rows
+    assert not any(ancestor == machinery.id and descendant != machinery.id
+                   for ancestor, descendant, _ in rows)
+
+    excavators.parent = None
+    db.session.commit()
+    assert closure_rows() == expected_rows()
+
+
+def test_move_below_own_subtree_is_rejected(tree):
+    machinery, excavators, mini, trucks = tree
+    machinery.parent = mini
+    with pytest.raises(ValueError):
+        db.session.commit()
+    db.session.rollback()
+    assert closure_rows() == expected_rows()
+
+
+def test_delete(tree):
+    machinery, excavators, mini, trucks = tree
+    mini_id = mini.id
+    db.session.delete(mini)
+    db.session.commit()
+    rows = closure_rows()
+    assert rows == expected_rows()
+    assert not any(mini_id in (ancestor, descendant) for ancestor, descendant, _ in rows)
+
+
+def test_rebuild_matches_maintained_rows(tree):
+    machinery, excavators, mini, trucks = tree
+    excavators.parent = trucks
+    db.session.commit()
+    maintained = closure_rows()
+    db.session.execute(closure.delete())
+    rebuild_closure()
+    assert closure_rows() == maintained
+
+
+def test_listing_includes_subcategories(client, tree, make_operator, make_equipment):
+    machinery, excavators, mini, trucks = tree
+    operator = make_operator()
+    make_equipment(operator, category_id=mini.id)
+    make_equipment(operator, category_id=trucks.id)
+
+    def listed(category):
+        response = client.get(f'/api/equipment?category={category.id}')
+        assert response.status_code == 200
+        return len(response.get_json()['items'])
+
+    assert (listed(machinery), listed(trucks)) == (1, 1)
+    excavators.parent = trucks
+    db.session.commit()
+    assert (listed(machinery), listed(trucks)) == (0, 2)
@@ -0,0 +1,37 @@
+from sqlalchemy import text
+
+from app import db
+
+
+def cluster_count(client):
+    response = client.get('/api/map/clusters?bbox=150,-35,152,-33&zoom=8')
+    assert response.status_code == 200, response.get_json()
+    return sum(cluster['count'] for cluster in response.get_json()['clusters'])
+
+
+def hide_behind_events(operator):
+    """Soft delete an operator the way another process would, unseen by the write events"""
+    db.session.execute(text('UPDATE operators SET deleted_at = CURRENT_TIMESTAMP WHERE id = :id'),
+                       {'id': operator.id})
+    db.session.commit()
+
+
+def test_clusters_follow_writes(client, make_operator):
+    make_operator()
+    operator = make_operator(longitude=151.3)
+    assert cluster_count(client) == 2
+
+    operator.deleted_at = db.func.now()
+    db.session.commit()
+    assert cluster_count(client) == 1
+
+
+def test_clusters_rebuild_after_max_age(app, client, make_operator):
+    make_operator()
+    operator = make_operator(longitude=151.3)
+    assert cluster_count(client) == 2
+
+    hide_behind_events(operator)
+    assert cluster_count(client) == 2
+    app.config['MAP_CLUSTER_MAX_AGE'] = 0
+    assert cluster_count(client) == 1
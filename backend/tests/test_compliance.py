@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.compliance import expiring_soon
+from app.models import AustralianState, Certification, CertificationType, Electrician, License
+from app.pagination import encode_keyset
+
+NOW = datetime(2026, 10, 1, 9, 0)
+
+
+@pytest.fixture
+def electrician(app):
+    electrician = Electrician(full_name='Sparky', primary_license_state=AustralianState.NSW)
+    db.session.add(electrician)
+    db.session.commit()
+    return electrician
+
+
+def add_license(electrician, expiry_date):
+    license = License(electrician_id=electrician.id, license_number=f'L{expiry_date:%Y%m%d%H%M%S}',
+                      issue_date=datetime(2020, 1, 1), expiry_date=expiry_date, status='Active')
+    db.session.add(license)
+    db.session.commit()
+    return license
+
+
+def add_certification(electrician, expiry_date):
+    certification = Certification(
+        electrician_id=electrician.id, certification_type=CertificationType.WORKING_AT_HEIGHTS,
+        issuing_body='SafeWork', issue_date=datetime(2020, 1, 1), expiry_date=expiry_date)
+    db.session.add(certification)
+    db.session.commit()
+    return certification
+
+
+def test_window_includes_now_and_excludes_its_end(electrician):
+    add_license(electrician, NOW - timedelta(seconds=1))
+    at_start = add_license(electrician, NOW)
+    last = add_license(electrician, NOW + timedelta(days=30, seconds=-1))
+    add_license(electrician, NOW + timedelta(days=30))
+
+    page = expiring_soon(30, now=NOW)
+    assert [item['id'] for item in page['items']] == [at_start.id, last.id]
+    assert [item['days_left'] for item in page['items']] == [0, 29]
+    assert page['next_cursor'] is None
+
+    electrician.insurance_expiry = NOW + timedelta(days=5)
+    db.session.commit()
+    assert [item['type'] for item in expiring_soon(30, types=['insurance'], now=NOW)['items']] == ['insurance']
+
+
+def test_cursor_pages_through_every_kind_in_order(client, electrician):
+    soon = datetime.utcnow() + timedelta(days=2)
+    later = soon + timedelta(days=1)
+    expected = [
+        ('certification', add_certification(electrician, soon).id),
+        ('license', add_license(electrician, soon).id),
+        ('license', add_license(electrician, soon.replace(microsecond=0) + timedelta(seconds=1)).id),
+        ('certification', add_certification(electrician, later).id),
+    ]
+    electrician.insurance_expiry = later
+    db.session.commit()
+    expected.insert(4, ('insurance', electrician.id))
+
+    seen, cursor = [], ''
+    for _ in range(len(expected) + 1):
+        response = client.get(f'/api/compliance/expiring?within_days=7&limit=2&cursor={cursor}')
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        seen += [(item['type'], item['id']) for item in body['items']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    encode_keyset(expiry_date='2026-10-02T00:00:00', type='license', id='1'),
+    encode_keyset(expiry_date='2026-10-02T00:00:00', type='license', id=[1]),
+    encode_keyset(expiry_date='2026-10-02T00:00:00', type='permit', id=1),
+    encode_keyset(expiry_date='2026-10-02T00:00:00+10:00', type='license', id=1),
+    encode_keyset(expiry_date=20261002, type='license', id=1),
+])
+def test_rejects_bad_cursors(client, electrician, cursor):
+    response = client.get(f'/api/compliance/expiring?cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
+
+
+@pytest.mark.parametrize('query', ['within_days=0', 'within_days=366', 'type=permit'])
+def test_rejects_bad_windows(client, query):
+    response = client.get(f'/api/compliance/expiring?{query}')
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def listing(make_operator, make_equipment):
+    return make_equipment(make_operator(), count=2)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/equipment',
+    '/api/equipment/nearby?lat=-33.87&lng=151.21&radius=5000',
+    '/api/categories',
+])
+def test_matching_etag_gets_304(client, listing, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    response = client.get(url, headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    assert response.get_json()
+
+
+@pytest.mark.parametrize('url', [
+    '/api/equipment',
+    '/api/equipment/nearby?lat=-33.87&lng=151.21&radius=5000',
+])
+def test_writes_change_the_etag(client, listing, url):
+    etag = client.get(url).headers['ETag']
+
+    listing[0].daily_rate = 999
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    etag = response.headers['ETag']
+
+    db.session.delete(listing[1])
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_category_writes_change_the_etag(client, category):
+    etag = client.get('/api/categories').headers['ETag']
+    category.name = 'Diggers'
+    db.session.commit()
+    response = client.get('/api/categories', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_params_change_the_etag(client, listing):
+    etag = client.get('/api/equipment').headers['ETag']
+    response = client.get('/api/equipment?limit=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
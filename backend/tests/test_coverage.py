@@ -0,0 +1,53 @@
+import pytest
+
+from app.spatial import CoverageIndex, calculate_distance, find_covering_operators
+
+SITE = (-33.87, 151.21)
+
+
+@pytest.fixture
+def operators(make_operator, make_equipment):
+    """An operator at the site, and two 20km north that deliver 50km and 10km"""
+    local = make_operator(*SITE, service_radius=5000)
+    far_reach = make_operator(SITE[0] + 0.18, SITE[1], service_radius=50000)
+    short_reach = make_operator(SITE[0] + 0.18, SITE[1], service_radius=10000)
+    for operator in (local, far_reach, short_reach):
+        make_equipment(operator)
+    return local, far_reach, short_reach
+
+
+def nearby_operator_ids(client, query):
+    response = client.get(f'/api/equipment/nearby?lat={SITE[0]}&lng={SITE[1]}&{query}')
+    assert response.status_code == 200, response.get_json()
+    return {item['operator']['id'] for item in response.get_json()['items']}
+
+
+def test_coverage_index_spans_cells():
+    index = CoverageIndex([(1, -33.87, 151.21, 30000), (2, -34.5, 150.5, 1000)], cell_size=0.1)
+    # A point three cells away from the centre is still covered
+    found = index.covering(-33.87 + 0.25, 151.21)
+    assert [circle_id for circle_id, _ in found] == [1]
+    assert found[0][1] == pytest.approx(calculate_distance(-33.62, 151.21, -33.87, 151.21))
+    assert index.covering(-33.87 + 0.3, 151.21) == []
+    assert index.covering(-33.87 + 0.25, 151.21, radius=10000) == []
+
+
+@pytest.mark.parametrize('index_enabled', [True, False])
+def test_delivers_matches_service_areas(app, client, operators, index_enabled):
+    app.config['SPATIAL_INDEX_ENABLED'] = index_enabled
+    local, far_reach, short_reach = operators
+    assert nearby_operator_ids(client, 'delivers=true') == {local.id, far_reach.id}
+    assert nearby_operator_ids(client, 'delivers=true&radius=10000') == {local.id}
+    assert nearby_operator_ids(client, 'radius=30000') == {local.id, far_reach.id, short_reach.id}
+
+    found = find_covering_operators(*SITE, None, app.config)
+    assert sorted(operator_id for operator_id, _ in found) == sorted([local.id, far_reach.id])
+
+
+def test_batch_delivers(client, operators):
+    local, far_reach, short_reach = operators
+    # Next to the northern operators: all three are within 30km, two deliver there
+    response = client.post('/api/equipment/nearby/batch', json={
+        'points': [[SITE[0] + 0.17, SITE[1]]], 'radius': 30000, 'delivers': True})
+    assert response.status_code == 200, response.get_json()
+    assert {item['operator']['id'] for item in response.get_json()['items']} == {far_reach.id, short_reach.id}
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.facets import FacetIndex, equipment_facets, iter_bits
+from app.models import ModerationStatus
+
+ROWS = [
+    # id, category id, daily rate, available, operator state
+    (1, 1, 50.0, True, 'NSW'),
+    (2, 2, None, False, 'NSW'),
+    (5, 1, 250.0, True, 'VIC'),
+    (9, 2, 1200.0, None, 'QLD'),
+    (64, 1, 100.0, False, 'VIC'),
+]
+
+
+def make_index():
+    index = FacetIndex()
+    index.apply('category', (1, 'Excavators', None))
+    index.apply('category', (2, 'Mini excavators', 1))
+    return index
+
+
+def facet_counts(client, query=''):
+    response = client.get(f'/api/equipment/facets{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_load_matches_incremental_adds():
+    loaded, added = make_index(), make_index()
+    loaded.load(ROWS)
+    added.apply('projection', ([], ROWS))
+
+    assert loaded.all == added.all
+    assert loaded.bitmaps == added.bitmaps
+    assert loaded.doc_values == added.doc_values
+    assert loaded.query({'daily_rate': ['0-100']}) == added.query({'daily_rate': ['0-100']})
+
+
+def test_projection_writes():
+    index = make_index()
+    index.load(ROWS)
+    # Listing 9's operator moved to NSW, listing 2 was hidden or deleted
+    index.apply('projection', ([2, 9], [(9, 2, 1200.0, None, 'NSW')]))
+    assert list(iter_bits(index.all)) == [1, 5, 9, 64]
+    result, counts = index.query({'state': ['NSW']})
+    assert list(iter_bits(result)) == [1, 9]
+    assert {item['value']: item['count'] for item in counts['state']} == {'NSW': 2, 'VIC': 2}
+    result, counts = index.query({'category': [1]})
+    assert list(iter_bits(result)) == [1, 5, 9, 64]
+
+
+def test_unknown_rate_bucket_is_rejected(client):
+    response = client.get('/api/equipment/facets?daily_rate=bogus')
+    assert response.status_code == 400
+    assert 'bogus' in response.get_json()['error']
+
+
+def test_counts_follow_writes(client, make_operator, make_equipment):
+    operator = make_operator()
+    hidden = make_operator(moderation_status=ModerationStatus.PENDING)
+    make_equipment(operator, count=2)
+    make_equipment(hidden, count=3)
+    assert facet_counts(client)['total'] == 2
+
+    hidden.moderation_status = ModerationStatus.APPROVED
+    db.session.commit()
+    assert facet_counts(client)['total'] == 5
+
+    operator.deleted_at = db.func.now()
+    db.session.commit()
+    assert facet_counts(client)['total'] == 3
+
+
+def test_rebuilds_after_max_age(app, client, make_operator, make_equipment):
+    app.config['FACET_INDEX_MAX_AGE'] = 0
+    operator = make_operator()
+    items = make_equipment(operator, count=2)
+    assert facet_counts(client)['total'] == 2
+    assert equipment_facets.wait(timeout=10)
+
+    # A write the mapper events don't see, e.g. from another process
+    db.session.execute(text('DELETE FROM equipment_search WHERE id = :id'), {'id': items[0].id})
+    db.session.commit()
+    facet_counts(client)
+    assert equipment_facets.wait(timeout=10)
+    assert facet_counts(client)['total'] == 1
+
+
+@pytest.fixture(autouse=True)
+def default_max_age(app):
+    yield
+    equipment_facets.configure(app.config['FACET_RATE_BUCKETS'], 300)
@@ -0,0 +1,42 @@
+import pytest
+
+from app.importer import RowError, parse_rate
+from app.models import Equipment
+
+
+@pytest.mark.parametrize('value', ['nan', 'NaN', 'inf', '-inf', 'Infinity', '-5', 'ten'])
+def test_parse_rate_rejects_bad_values(value):
+    with pytest.raises(RowError):
+        parse_rate(value, 'daily_rate')
+
+
+def test_parse_rate():
+    assert parse_rate('$1,250.50', 'daily_rate') == 1250.5
+    assert parse_rate(' ', 'daily_rate') is None
+
+
+def test_import_reports_non_finite_rates(client, make_operator, category):
+    operator = make_operator()
+    body = ('name,category,daily_rate,weekly_rate\n'
+            'Digger,Excavators,100,600\n'
+            'Broken,Excavators,nan,600\n'
+            'Endless,Excavators,100,inf\n')
+    response = client.post(f'/api/operators/{operator.id}/equipment/import', data=body,
+                           content_type='text/csv')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['inserted'], report['failed']) == (1, 2)
+    assert [error['line'] for error in report['errors']] == [3, 4]
+    assert Equipment.query.count() == 1
+
+
+def test_import_rejects_malformed_csv(client, make_operator, category):
+    operator = make_operator()
+    body = ('name,category,description\n'
+            'Digger,Excavators,Fine\n'
+            f'Broken,Excavators,"{"x" * 200000}"\n')
+    response = client.post(f'/api/operators/{operator.id}/equipment/import', data=body,
+                           content_type='text/csv')
+    assert response.status_code == 400
+    assert 'Malformed CSV at line 3' in response.get_json()['error']
+    assert Equipment.query.count() == 0
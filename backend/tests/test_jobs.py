@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.jobs import claim_batch, release_stale
+from app.models import Job, JobStatus
+
+
+def crash(job):
+    """Leave a claimed job running with a lock older than the timeout, like a dead worker"""
+    job.locked_at = datetime.utcnow() - timedelta(seconds=700)
+    db.session.commit()
+
+
+def test_stale_jobs_fail_after_max_attempts(app):
+    db.session.add(Job(name='expire_rfqs', payload={}, max_attempts=2))
+    db.session.commit()
+
+    job, = claim_batch('worker-1', 10)
+    crash(job)
+    assert release_stale(600) == 1
+    db.session.refresh(job)
+    assert (job.status, job.attempts, job.locked_by) == (JobStatus.PENDING, 1, None)
+
+    job, = claim_batch('worker-1', 10)
+    crash(job)
+    assert release_stale(600) == 0
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == (JobStatus.FAILED, 2)
+    assert 'Lock expired' in job.last_error
+    assert claim_batch('worker-1', 10) == []
+
+
+def test_fresh_locks_are_kept(app):
+    db.session.add(Job(name='expire_rfqs', payload={}, max_attempts=1))
+    db.session.commit()
+    job, = claim_batch('worker-1', 10)
+    assert release_stale(600) == 0
+    db.session.refresh(job)
+    assert job.status == JobStatus.RUNNING
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import select
+
+from app import db
+from app.jsonfields import json_contains, json_filter, json_number, parse_value
+from app.models import Equipment
+
+SPECS = {
+    'small': {'power_kw': 15, 'brand': 'Kubota', 'tracked': True, 'attachments': ['bucket', 'auger']},
+    'large': {'power_kw': 120.5, 'brand': 'CAT', 'tracked': True, 'attachments': ['bucket'],
+              'dimensions': {'width_m': 2.5}},
+    'odd': {'power_kw': 'unknown', 'brand': 'Kubota', 'tracked': False},
+    'none': None,
+}
+
+
+@pytest.fixture
+def listing(make_operator, make_equipment):
+    operator = make_operator()
+    items = {}
+    for name, specs in SPECS.items():
+        item, = make_equipment(operator, specifications=specs)
+        item.name = name
+        items[name] = item
+    db.session.commit()
+    return items
+
+
+def names(*clauses):
+    return set(db.session.execute(select(Equipment.name).where(*clauses)).scalars())
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('brand=Kubota', {'small', 'odd'}),
+    ('tracked=true', {'small', 'large'}),
+    ('tracked=false', {'odd'}),
+    ('power_kw=15', {'small'}),
+    ('power_kw>=15', {'small', 'large'}),
+    ('power_kw>100', {'large'}),
+    ('power_kw<15', set()),
+    ('power_kw <= 120.5', {'small', 'large'}),
+    # As with jsonb @>, a nested scalar doesn't match inside an array
+    ('attachments=auger', set()),
+    ('missing=1', set()),
+])
+def test_json_filter(listing, expression, expected):
+    assert names(json_filter(Equipment.specifications, expression)) == expected
+
+
+def test_json_contains(listing):
+    assert names(json_contains(Equipment.specifications, {'attachments': ['bucket']})) == {'small', 'large'}
+    assert names(json_contains(Equipment.specifications, {'attachments': ['bucket', 'auger']})) == {'small'}
+    assert names(json_contains(Equipment.specifications, {'dimensions': {'width_m': 2.5}})) == {'large'}
+    assert names(json_contains(Equipment.specifications, {'brand': 'Kubota', 'tracked': False})) == {'odd'}
+
+
+def test_json_number_skips_non_numbers(listing):
+    rows = dict(db.session.execute(select(Equipment.name, json_number(Equipment.specifications, 'power_kw'))).all())
+    assert rows == {'small': 15, 'large': 120.5, 'odd': None, 'none': None}
+
+
+@pytest.mark.parametrize('text, value', [
+    ('20', 20), ('2.5', 2.5), ('True', True), ('false', False), ('Kubota', 'Kubota'),
+])
+def test_parse_value(text, value):
+    assert parse_value(text) == value
+    assert type(parse_value(text)) is type(value)
+
+
+@pytest.mark.parametrize('expression', ['power_kw', 'power kw=1', 'brand>=Kubota', 'tracked<true'])
+def test_json_filter_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        json_filter(Equipment.specifications, expression)
+
+
+def test_spec_parameter(client, listing):
+    response = client.get('/api/equipment?spec=brand=Kubota&spec=power_kw>=10')
+    assert response.status_code == 200
+    assert [item['name'] for item in response.get_json()['items']] == ['small']
+
+    response = client.get('/api/equipment?spec=brand>=Kubota')
+    assert response.status_code == 400
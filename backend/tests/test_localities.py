@@ -0,0 +1,25 @@
+from sqlalchemy import text
+
+from app import db
+from app.models import Locality
+
+
+def suburbs(client, query):
+    response = client.get(f'/api/locations/autocomplete?q={query}')
+    assert response.status_code == 200, response.get_json()
+    return [item['suburb'] for item in response.get_json()['items']]
+
+
+def test_gazetteer_rebuilds_after_max_age(app, client):
+    db.session.add(Locality(suburb='Parramatta', state='NSW', postcode='2150',
+                            latitude=-33.815, longitude=151.001))
+    db.session.commit()
+    assert suburbs(client, 'Parr') == ['Parramatta']
+
+    # A load by another process, unseen by this one's write events
+    db.session.execute(text("INSERT INTO localities (suburb, state, postcode, latitude, longitude) "
+                            "VALUES ('Parramatta Park', 'NSW', '2150', -33.81, 151.0)"))
+    db.session.commit()
+    assert suburbs(client, 'Parr') == ['Parramatta']
+    app.config['LOCALITY_INDEX_MAX_AGE'] = 0
+    assert suburbs(client, 'Parr') == ['Parramatta', 'Parramatta Park']
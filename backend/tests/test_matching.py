@@ -0,0 +1,86 @@
+import threading
+from datetime import date
+
+import pytest
+
+from app import db
+from app.matching import electrician_index
+from app.models import AustralianState, Certification, CertificationType, Electrician
+
+
+@pytest.fixture
+def make_electrician(app):
+    def make(certifications=(), **fields):
+        fields.setdefault('full_name', 'Sparky')
+        fields.setdefault('primary_license_state', AustralianState.NSW)
+        electrician = Electrician(**fields)
+        db.session.add(electrician)
+        db.session.flush()
+        for certification_type in certifications:
+            db.session.add(Certification(
+                electrician_id=electrician.id, certification_type=certification_type,
+                issuing_body='SafeWork', issue_date=date(2024, 1, 1)))
+        db.session.commit()
+        return electrician
+    return make
+
+
+def match_ids(client, query):
+    response = client.get(f'/api/electricians/match?{query}')
+    assert response.status_code == 200, response.get_json()
+    return [item['id'] for item in response.get_json()['items']]
+
+
+def test_filters_and_ranks(client, make_electrician):
+    senior = make_electrician(years_experience=15, certifications=[CertificationType.WORKING_AT_HEIGHTS])
+    junior = make_electrician(years_experience=2, certifications=[CertificationType.WORKING_AT_HEIGHTS])
+    make_electrician(years_experience=20)
+    make_electrician(years_experience=20, primary_license_state=AustralianState.VIC,
+                     certifications=[CertificationType.WORKING_AT_HEIGHTS])
+
+    assert match_ids(client, 'certifications=working_at_heights&state=NSW') == [senior.id, junior.id]
+    response = client.get('/api/electricians/match?state=bogus')
+    assert response.status_code == 400
+
+
+def test_reloads_electricians_after_updates(client, make_electrician):
+    electrician = make_electrician(hourly_rate=120)
+    other = make_electrician(hourly_rate=80)
+    assert match_ids(client, 'max_hourly_rate=100') == [other.id]
+
+    electrician.hourly_rate = 90
+    db.session.add(Certification(
+        electrician_id=other.id, certification_type=CertificationType.WORKING_AT_HEIGHTS,
+        issuing_body='SafeWork', issue_date=date(2024, 1, 1)))
+    db.session.commit()
+    assert sorted(match_ids(client, 'max_hourly_rate=100')) == sorted([electrician.id, other.id])
+    assert match_ids(client, 'certifications=working_at_heights') == [other.id]
+
+
+def test_uncommitted_changes_stay_dirty_until_commit(app, client, make_electrician):
+    electrician = make_electrician(hourly_rate=120)
+    assert match_ids(client, 'max_hourly_rate=100') == []
+
+    electrician.hourly_rate = 90
+    db.session.flush()
+
+    # Another request reloads the index before this transaction commits
+    def reload():
+        with app.app_context():
+            electrician_index.matrix()
+    thread = threading.Thread(target=reload)
+    thread.start()
+    thread.join()
+
+    db.session.commit()
+    assert match_ids(client, 'max_hourly_rate=100') == [electrician.id]
+
+
+def test_rollback_discards_changes(client, make_electrician):
+    electrician = make_electrician(hourly_rate=120)
+    assert match_ids(client, 'max_hourly_rate=100') == []
+
+    electrician.hourly_rate = 90
+    db.session.flush()
+    db.session.rollback()
+    assert match_ids(client, 'max_hourly_rate=100') == []
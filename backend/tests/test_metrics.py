@@ -0,0 +1,73 @@
+import re
+
+import pytest
+
+from app.metrics import Histogram, format_labels
+
+
+def sample(client, name, **labels):
+    """Value of one series on /metrics, 0 when it isn't there yet"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    series = name + format_labels(tuple(labels), tuple(labels.values()))
+    match = re.search(rf'^{re.escape(series)} (\S+)$', response.get_data(as_text=True), re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+def test_requests_are_counted_by_endpoint_and_status(client, category):
+    ok = dict(method='GET', endpoint='api.get_categories', status='200')
+    bad = dict(method='GET', endpoint='api.get_nearby_equipment', status='400')
+    before = sample(client, 'http_requests_total', **ok), sample(client, 'http_requests_total', **bad)
+    queries = sample(client, 'http_request_db_queries_count', endpoint='api.get_categories')
+
+    client.get('/api/categories')
+    client.get('/api/categories')
+    client.get('/api/equipment/nearby?lat=nan&lng=0')
+
+    assert sample(client, 'http_requests_total', **ok) == before[0] + 2
+    assert sample(client, 'http_requests_total', **bad) == before[1] + 1
+    assert sample(client, 'http_request_db_queries_count', endpoint='api.get_categories') == queries + 2
+    # /metrics itself isn't measured
+    assert sample(client, 'http_requests_total', method='GET', endpoint='metrics', status='200') == 0
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency', 'Latency.', ('endpoint',), (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(('x',), value)
+    lines = histogram.render()
+    assert 'latency_bucket{endpoint="x",le="0.1"} 2' in lines
+    assert 'latency_bucket{endpoint="x",le="1"} 3' in lines
+    assert 'latency_bucket{endpoint="x",le="+Inf"} 4' in lines
+    assert 'latency_count{endpoint="x"} 4' in lines
+
+
+def test_labels_are_escaped():
+    assert format_labels(('path',), ('a"b\\c\n',)) == '{path="a\\"b\\\\c\\n"}'
+
+
+@pytest.fixture
+def profile_dir(app, tmp_path):
+    app.config['PROFILE_DIR'] = str(tmp_path / 'profiles')
+    return tmp_path / 'profiles'
+
+
+def test_profile_needs_the_admin_token(app, client, profile_dir):
+    app.config['ADMIN_TOKEN'] = 'secret'
+    for headers in ({}, {'X-Admin-Token': 'wrong'}):
+        response = client.get('/api/categories?profile=1', headers=headers)
+        assert response.status_code == 200
+        assert 'X-Profile' not in response.headers
+    assert not profile_dir.exists()
+
+    response = client.get('/api/categories?profile=1', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert (profile_dir / response.headers['X-Profile']).is_file()
+
+
+def test_profile_is_off_without_a_token(app, client, profile_dir):
+    app.config['ADMIN_TOKEN'] = ''
+    response = client.get('/api/categories?profile=1', headers={'X-Admin-Token': ''})
+    assert 'X-Profile' not in response.headers
+    assert not profile_dir.exists()
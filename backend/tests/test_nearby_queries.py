@@ -0,0 +1,51 @@
+from sqlalchemy import event
+
+from app import db
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self)
+
+
+def nearby_statements(client, **params):
+    # Warm the in-process spatial index first, its build isn't per request
+    client.get('/api/equipment/nearby', query_string=params)
+    with StatementCounter() as counter:
+        response = client.get('/api/equipment/nearby', query_string=params)
+    assert response.status_code == 200
+    return response.get_json(), counter.statements
+
+
+def test_nearby_statement_count_does_not_grow_with_results(client, make_operator, make_equipment):
+    near = make_operator()
+    make_equipment(near, count=3)
+    small, small_statements = nearby_statements(client, lat=-33.87, lng=151.21, limit=100)
+
+    for _ in range(4):
+        make_equipment(make_operator(), count=10)
+    large, large_statements = nearby_statements(client, lat=-33.87, lng=151.21, limit=100)
+
+    assert len(small['items']) == 3
+    assert len(large['items']) == 43
+    # The conditional GET watermark, then the page itself
+    assert len(small_statements) == len(large_statements) == 2
+
+
+def test_nearby_items_include_operator_and_category(client, make_operator, make_equipment):
+    operator = make_operator(business_name='Dig It')
+    make_equipment(operator)
+    body, _ = nearby_statements(client, lat=-33.87, lng=151.21)
+    item = body['items'][0]
+    assert item['operator']['business_name'] == 'Dig It'
+    assert item['category']['name'] == 'Excavators'
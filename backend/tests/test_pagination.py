@@ -0,0 +1,81 @@
+import pytest
+
+from app.pagination import decode_cursor, encode_cursor, encode_keyset, parse_fields
+
+NEARBY = '/api/equipment/nearby?lat=-33.87&lng=151.21&radius=5000'
+
+
+def fetch_all(client, url, limit):
+    items, cursor = [], None
+    for _ in range(20):
+        separator = '&' if '?' in url else '?'
+        query = f'{separator}limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url + query)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert len(body['items']) <= limit
+        items += body['items']
+        cursor = body['next_cursor']
+        if cursor is None:
+            return items
+    raise AssertionError('pagination did not end')
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(None) is None
+    assert decode_cursor('') is None
+
+
+@pytest.mark.parametrize('cursor', ['garbage', encode_keyset(id='7'), encode_keyset(last=7)])
+def test_decode_cursor_rejects_bad_cursors(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor)
+
+
+def test_parse_fields():
+    assert parse_fields(None, ['id', 'name', 'daily_rate']) == ['id', 'name', 'daily_rate']
+    assert parse_fields('daily_rate, name', ['id', 'name', 'daily_rate']) == ['id', 'daily_rate', 'name']
+    with pytest.raises(ValueError, match='bogus'):
+        parse_fields('name,bogus', ['id', 'name'])
+
+
+@pytest.mark.parametrize('url', ['/api/equipment', NEARBY])
+def test_pages_cover_every_row_once(client, make_operator, make_equipment, url):
+    equipment = make_equipment(make_operator(), count=5)
+    items = fetch_all(client, url, limit=2)
+    assert sorted(item['id'] for item in items) == sorted(item.id for item in equipment)
+    if url == '/api/equipment':
+        assert [item['id'] for item in items] == sorted(item.id for item in equipment)
+
+
+def test_last_full_page_has_no_cursor(client, make_operator, make_equipment):
+    make_equipment(make_operator(), count=4)
+    first = client.get('/api/equipment?limit=2').get_json()
+    second = client.get(f"/api/equipment?limit=2&cursor={first['next_cursor']}").get_json()
+    assert len(second['items']) == 2
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('url', ['/api/equipment', NEARBY])
+def test_fields_select_columns(client, make_operator, make_equipment, url):
+    make_equipment(make_operator(), count=2)
+    separator = '&' if '?' in url else '?'
+    response = client.get(f'{url}{separator}fields=name,daily_rate')
+    assert response.status_code == 200
+    items = response.get_json()['items']
+    assert len(items) == 2
+    for item in items:
+        assert set(item) - {'distance'} == {'id', 'name', 'daily_rate'}
+
+    response = client.get(f'{url}{separator}fields=name,password')
+    assert response.status_code == 400
+    assert 'password' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('url', ['/api/equipment', NEARBY])
+def test_rejects_bad_cursor(client, url):
+    separator = '&' if '?' in url else '?'
+    response = client.get(f"{url}{separator}cursor={encode_keyset(id='1')}")
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
@@ -0,0 +1,32 @@
+from sqlalchemy import func, select
+
+from app import db
+from app.models import EquipmentSearch, ModerationStatus
+
+
+def listing_names(client, query=''):
+    response = client.get(f'/api/equipment{query}')
+    assert response.status_code == 200, response.get_json()
+    return [item['name'] for item in response.get_json()['items']]
+
+
+def projected_count():
+    return db.session.execute(select(func.count()).select_from(EquipmentSearch)).scalar()
+
+
+def test_listings_only_show_visible_operators(client, make_operator, make_equipment):
+    make_equipment(make_operator(), count=2)
+    make_equipment(make_operator(moderation_status=ModerationStatus.PENDING), count=3)
+    assert listing_names(client) == ['Excavator 0', 'Excavator 1']
+    assert listing_names(client, '?max_daily_rate=100') == ['Excavator 0']
+
+
+def test_soft_delete_with_sql_expression(make_operator, make_equipment):
+    operator = make_operator()
+    make_equipment(operator, count=2)
+    assert projected_count() == 2
+
+    # No attribute history is left for a SQL expression by after_update
+    operator.deleted_at = func.now()
+    db.session.commit()
+    assert projected_count() == 0
@@ -0,0 +1,90 @@
+import pytest
+
+from app import db
+from app.models import RFQ, User, UserRole
+
+
+@pytest.fixture
+def rfq_data(app, make_operator, make_equipment):
+    hirer = User(email='hirer@example.com', password_hash='x', role=UserRole.HIRER, full_name='Hirer')
+    db.session.add(hirer)
+    db.session.commit()
+    operator = make_operator()
+    equipment, = make_equipment(operator)
+    return {
+        'hirer_id': hirer.id, 'operator_ids': [operator.id], 'equipment_id': equipment.id,
+        'category_id': equipment.category_id, 'hire_start': '2026-11-02', 'hire_end': '2026-11-06',
+        'delivery_preference': 'pickup', 'requirements': 'Operator licence',
+    }
+
+
+def test_create_rfq(client, rfq_data):
+    response = client.post('/api/rfqs', json=dict(rfq_data, equipment_id=str(rfq_data['equipment_id'])))
+    assert response.status_code == 201, response.get_json()
+    rfq = db.session.get(RFQ, response.get_json()['id'])
+    assert rfq.equipment_id == rfq_data['equipment_id']
+    assert rfq.requirements == 'Operator licence'
+
+
+@pytest.mark.parametrize('changes, status', [
+    ({'equipment_id': 'abc'}, 400),
+    ({'equipment_id': [1]}, 400),
+    ({'category_id': True}, 400),
+    ({'equipment_id': 999999}, 404),
+    ({'category_id': 999999}, 404),
+    ({'requirements': {'insurance': True}}, 400),
+    ({'delivery_address': 12}, 400),
+    ({'delivery_address': 'x' * 256}, 400),
+    ({'requirements': 'x' * 5001}, 400),
+])
+def test_create_rfq_rejects_bad_fields(client, rfq_data, changes, status):
+    response = client.post('/api/rfqs', json=dict(rfq_data, **changes))
+    assert response.status_code == status
+    assert db.session.query(RFQ).count() == 0
+
+
+def test_create_rfq_rejects_non_string_dates(client, rfq_data):
+    response = client.post('/api/rfqs', json=dict(rfq_data, hire_start=20261102))
+    assert response.status_code == 400
+    assert 'Invalid date' in response.get_json()['error']
+
+
+def test_create_rfq_with_mixed_offsets(client, rfq_data):
+    response = client.post('/api/rfqs', json=dict(rfq_data, hire_start='2026-11-02',
+                                                   hire_end='2026-11-06T09:00:00+10:00'))
+    assert response.status_code == 201, response.get_json()
+    response = client.post('/api/rfqs', json=dict(rfq_data, hire_start='2026-11-06T09:00:00+10:00',
+                                                   hire_end='2026-11-05T22:00:00'))
+    assert response.status_code == 400
+
+
+def test_rfq_bodies_must_be_objects(client, rfq_data):
+    response = client.post('/api/rfqs', json=['x'])
+    assert response.status_code == 400
+    assert 'JSON object' in response.get_json()['error']
+
+    rfq_id = client.post('/api/rfqs', json=rfq_data).get_json()['id']
+    response = client.post(f'/api/rfqs/{rfq_id}/responses', json=['x'])
+    assert response.status_code == 400
+    assert 'JSON object' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('changes', [
+    {'quoted_price': True},
+    {'quoted_price': float('nan')},
+    {'quoted_price': float('inf')},
+    {'quoted_price': -1},
+    {'message': ['hello']},
+    {'message': 'x' * 5001},
+    {'operator_id': 'abc'},
+])
+def test_respond_rejects_bad_fields(client, rfq_data, changes):
+    rfq_id = client.post('/api/rfqs', json=rfq_data).get_json()['id']
+    body = {'operator_id': rfq_data['operator_ids'][0], 'status': 'accepted', 'quoted_price': 950,
+            'message': 'Available'}
+    response = client.post(f'/api/rfqs/{rfq_id}/responses', json=dict(body, **changes))
+    assert response.status_code == 400, response.get_json()
+
+    response = client.post(f'/api/rfqs/{rfq_id}/responses', json=body)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['status'] == 'accepted'
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+from app import db
+
+
+def search_names(client, query):
+    response = client.get(f'/api/equipment/search?q={query}')
+    assert response.status_code == 200, response.get_json()
+    return [item['name'] for item in response.get_json()['items']]
+
+
+def test_search_follows_writes(client, make_operator, make_equipment):
+    equipment, = make_equipment(make_operator())
+    assert search_names(client, 'excavator') == ['Excavator 0']
+
+    equipment.name = 'Compact loader'
+    db.session.commit()
+    assert search_names(client, 'excavator') == []
+    assert search_names(client, 'loader') == ['Compact loader']
+
+
+def test_search_index_rebuilds_after_max_age(app, client, make_operator, make_equipment):
+    equipment, = make_equipment(make_operator())
+    assert search_names(client, 'loader') == []
+
+    # A projection rebuild by another process, unseen by this one's index
+    db.session.execute(text("UPDATE equipment_search SET name = 'Compact loader' WHERE id = :id"),
+                       {'id': equipment.id})
+    db.session.commit()
+    assert search_names(client, 'loader') == []
+    app.config['SEARCH_INDEX_MAX_AGE'] = 0
+    assert search_names(client, 'loader') == ['Compact loader']
@@ -0,0 +1,87 @@
+import random
+import threading
+
+import pytest
+
+from app import db
+from app.spatial import GridIndex, calculate_distance, find_nearby_operators, operator_index
+
+
+def test_grid_large_box_scans_populated_cells_only():
+    rng = random.Random(1)
+    points = [(i, rng.uniform(-44, -10), rng.uniform(113, 154)) for i in range(500)]
+    grid = GridIndex(points, cell_size=0.1)
+    # Covers the whole globe, millions of cells but only a few hundred populated
+    found = {point[0] for point in grid.candidates(-90, -180, 90, 180)}
+    assert found == {point[0] for point in points}
+
+    lat, lng, radius = -33.87, 151.21, 800000
+    expected = {i for i, plat, plng in points if calculate_distance(lat, lng, plat, plng) <= radius}
+    assert {i for i, _ in grid.within(lat, lng, radius)} == expected
+
+
+@pytest.mark.parametrize('params', [
+    {'lat': 'nan', 'lng': 151.2},
+    {'lat': 'inf', 'lng': 151.2},
+    {'lat': -33.8, 'lng': 181},
+    {'lat': -33.8, 'lng': 151.2, 'radius': 'nan'},
+    {'lat': -33.8, 'lng': 151.2, 'radius': 'inf'},
+    {'lat': -33.8, 'lng': 151.2, 'radius': -5},
+    {'lat': -33.8, 'lng': 151.2, 'radius': 1e12},
+])
+def test_nearby_rejects_bad_coordinates(client, params):
+    response = client.get('/api/equipment/nearby', query_string=params)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('body', [
+    [[-33.8, 151.2]],
+    'points',
+    {'points': [[-33.8, 151.2], ['nan', 151.2]]},
+    {'points': [{'lat': -33.8, 'lng': 151.2, 'radius': 'inf'}]},
+    {'points': [[-33.8, 151.2]], 'radius': 1e12},
+])
+def test_nearby_batch_rejects_bad_bodies(client, body):
+    response = client.post('/api/equipment/nearby/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_nearby_batch_matches_points(client, make_operator, make_equipment):
+    make_equipment(make_operator(latitude=-33.87, longitude=151.21), count=2)
+    make_equipment(make_operator(latitude=-37.81, longitude=144.96))
+    response = client.post('/api/equipment/nearby/batch', json={
+        'points': [[-37.81, 144.96], {'lat': -33.87, 'lng': 151.21, 'radius': 5000}]})
+    assert response.status_code == 200
+    assert sorted(item['points'] for item in response.get_json()['items']) == [[0], [1], [1]]
+
+
+def test_operator_moves_reach_the_grid_after_commit(app, make_operator):
+    operator = make_operator(latitude=-33.87, longitude=151.21)
+    assert [found for found, _ in find_nearby_operators(-37.81, 144.96, 5000)] == []
+
+    operator.latitude, operator.longitude = -37.81, 144.96
+    db.session.flush()
+
+    # Another request rebuilds the grid before this transaction commits
+    def rebuild():
+        with app.app_context():
+            operator_index.grid()
+    thread = threading.Thread(target=rebuild)
+    thread.start()
+    thread.join()
+
+    db.session.commit()
+    assert [found for found, _ in find_nearby_operators(-37.81, 144.96, 5000)] == [operator.id]
+
+
+def test_rolled_back_moves_keep_the_grid(make_operator):
+    operator = make_operator(latitude=-33.87, longitude=151.21)
+    assert [found for found, _ in find_nearby_operators(-33.87, 151.21, 5000)] == [operator.id]
+
+    operator.latitude, operator.longitude = -37.81, 144.96
+    db.session.flush()
+    db.session.rollback()
+    assert [found for found, _ in find_nearby_operators(-33.87, 151.21, 5000)] == [operator.id]
+    assert find_nearby_operators(-37.81, 144.96, 5000) == []
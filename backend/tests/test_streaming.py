@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+NEARBY = '/api/equipment/nearby?lat=-33.87&lng=151.21&radius=5000'
+
+
+@pytest.fixture
+def listing(app, make_operator, make_equipment):
+    # Small batches so that the body spans several chunks
+    app.config['STREAM_BATCH_SIZE'] = 2
+    return make_equipment(make_operator(), count=5)
+
+
+def with_query(url, query):
+    return url + ('&' if '?' in url else '?') + query
+
+
+@pytest.mark.parametrize('url', ['/api/equipment', NEARBY])
+def test_ndjson(client, listing, url):
+    response = client.get(with_query(url, 'format=ndjson&limit=1'))
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    # Streams every row, not just one page
+    assert sorted(json.loads(line)['id'] for line in lines) == sorted(item.id for item in listing)
+
+
+def test_ndjson_from_accept_header(client, listing):
+    response = client.get('/api/equipment', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == len(listing)
+
+
+@pytest.mark.parametrize('url', ['/api/equipment', NEARBY])
+def test_chunked_json_array(client, listing, url):
+    response = client.get(with_query(url, 'format=stream&fields=name'))
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    chunks = list(response.response)
+    assert len(chunks) > 3
+    items = json.loads(b''.join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks))
+    assert sorted(item['id'] for item in items) == sorted(item.id for item in listing)
+    assert {item['name'] for item in items} == {item.name for item in listing}
+
+
+def test_empty_streams(client, app):
+    assert client.get('/api/equipment?format=stream').get_json() == []
+    assert client.get('/api/equipment?format=ndjson').get_data(as_text=True) == ''
+
+
+def test_paged_by_default(client, listing):
+    response = client.get('/api/equipment?limit=2')
+    body = response.get_json()
+    assert len(body['items']) == 2
+    assert body['next_cursor']
@@ -0,0 +1,32 @@
+"""
+Background job worker.
+
+Schedules the periodic tasks (RFQ expiry and reminders, availability alerts)
+and runs due jobs from the jobs table. Run one or more next to the web
+process:
+
+    python worker.py
+    python worker.py --once          # drain the queue and exit
+    python worker.py --no-scheduler  # extra workers that only run jobs
+"""
+import argparse
+import os
+import socket
+
+from app import create_app
+from app.jobs import work
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background jobs')
+    parser.add_argument('--once', action='store_true', help='Run due jobs once and exit')
+    parser.add_argument('--no-scheduler', action='store_true', help="Don't enqueue periodic tasks")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        work(f'{socket.gethostname()}:{os.getpid()}', once=args.once, scheduler=not args.no_scheduler)
+
+
+if __name__ == '__main__':
+    main()
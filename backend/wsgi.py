@@ -0,0 +1,14 @@
+"""
+Production WSGI entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Uses the production config profile unless APP_ENV says otherwise.
+"""
+import os
+
+os.environ.setdefault('APP_ENV', 'production')
+
+from app import create_app  # noqa: E402
+
+app = create_app()